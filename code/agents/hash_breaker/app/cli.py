@@ -0,0 +1,616 @@
+"""Command line entry points for offline Hash Breaker maintenance tasks.
+
+Usage:
+    python -m app.cli build-digest-index [--wordlist PATH ...] [--hash-type ID ...] [--force]
+    python -m app.cli build-wordlist-store [--wordlist PATH ...] [--force]
+    python -m app.cli build-candidate-filter [--wordlist PATH ...] [--fp-rate RATE] [--force]
+    python -m app.cli build-candidate-shards [--count N] [--patterns FILE] [--workers N] [--shard-size N]
+    python -m app.cli export-onnx [--model PATH] [--output DIR] [--no-quantize]
+    python -m app.cli export-shared-weights [--model PATH]
+    python -m app.cli build-markov-model [--wordlist PATH ...] [--output DIR] [--max-words N] [--terminals N]
+    python -m app.cli benchmark-generator [--backend torch|onnx|markov ...] [--count N]
+    python -m app.cli build-mask-queue --output FILE [--patterns FILE] [--hash-type ID] [--timeout SECONDS]
+    python -m app.cli phase-budget-report [--hash-type ID ...] [--timeout SECONDS]
+    python -m app.cli rule-yield-report [--rules FILE] [--top N]
+    python -m app.cli build-benchmark-corpus --output FILE [--size N] [--hash-type ID] [--seed N] [--mix SPEC]
+    python -m app.cli benchmark-pipeline --corpus FILE [--timeout SECONDS] [--engine cpu|hashcat] [--baseline FILE]
+    python -m app.cli benchmark-diff CURRENT BASELINE [--tolerance SHARE]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from app.config import get_settings
+from app.utils.logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _build_digest_index(args: argparse.Namespace) -> int:
+    from app.cracking.digest_index import DigestIndex, MANIFEST_NAME, build_digest_index
+
+    settings = get_settings()
+    index_dir = Path(args.output or settings.digest_index_dir)
+    wordlists = [Path(w) for w in args.wordlist] if args.wordlist else [
+        settings.wordlists_dir / name for name in settings.digest_index_wordlists
+    ]
+
+    if not args.force and (index_dir / MANIFEST_NAME).exists():
+        try:
+            existing = DigestIndex(index_dir)
+            up_to_date = not existing.is_stale() and [
+                src["path"] for src in existing.manifest.get("sources", [])
+            ] == [str(w) for w in wordlists if w.is_file()]
+            existing.close()
+            if up_to_date:
+                logger.info(f"Digest index at {index_dir} is up to date (version {existing.version})")
+                return 0
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Existing digest index unreadable, rebuilding: {exc}")
+
+    manifest = build_digest_index(wordlists, index_dir, args.hash_type or None)
+    logger.info(f"Digest index version {manifest['version']} written to {index_dir}")
+    return 0
+
+
+def _build_wordlist_store(args: argparse.Namespace) -> int:
+    from app.cracking.wordlist_store import MANIFEST_NAME, WordlistStore, build_wordlist_store
+
+    settings = get_settings()
+    store_dir = Path(args.output or settings.wordlist_store_dir)
+    wordlists = [Path(w) for w in args.wordlist] if args.wordlist else [
+        settings.wordlists_dir / name for name in settings.wordlist_store_wordlists
+    ]
+
+    if not args.force and (store_dir / MANIFEST_NAME).exists():
+        try:
+            existing = WordlistStore(store_dir)
+            wordlists = [w for w in wordlists if not w.is_file() or existing.entry(w) is None]
+            if not wordlists:
+                logger.info(f"Wordlist store at {store_dir} is up to date")
+                return 0
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning(f"Existing wordlist store unreadable, rebuilding: {exc}")
+
+    manifest = build_wordlist_store(wordlists, store_dir)
+    for name, entry in manifest["lists"].items():
+        logger.info(
+            f"{name}: {entry['words']} words ({entry['duplicates']} duplicates dropped), "
+            f"{len(entry['buckets'])} buckets"
+        )
+    return 0
+
+
+def _build_candidate_filter(args: argparse.Namespace) -> int:
+    from app.cracking.bloom import MANIFEST_NAME, WordlistFilter, build_wordlist_filter
+
+    settings = get_settings()
+    filter_dir = Path(args.output or settings.candidate_filter_dir)
+    fp_rate = args.fp_rate or settings.candidate_filter_fp_rate
+    wordlists = [Path(w) for w in args.wordlist] if args.wordlist else [
+        settings.wordlists_dir / name for name in settings.candidate_filter_wordlists
+    ]
+
+    if not args.force and (filter_dir / MANIFEST_NAME).exists():
+        try:
+            existing = WordlistFilter(filter_dir)
+            up_to_date = not existing.is_stale() and existing.manifest.get("fp_rate") == fp_rate and [
+                src["path"] for src in existing.manifest.get("sources", [])
+            ] == [str(w) for w in wordlists if w.is_file()]
+            if up_to_date:
+                logger.info(f"Candidate filter at {filter_dir} is up to date")
+                return 0
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning(f"Existing candidate filter unreadable, rebuilding: {exc}")
+
+    manifest = build_wordlist_filter(wordlists, filter_dir, fp_rate)
+    logger.info(f"Candidate filter with {manifest['items']} words written to {filter_dir}")
+    return 0
+
+
+def _build_candidate_shards(args: argparse.Namespace) -> int:
+    from app.cracking.shards import build_candidate_shards
+    from app.ml import get_generator
+    from app.ml.pagpassgpt_official.dcgen import load_patterns
+
+    settings = get_settings()
+    shards_dir = Path(args.output or settings.candidate_shards_dir)
+    patterns = None
+    if args.patterns:
+        patterns = load_patterns(Path(args.patterns), args.min_rate)
+        if not patterns:
+            logger.error(f"No usable patterns in {args.patterns}")
+            return 1
+
+    generator = get_generator()
+    if not generator.use_official:
+        logger.warning("PagPassGPT model not available, shards will hold fallback candidates")
+
+    index = build_candidate_shards(
+        generator,
+        args.count,
+        shards_dir,
+        args.shard_size or settings.candidate_shard_size,
+        patterns=patterns,
+        sample_factor=args.sample_factor,
+        workers=args.workers or settings.pagpassgpt_dcgen_workers,
+    )
+    logger.info(f"{index['total']} candidates in {len(index['shards'])} shards written to {shards_dir}")
+    return 0
+
+
+def _export_onnx(args: argparse.Namespace) -> int:
+    from app.ml.pagpassgpt_official.onnx_backend import export_onnx
+
+    model_path = Path(args.model or get_settings().pagpassgpt_model_path)
+    model_file = export_onnx(model_path, Path(args.output) if args.output else None, quantize=not args.no_quantize)
+    logger.info(f"ONNX model written to {model_file}")
+    return 0
+
+
+def _export_shared_weights(args: argparse.Namespace) -> int:
+    from transformers import GPT2LMHeadModel
+
+    from app.ml.pagpassgpt_official.shared_weights import (
+        checkpoint_fingerprint,
+        export_shared_weights,
+        shared_weights_file,
+    )
+
+    model_path = Path(args.model or get_settings().pagpassgpt_model_path)
+    weights_file = export_shared_weights(
+        GPT2LMHeadModel.from_pretrained(str(model_path)),
+        shared_weights_file(model_path),
+        checkpoint_fingerprint(model_path),
+    )
+    logger.info(f"Shared weights written to {weights_file}")
+    return 0
+
+
+def _build_markov_model(args: argparse.Namespace) -> int:
+    from app.ml.markov_pcfg import build_markov_model
+
+    settings = get_settings()
+    wordlists = [Path(w) for w in args.wordlist] if args.wordlist else [
+        settings.wordlists_dir / name for name in settings.markov_model_wordlists
+    ]
+    model_dir = Path(args.output or settings.markov_model_dir)
+    manifest = build_markov_model(
+        wordlists,
+        model_dir,
+        max_words=args.max_words,
+        terminals=args.terminals or settings.markov_terminals,
+        structures=args.structures or settings.markov_structures,
+        max_length=args.max_length,
+    )
+    logger.info(
+        f"Markov/PCFG model written to {model_dir}: {manifest['words']} words, "
+        f"{len(manifest['structures'])} structures, {len(manifest['segments'])} segments"
+    )
+    return 0
+
+
+def _benchmark_markov(args: argparse.Namespace) -> Optional[dict]:
+    from app.ml.markov_pcfg import MANIFEST_NAME, MarkovPcfgModel
+
+    model_dir = get_settings().markov_model_dir
+    if not (model_dir / MANIFEST_NAME).exists():
+        logger.warning(f"No Markov/PCFG model at {model_dir}, skipping")
+        return None
+    model = MarkovPcfgModel(model_dir)
+    workers = get_settings().markov_workers or (os.cpu_count() or 1)
+    started = time.perf_counter()
+    passwords = [pwd for batch in model.iter_batches(args.count, workers=workers) for pwd in batch]
+    elapsed = time.perf_counter() - started
+    return {
+        "device": f"cpu x{workers}",
+        "passwords": len(passwords),
+        "unique": len(set(passwords)),
+        "seconds": round(elapsed, 3),
+        "passwords_per_second": round(len(passwords) / elapsed, 1) if elapsed else None,
+    }
+
+
+def _benchmark_generator(args: argparse.Namespace) -> int:
+    from app.ml import PagPassGPTGenerator
+
+    model_path = Path(args.model or get_settings().pagpassgpt_model_path)
+    results = {}
+    for backend in args.backend or ["torch", "onnx"]:
+        if backend == "markov":
+            result = _benchmark_markov(args)
+            if result is not None:
+                results[backend] = result
+            continue
+        generator = PagPassGPTGenerator(str(model_path), backend=backend)
+        if not generator.use_official or generator.backend != backend:
+            logger.warning(f"Backend {backend} unavailable for {model_path}, skipping")
+            continue
+
+        generator.generate(num_passwords=args.warmup)
+        started = time.perf_counter()
+        passwords = generator.generate(num_passwords=args.count)
+        elapsed = time.perf_counter() - started
+        results[backend] = {
+            "device": generator.device,
+            "passwords": len(passwords),
+            "unique": len(set(passwords)),
+            "seconds": round(elapsed, 3),
+            "passwords_per_second": round(len(passwords) / elapsed, 1) if elapsed else None,
+        }
+
+    print(json.dumps(results, indent=2))
+    if "torch" in results and "onnx" in results and results["torch"]["passwords_per_second"]:
+        speedup = results["onnx"]["passwords_per_second"] / results["torch"]["passwords_per_second"]
+        logger.info(f"ONNX int8 speedup over transformers: {speedup:.2f}x")
+    return 0 if results else 1
+
+
+def _build_mask_queue(args: argparse.Namespace) -> int:
+    from app.cracking.masks import MAX_KEYSPACE, pcfg_masks, plan_masks, write_hcmask
+    from app.cracking.progress import recorded_guess_rate
+    from app.ml.pagpassgpt_official.dcgen import load_patterns
+
+    settings = get_settings()
+    patterns_file = args.patterns or settings.mask_patterns_file or settings.pagpassgpt_patterns_file
+    if not patterns_file:
+        logger.error("No pattern file given and MASK_PATTERNS_FILE is not set")
+        return 1
+    masks = pcfg_masks(load_patterns(Path(patterns_file), args.min_rate))
+    if not masks:
+        logger.error(f"No usable patterns in {patterns_file}")
+        return 1
+
+    rate = args.rate or (recorded_guess_rate(args.hash_type, "Mask Attack") if args.hash_type is not None else 0)
+    budget = int(rate * args.timeout) if rate else MAX_KEYSPACE
+    plan = plan_masks(masks, budget, increment=False)
+    write_hcmask(plan, Path(args.output))
+    covered = sum(p.probability * p.candidates / p.keyspace for p in plan)
+    logger.info(
+        f"{len(plan)} masks, {sum(p.candidates for p in plan)} candidates written to {args.output} "
+        f"(expected coverage {covered:.2%})"
+    )
+    return 0
+
+
+def _phase_budget_report(args: argparse.Namespace) -> int:
+    from app.cracking.budgets import load_phase_stats, plan_phase_budgets, recorded_hash_types, static_plan
+
+    settings = get_settings()
+    hash_types = args.hash_type or sorted(recorded_hash_types())
+    if not hash_types:
+        logger.error("No phase outcomes recorded yet")
+        return 1
+
+    static = static_plan(settings)
+    report = {}
+    for hash_type_id in hash_types:
+        stats = load_phase_stats(hash_type_id)
+        plan = plan_phase_budgets(stats, args.timeout, settings)
+        report[str(hash_type_id)] = {
+            "adaptive": plan.adaptive,
+            "order": list(plan.order),
+            "phases": {
+                str(phase_num): {
+                    "runs": phase.runs,
+                    "hashes": phase.hashes,
+                    "cracks": phase.cracks,
+                    "crack_rate": round(phase.crack_rate, 4),
+                    "avg_seconds": round(phase.avg_seconds, 2),
+                    "avg_time_to_crack": (
+                        round(phase.avg_time_to_crack, 2) if phase.avg_time_to_crack is not None else None
+                    ),
+                    "exhausted_rate": round(phase.exhausted_rate, 4),
+                    "guesses_per_second": round(phase.guesses_per_second, 1),
+                    "cracks_per_hash_second": round(phase.efficiency, 6),
+                    "static_budget": static.budget(phase_num, args.timeout),
+                    "planned_budget": plan.budget(phase_num, args.timeout) if phase_num in plan.order else 0,
+                }
+                for phase_num, phase in stats.items()
+            },
+        }
+
+    print(json.dumps(report, indent=2))
+    if not settings.adaptive_budgets_enabled:
+        logger.info("ADAPTIVE_BUDGETS_ENABLED is off, jobs use the static split")
+    return 0
+
+
+def _rule_yield_report(args: argparse.Namespace) -> int:
+    from app.cracking.rules import (
+        block_sort_key,
+        get_rule_candidates,
+        get_rule_hits,
+        load_stage_stats,
+        ranked_rules,
+        rule_yield,
+    )
+
+    rules_file = Path(args.rules or get_settings().rules_dir / "best64.rule")
+    if not rules_file.exists():
+        logger.error(f"Rule file not found: {rules_file}")
+        return 1
+
+    hits = get_rule_hits(rules_file)
+    candidates = get_rule_candidates(rules_file)
+    stages = load_stage_stats(rules_file)
+    report = {
+        "rules": [
+            {
+                "rule": rule,
+                "hits": hits.get(rule, 0),
+                "candidates": candidates.get(rule, 0),
+                "hits_per_million": round(rule_yield(hits.get(rule, 0), candidates.get(rule, 0)) * 1e6, 4),
+            }
+            for rule in ranked_rules(rules_file)[:args.top or None]
+        ],
+        "stages": {
+            label: {
+                "runs": stage.get("runs", 0),
+                "candidates": stage.get("candidates", 0),
+                "cracks": stage.get("cracks", 0),
+                "seconds": round(stage.get("ms", 0) / 1000, 1),
+                "exhausted": stage.get("exhausted", 0),
+                "cracks_per_million": (
+                    round(stage.get("cracks", 0) * 1e6 / stage["candidates"], 4) if stage.get("candidates") else None
+                ),
+            }
+            for label, stage in sorted(stages.items(), key=lambda item: block_sort_key(item[0]))
+        },
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def _parse_mix(spec: Optional[str]) -> Optional[dict]:
+    if not spec:
+        return None
+    mix = {}
+    for part in spec.split(","):
+        category, _, share = part.partition("=")
+        mix[category.strip()] = float(share)
+    return mix
+
+
+def _build_benchmark_corpus(args: argparse.Namespace) -> int:
+    from app.cracking.benchmark import build_benchmark_corpus, write_benchmark_corpus
+
+    try:
+        corpus = build_benchmark_corpus(
+            args.size,
+            args.hash_type,
+            wordlist=Path(args.wordlist) if args.wordlist else None,
+            rules_file=Path(args.rules) if args.rules else None,
+            mix=_parse_mix(args.mix),
+            seed=args.seed,
+        )
+    except (OSError, ValueError) as exc:
+        logger.error(f"Cannot build benchmark corpus: {exc}")
+        return 1
+    write_benchmark_corpus(corpus, Path(args.output))
+    logger.info(f"Benchmark corpus with {len(corpus['entries'])} hashes written to {args.output}")
+    return 0
+
+
+def _benchmark_pipeline(args: argparse.Namespace) -> int:
+    from app.cracking.benchmark import load_benchmark_corpus, run_benchmark
+
+    report = run_benchmark(load_benchmark_corpus(Path(args.corpus)), args.timeout, args.engine, args.limit)
+    if not args.keep_results:
+        report.pop("results")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info(f"Benchmark report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    logger.info(
+        f"Benchmark: {report['cracked']}/{report['hashes']} cracked, "
+        f"median time to crack {report['time_to_crack']['p50']}s"
+    )
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        return _print_diff(report, baseline, args.tolerance)
+    return 0
+
+
+def _benchmark_diff(args: argparse.Namespace) -> int:
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    return _print_diff(current, baseline, args.tolerance)
+
+
+def _print_diff(current: dict, baseline: dict, tolerance: float) -> int:
+    from app.cracking.benchmark import compare_benchmarks
+
+    diff = compare_benchmarks(current, baseline, tolerance)
+    for name, entry in diff["metrics"].items():
+        marker = "  REGRESSED" if entry["regressed"] else ""
+        print(f"{name:<40} {entry['baseline']!s:>14} -> {entry['current']!s:<14} ({entry['change']!s}){marker}")
+    if diff["regressed"]:
+        logger.warning(f"Benchmark regressed beyond {tolerance:.0%}: {', '.join(diff['regressed'])}")
+        return 1
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the CLI argument parser."""
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser(
+        "build-digest-index",
+        help="Precompute the phase 0 digest index from the top wordlists",
+    )
+    index_parser.add_argument("--wordlist", action="append", help="Wordlist to index (repeatable)")
+    index_parser.add_argument("--hash-type", action="append", type=int, help="Hashcat mode to index (repeatable)")
+    index_parser.add_argument("--output", help="Index directory (defaults to DIGEST_INDEX_DIR)")
+    index_parser.add_argument("--force", action="store_true", help="Rebuild even if the index is up to date")
+    index_parser.set_defaults(func=_build_digest_index)
+
+    store_parser = subparsers.add_parser(
+        "build-wordlist-store",
+        help="Deduplicate, frequency-sort and bucket the phase 1/2 wordlists by length and charset",
+    )
+    store_parser.add_argument("--wordlist", action="append", help="Wordlist to preprocess (repeatable)")
+    store_parser.add_argument("--output", help="Store directory (defaults to WORDLIST_STORE_DIR)")
+    store_parser.add_argument("--force", action="store_true", help="Rebuild lists that are up to date")
+    store_parser.set_defaults(func=_build_wordlist_store)
+
+    filter_parser = subparsers.add_parser(
+        "build-candidate-filter",
+        help="Build the Bloom filter phase 3 uses to skip words phases 1/2 already tried",
+    )
+    filter_parser.add_argument("--wordlist", action="append", help="Wordlist to include (repeatable)")
+    filter_parser.add_argument("--fp-rate", type=float, help="False positive rate (defaults to CANDIDATE_FILTER_FP_RATE)")
+    filter_parser.add_argument("--output", help="Filter directory (defaults to CANDIDATE_FILTER_DIR)")
+    filter_parser.add_argument("--force", action="store_true", help="Rebuild even if the filter is up to date")
+    filter_parser.set_defaults(func=_build_candidate_filter)
+
+    shards_parser = subparsers.add_parser(
+        "build-candidate-shards",
+        help="Pre-generate probability-ordered PagPassGPT candidates for phase 3",
+    )
+    shards_parser.add_argument("--count", type=int, default=5000000, help="Distinct candidates to store")
+    shards_parser.add_argument("--patterns", help="D&C-GEN pattern file (pattern<TAB>rate) to generate per pattern")
+    shards_parser.add_argument("--min-rate", type=float, default=0.0, help="Skip patterns rarer than this rate")
+    shards_parser.add_argument(
+        "--sample-factor", type=float, default=2.0, help="Samples drawn per stored candidate (ranks by frequency)"
+    )
+    shards_parser.add_argument(
+        "--workers", type=int, help="D&C-GEN worker processes (defaults to PAGPASSGPT_DCGEN_WORKERS)"
+    )
+    shards_parser.add_argument("--shard-size", type=int, help="Candidates per shard (defaults to CANDIDATE_SHARD_SIZE)")
+    shards_parser.add_argument("--output", help="Shard directory (defaults to CANDIDATE_SHARDS_DIR)")
+    shards_parser.set_defaults(func=_build_candidate_shards)
+
+    export_parser = subparsers.add_parser(
+        "export-onnx",
+        help="Export PagPassGPT to ONNX with int8 dynamic quantization for CPU workers",
+    )
+    export_parser.add_argument("--model", help="Model directory (defaults to PAGPASSGPT_MODEL_PATH)")
+    export_parser.add_argument("--output", help="Export directory (defaults to <model>/onnx)")
+    export_parser.add_argument("--no-quantize", action="store_true", help="Only write the fp32 export")
+    export_parser.set_defaults(func=_export_onnx)
+
+    shared_parser = subparsers.add_parser(
+        "export-shared-weights",
+        help="Write the PagPassGPT weight file worker processes map instead of loading private copies",
+    )
+    shared_parser.add_argument("--model", help="Model directory (defaults to PAGPASSGPT_MODEL_PATH)")
+    shared_parser.set_defaults(func=_export_shared_weights)
+
+    bench_parser = subparsers.add_parser(
+        "benchmark-generator",
+        help="Compare PagPassGPT passwords/sec across inference backends (and the Markov/PCFG model)",
+    )
+    bench_parser.add_argument(
+        "--backend", action="append", choices=["torch", "onnx", "markov"], help="Backend to measure (repeatable)"
+    )
+    bench_parser.add_argument("--count", type=int, default=20000, help="Passwords generated per backend")
+    bench_parser.add_argument("--warmup", type=int, default=1000, help="Passwords generated before timing")
+    bench_parser.add_argument("--model", help="Model directory (defaults to PAGPASSGPT_MODEL_PATH)")
+    bench_parser.set_defaults(func=_benchmark_generator)
+
+    markov_parser = subparsers.add_parser(
+        "build-markov-model",
+        help="Train the PCFG + Markov model phase 3 enumerates when PagPassGPT is not used",
+    )
+    markov_parser.add_argument("--wordlist", action="append", help="Training wordlist (repeatable)")
+    markov_parser.add_argument("--output", help="Model directory (defaults to MARKOV_MODEL_DIR)")
+    markov_parser.add_argument("--max-words", type=int, default=0, help="Lines read per wordlist (0 = all)")
+    markov_parser.add_argument("--terminals", type=int, help="Terminals per segment (defaults to MARKOV_TERMINALS)")
+    markov_parser.add_argument("--structures", type=int, help="Base structures kept (defaults to MARKOV_STRUCTURES)")
+    markov_parser.add_argument("--max-length", type=int, default=16, help="Longest password length learned")
+    markov_parser.set_defaults(func=_build_markov_model)
+
+    queue_parser = subparsers.add_parser(
+        "build-mask-queue",
+        help="Rank PCFG pattern masks by probability per candidate into a hashcat .hcmask queue",
+    )
+    queue_parser.add_argument("--output", required=True, help="Mask file to write")
+    queue_parser.add_argument("--patterns", help="Pattern file (defaults to MASK_PATTERNS_FILE)")
+    queue_parser.add_argument("--min-rate", type=float, default=0.0, help="Skip patterns rarer than this rate")
+    queue_parser.add_argument("--hash-type", type=int, help="Hashcat mode whose recorded phase 4 speed sets the budget")
+    queue_parser.add_argument("--rate", type=float, help="Guesses per second (overrides the recorded speed)")
+    queue_parser.add_argument("--timeout", type=int, default=3600, help="Seconds the queue has to fit into")
+    queue_parser.set_defaults(func=_build_mask_queue)
+
+    budget_parser = subparsers.add_parser(
+        "phase-budget-report",
+        help="Show recorded per-phase crack statistics and the budget split they produce",
+    )
+    budget_parser.add_argument(
+        "--hash-type", action="append", type=int, help="Hashcat mode to report (repeatable, defaults to all recorded)"
+    )
+    budget_parser.add_argument("--timeout", type=int, default=3600, help="Job timeout the budgets are planned for")
+    budget_parser.set_defaults(func=_phase_budget_report)
+
+    rule_parser = subparsers.add_parser(
+        "rule-yield-report",
+        help="Show phase 2 rules ranked by recorded hits per candidate and the outcome of each stage",
+    )
+    rule_parser.add_argument("--rules", help="Rule file (defaults to best64.rule)")
+    rule_parser.add_argument("--top", type=int, default=20, help="Rules to list (0 = all)")
+    rule_parser.set_defaults(func=_rule_yield_report)
+
+    corpus_parser = subparsers.add_parser(
+        "build-benchmark-corpus",
+        help="Generate hashes of known wordlist, rule, mask and random plaintexts for benchmarking",
+    )
+    corpus_parser.add_argument("--output", required=True, help="Corpus file to write")
+    corpus_parser.add_argument("--size", type=int, default=200, help="Number of hashes")
+    corpus_parser.add_argument("--hash-type", type=int, default=0, help="Hashcat mode (needs a CPU digest function)")
+    corpus_parser.add_argument("--seed", type=int, default=1337, help="Random seed")
+    corpus_parser.add_argument("--mix", help="Category shares, e.g. wordlist=0.4,rule=0.3,mask=0.2,random=0.1")
+    corpus_parser.add_argument("--wordlist", help="Plaintext source (defaults to the phase 2 wordlist)")
+    corpus_parser.add_argument("--rules", help="Rule file for mutated plaintexts (defaults to best64.rule)")
+    corpus_parser.set_defaults(func=_build_benchmark_corpus)
+
+    pipeline_parser = subparsers.add_parser(
+        "benchmark-pipeline",
+        help="Run the cracking pipeline against a benchmark corpus with in-memory Redis",
+    )
+    pipeline_parser.add_argument("--corpus", required=True, help="Corpus file (build-benchmark-corpus)")
+    pipeline_parser.add_argument("--timeout", type=int, default=60, help="Job timeout per hash in seconds")
+    pipeline_parser.add_argument(
+        "--engine", choices=["cpu", "hashcat"], default="cpu",
+        help="cpu: CPU engines behind a hashcat stub; hashcat: the configured binary",
+    )
+    pipeline_parser.add_argument("--limit", type=int, help="Only run the first N hashes")
+    pipeline_parser.add_argument("--output", help="Report file (printed when omitted)")
+    pipeline_parser.add_argument("--keep-results", action="store_true", help="Include per-hash results in the report")
+    pipeline_parser.add_argument("--baseline", help="Report to diff against; exit code 1 on a regression")
+    pipeline_parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed regression share")
+    pipeline_parser.set_defaults(func=_benchmark_pipeline)
+
+    diff_parser = subparsers.add_parser("benchmark-diff", help="Diff two benchmark reports")
+    diff_parser.add_argument("current", help="New report")
+    diff_parser.add_argument("baseline", help="Stored baseline report")
+    diff_parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed regression share")
+    diff_parser.set_defaults(func=_benchmark_diff)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the CLI.
+
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+
+    Returns:
+        Process exit code
+    """
+    setup_logging()
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,7 @@ Uses pydantic-settings for type-safe configuration with environment variable sup
 
 from enum import Enum
 from pathlib import Path
-from typing import Literal
+from typing import List, Literal, Optional
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -73,6 +73,11 @@ class Settings(BaseSettings):
     min_timeout: int = 10
     max_timeout: int = 3600
     max_concurrent_jobs: int = 10
+    max_batch_hashes: int = 10000  # Hashes accepted per batch job
+
+    # Duplicate Submissions (cluster potfile + single-flight of in-flight hashes)
+    potfile_enabled: bool = True
+    singleflight_enabled: bool = True
 
     # Phase Time Allocations (must sum to 1.0)
     phase1_time_ratio: float = 0.10  # Quick Dictionary
@@ -80,11 +85,40 @@ class Settings(BaseSettings):
     phase3_time_ratio: float = 0.35  # PagPassGPT
     phase4_time_ratio: float = 0.30  # Mask Attack
 
+    # Adaptive Phase Budgets (re-weights the ratios above from recorded per-hash-type phase outcomes)
+    adaptive_budgets_enabled: bool = False
+    adaptive_budget_min_samples: int = 20  # Recorded runs every phase needs before its statistics are used
+    adaptive_budget_min_ratio: float = 0.05  # Smallest share a phase that is not skipped is given
+    adaptive_budget_reorder: bool = False  # Run phases in order of cracks per second
+    adaptive_budget_skip_rate: float = 0.0  # Skip phases cracking fewer than this share of hashes (0 = never)
+    adaptive_budget_explore_rate: float = 0.1  # Share of plans that still run skipped phases at the minimum share
+
+    # Keyspace Fan-out (phases 2 and 4 split across workers with --skip/--limit)
+    keyspace_shards: int = 1  # Shards per phase; 1 keeps every phase on the job's worker
+    keyspace_shard_min_timeout: int = 120  # Phases with a smaller budget are not fanned out
+    keyspace_shard_claim_grace: int = 5  # Seconds idle workers get to claim shards before the parent takes them
+
+    # Phase 2 Rule Stages (top words through the top rules first, then both widen; rules ranked by hits per candidate)
+    rule_stage_words: List[int] = [10000, 1000000]  # Word ranks where the next, wider stage starts
+    rule_stage_rules: List[int] = [16, 64]  # Ranked rules each stage adds up to; [] = every rule from the first stage
+
+    # Phase 4 Mask Queue (PCFG pattern rates ranked into an .hcmask queue instead of the common masks)
+    mask_patterns_file: Optional[Path] = None  # pattern<TAB>rate file; defaults to PAGPASSGPT_PATTERNS_FILE
+
+    # Priority Preemption (low priority jobs yield the device to high priority ones on the same device group)
+    preemption_enabled: bool = True
+    device_group: str = ""  # Worker processes sharing the hashcat devices; empty = this host's name
+
     # Worker Configuration
     worker_concurrency: int = 4
     worker_prefetch_multiplier: int = 2
     worker_timeout: int = 600  # 10 minutes
 
+    # CPU Cracking Engine (used when hashcat has no OpenCL/CUDA device)
+    cpu_engine_workers: int = 0  # 0 = one process per core
+    cpu_engine_chunks_per_worker: int = 4
+    cpu_engine_block_bytes: int = 262144
+
     # GPU Configuration
     gpu_enable: bool = True
     cuda_visible_devices: str = "all"
@@ -96,11 +130,37 @@ class Settings(BaseSettings):
     rules_dir: Path = Field(default_factory=lambda: Path("./rules"))
     logs_dir: Path = Field(default_factory=lambda: Path("./logs"))
 
+    # Instant Lookup (Phase 0)
+    digest_index_enabled: bool = True
+    digest_index_dir: Path = Field(default_factory=lambda: Path("./wordlists/index"))
+    digest_index_wordlists: List[str] = ["top100k.txt", "rockyou.txt"]
+
+    # Preprocessed Wordlists (deduplicated, frequency ordered, length/charset buckets; phases 1 and 2)
+    wordlist_store_dir: Path = Field(default_factory=lambda: Path("./wordlists/store"))
+    wordlist_store_wordlists: List[str] = ["top100k.txt", "rockyou.txt"]
+    wordlist_min_length: int = 0  # Password policy: shortest length the dictionary phases try (0 = no limit)
+    wordlist_max_length: int = 0  # Longest length the dictionary phases try (0 = no limit)
+
+    # Candidate Dedup (Phase 3 Bloom filters)
+    candidate_filter_enabled: bool = True
+    candidate_filter_dir: Path = Field(default_factory=lambda: Path("./wordlists/filter"))
+    candidate_filter_wordlists: List[str] = ["top100k.txt", "rockyou.txt"]
+    candidate_filter_fp_rate: float = 0.01
+
+    # Pre-generated PagPassGPT candidates (Phase 3 replays these before sampling live)
+    candidate_shards_dir: Path = Field(default_factory=lambda: Path("./wordlists/shards"))
+    candidate_shard_size: int = 1000000  # Candidates per gzip shard
+
+    # Checkpoint/Resume (hashcat sessions; share this directory between workers)
+    sessions_dir: Path = Field(default_factory=lambda: Path("./sessions"))
+
     # Hashcat Configuration
     hashcat_path: str = "/usr/bin/hashcat"
     hashcat_workload_profile: Literal["low", "medium", "high", "insane"] = "high"
     hashcat_force: bool = True
     hashcat_potfile_disable: bool = True
+    hashcat_status_timer: int = 5  # Seconds between --status-json reports
+    progress_update_interval: float = 2.0  # Min seconds between live progress writes per job
 
     # John the Ripper Configuration
     john_path: str = "/usr/bin/john"
@@ -114,10 +174,28 @@ class Settings(BaseSettings):
     pagpassgpt_top_k: int = 40
     pagpassgpt_batch_size: int = 100000
     pagpassgpt_threshold: int = 100000  # D&C-GEN threshold
+    pagpassgpt_patterns_file: Optional[Path] = None  # D&C-GEN pattern rates; enables D&C-GEN in phase 3
+    pagpassgpt_dcgen_workers: int = 1  # D&C-GEN worker processes (one model copy each)
+    pagpassgpt_queue_batches: int = 8  # Generated batches buffered ahead of hashcat
+    pagpassgpt_backend: Literal["auto", "torch", "onnx"] = "auto"  # auto = int8 ONNX export when no CUDA
+    pagpassgpt_onnx_threads: int = 0  # ONNX Runtime intra-op threads (0 = one per core)
+    pagpassgpt_shared_weights: bool = True  # Map one on-disk weight copy into every worker process (torch backend)
+    pagpassgpt_warmup: bool = True  # Load and warm the model when a worker process boots
+
+    # Phase 3 Candidate Generator (PCFG + Markov model enumerated by probability, built by build-markov-model)
+    phase3_generator: Literal["auto", "pagpassgpt", "markov"] = "auto"  # auto = Markov/PCFG when PagPassGPT is unavailable
+    markov_model_dir: Path = Field(default_factory=lambda: Path("./models/markov"))
+    markov_model_wordlists: List[str] = ["rockyou.txt"]  # Training wordlists (relative to wordlists_dir)
+    markov_terminals: int = 20000  # Terminals kept per segment (class and length)
+    markov_structures: int = 5000  # Most frequent base structures kept
+    markov_workers: int = 1  # Processes enumerating candidates (0 = one per core)
 
     # Monitoring
     metrics_enabled: bool = True
     metrics_port: int = 9090
+    telemetry_enabled: bool = True  # Workers report latency histograms and occupancy through Redis
+    telemetry_heartbeat_interval: int = 15  # Seconds between worker occupancy heartbeats
+    telemetry_sample_interval: float = 5.0  # Min seconds between RabbitMQ queue depth samples
 
     # Rate Limiting (optional)
     rate_limit_enabled: bool = False
@@ -131,7 +209,10 @@ class Settings(BaseSettings):
             raise ValueError("Time ratio must be between 0 and 1")
         return v
 
-    @field_validator("pagpassgpt_model_path", "models_dir", "wordlists_dir", "rules_dir", "logs_dir")
+    @field_validator(
+        "pagpassgpt_model_path", "models_dir", "wordlists_dir", "rules_dir", "logs_dir", "digest_index_dir",
+        "sessions_dir", "candidate_filter_dir", "candidate_shards_dir", "wordlist_store_dir", "markov_model_dir",
+    )
     @classmethod
     def validate_paths(cls, v):
         """Validate and create directories if needed."""
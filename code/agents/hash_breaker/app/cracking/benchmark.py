@@ -0,0 +1,605 @@
+"""Reproducible cracking benchmark with a synthetic hash corpus.
+
+``build_benchmark_corpus`` draws labelled plaintexts from four sources and
+hashes them:
+
+    wordlist   a word of the phase 1/2 wordlist, rank drawn log-uniformly
+    rule       a wordlist word mutated by a rule of the phase 2 rule file
+    mask       a random fill of a phase 4 mask (or one of its prefixes)
+    random     a random 10-character string (expected to survive)
+
+The corpus is a JSON file; the same seed, wordlist and rule file give the
+same corpus. ``run_benchmark`` runs the full ``CrackingPipeline`` once per
+hash with Redis replaced by ``MemoryRedisClient``, the potfile, single-flight
+and keyspace fan-out turned off (they would let earlier hashes answer later
+ones or hand phases to other workers), and either the real hashcat or
+``HASHCAT_STUB``. The stub reports "no devices" so phases 1, 2 and 4 run on
+the CPU engines, and cracks phase 3's stdin stream in Python.
+
+The report holds time-to-crack percentiles, cracks per phase and per corpus
+category, guesses per second and budget utilisation of every phase;
+``compare_benchmarks`` diffs it against a stored baseline.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import random
+import stat
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+from app.cracking.hash_algorithms import get_digest_func
+from app.cracking.masks import CHARSETS, expand_increment, parse_mask
+from app.cracking.pipeline import CrackingPipeline, PHASES
+from app.cracking.rules import compile_rule, load_rules
+from app.models.enums import JobPriority, JobStatus
+from app.models.schemas import JobState
+from app.utils import redis_client
+from app.utils.fingerprints import source_fingerprints
+from app.utils.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+CORPUS_FORMAT_VERSION = 1
+REPORT_FORMAT_VERSION = 1
+
+DEFAULT_MIX = {"wordlist": 0.4, "rule": 0.3, "mask": 0.2, "random": 0.1}
+
+# Used when the configured rule file is missing: simple best64-style mutations
+FALLBACK_RULES = ["c", "$1", "$1 $2 $3", "c $1", "$!", "sa@", "so0", "r", "u", "c $2 $0 $2 $4"]
+
+# Mask plaintexts are drawn from the --increment prefixes of the phase 4 masks
+# from this length up, so short budgets can still reach some of them
+_MASK_MIN_LENGTH = 5
+_RANDOM_LENGTH = 10
+
+# Report metrics and whether a larger value is better
+_COMPARED = {
+    "crack_rate": True,
+    "time_to_crack.p50": False,
+    "time_to_crack.p90": False,
+    "time_to_crack.mean": False,
+}
+
+
+class _MemoryPipeline:
+    """Buffers commands of ``_MemoryRedis`` and runs them on ``execute``."""
+
+    def __init__(self, store: "_MemoryRedis"):
+        self._store = store
+        self._calls: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> list:
+        calls, self._calls = self._calls, []
+        return [getattr(self._store, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class _MemoryRedis:
+    """The subset of redis-py commands ``RedisClient`` uses, on dicts.
+
+    Values are strings as with ``decode_responses=True``; expiry is ignored
+    because a benchmark run is short.
+    """
+
+    def __init__(self):
+        self.strings: Dict[str, str] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+
+    def pipeline(self) -> _MemoryPipeline:
+        return _MemoryPipeline(self)
+
+    def get(self, key: str) -> Optional[str]:
+        return self.strings.get(key)
+
+    def setex(self, key: str, ttl, value: str) -> bool:
+        self.strings[key] = str(value)
+        return True
+
+    def set(self, key: str, value: str, nx: bool = False, ex=None) -> bool:
+        if nx and key in self.strings:
+            return False
+        self.strings[key] = str(value)
+        return True
+
+    def eval(self, script: str, numkeys: int, key: str, value: str) -> int:
+        # Only the compare-and-delete script of RedisClient.release is used
+        if self.strings.get(key) == value:
+            del self.strings[key]
+            return 1
+        return 0
+
+    def hset(self, key: str, mapping: dict) -> int:
+        self.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+        return len(mapping)
+
+    def hget(self, key: str, field_name: str) -> Optional[str]:
+        return self.hashes.get(key, {}).get(field_name)
+
+    def hmget(self, key: str, field_names: list) -> list:
+        fields = self.hashes.get(key, {})
+        return [fields.get(name) for name in field_names]
+
+    def hgetall(self, key: str) -> dict:
+        return dict(self.hashes.get(key, {}))
+
+    def hincrby(self, key: str, field_name: str, amount: int) -> int:
+        fields = self.hashes.setdefault(key, {})
+        fields[field_name] = str(int(fields.get(field_name, 0)) + amount)
+        return int(fields[field_name])
+
+    def hdel(self, key: str, *field_names: str) -> int:
+        fields = self.hashes.get(key, {})
+        return sum(fields.pop(name, None) is not None for name in field_names)
+
+    def expire(self, key: str, ttl) -> bool:
+        return True
+
+    def publish(self, channel: str, message: str) -> int:
+        return 0
+
+    def delete(self, *keys: str) -> int:
+        return sum((self.strings.pop(k, None) is not None) | (self.hashes.pop(k, None) is not None) for k in keys)
+
+    def exists(self, *keys: str) -> int:
+        return sum(k in self.strings or k in self.hashes for k in keys)
+
+    def ping(self) -> bool:
+        return True
+
+    def llen(self, key: str) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryRedisClient(RedisClient):
+    """``RedisClient`` backed by an in-process dict instead of a server."""
+
+    def __init__(self):
+        self._pool = None
+        self._client = _MemoryRedis()
+        self._ttl = get_settings().redis_ttl
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def memory_redis() -> Iterator[MemoryRedisClient]:
+    """Make ``get_redis()`` return a fresh in-memory client for the duration."""
+    previous = redis_client._redis_client
+    redis_client._redis_client = MemoryRedisClient()
+    try:
+        yield redis_client._redis_client
+    finally:
+        redis_client._redis_client = previous
+
+
+@contextmanager
+def _settings_overrides(**values) -> Iterator[None]:
+    settings = get_settings()
+    previous = {name: getattr(settings, name) for name in values}
+    for name, value in values.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+# Stand-in for hashcat: stdin attacks are cracked in Python with the CPU
+# engines' digest functions, everything else reports that no device exists
+HASHCAT_STUB = '''
+import json, sys, time
+sys.path.insert(0, {base_dir!r})
+from app.cracking.hash_algorithms import get_digest_func
+
+args = sys.argv[1:]
+digest = get_digest_func(int(args[args.index("-m") + 1])) if "-m" in args else None
+if "--stdin" not in args or digest is None:
+    sys.stderr.write("No devices found/left\\n")
+    sys.exit(255)
+
+targets = {{line.strip() for line in open(args[args.index("-a") + 2]) if line.strip()}}
+total = len(targets)
+started = time.time()
+done = 0
+with open(args[args.index("--outfile") + 1], "a", encoding="utf-8", errors="surrogateescape") as out:
+    for line in sys.stdin.buffer:
+        word = line.rstrip(b"\\r\\n")
+        done += 1
+        digest_hex = digest(word).hex()
+        if digest_hex in targets:
+            targets.discard(digest_hex)
+            out.write(digest_hex + ":" + word.decode("utf-8", "surrogateescape") + "\\n")
+            out.flush()
+            if not targets:
+                break
+elapsed = max(time.time() - started, 1e-6)
+print(json.dumps({{
+    "status": 6 if not targets else 5,
+    "progress": [done, done],
+    "devices": [{{"device_id": 1, "speed": done / elapsed}}],
+    "recovered_hashes": [total - len(targets), total],
+}}), flush=True)
+sys.exit(0 if len(targets) < total else 1)
+'''
+
+
+def write_hashcat_stub(directory: Path) -> Path:
+    """Write ``HASHCAT_STUB`` as an executable into a directory."""
+    path = Path(directory) / "hashcat"
+    path.write_text(
+        f"#!{sys.executable}\n" + HASHCAT_STUB.format(base_dir=str(get_settings().base_dir)), encoding="utf-8"
+    )
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def _read_words(wordlist: Path, limit: int) -> List[bytes]:
+    words = []
+    with open(wordlist, "rb") as handle:
+        for line in handle:
+            word = line.rstrip(b"\r\n")
+            if word:
+                words.append(word)
+                if len(words) >= limit:
+                    break
+    return words
+
+
+def _pick_rank(rng: random.Random, count: int) -> int:
+    """Log-uniform rank: as many picks from ranks 1-10 as from 1000-10000."""
+    return min(count - 1, int(math.exp(rng.uniform(0, math.log(count)))) - 1)
+
+
+def build_benchmark_corpus(
+    size: int,
+    hash_type_id: int,
+    wordlist: Optional[Path] = None,
+    rules_file: Optional[Path] = None,
+    mix: Optional[Dict[str, float]] = None,
+    seed: int = 1337,
+    max_words: int = 1000000,
+) -> dict:
+    """Generate a labelled corpus of hashes with known plaintexts.
+
+    Args:
+        size: Number of hashes
+        hash_type_id: Hashcat hash mode (must have a CPU digest function)
+        wordlist: Source of wordlist and rule plaintexts (defaults to the
+            phase 2 wordlist, else the phase 1 one)
+        rules_file: Rules for mutated plaintexts (defaults to the phase 2
+            rule file; ``FALLBACK_RULES`` when it is missing)
+        mix: Share of each category (defaults to ``DEFAULT_MIX``)
+        seed: Random seed
+        max_words: Only the first ``max_words`` words are drawn from
+
+    Returns:
+        Corpus dict, as written by ``write_benchmark_corpus``
+
+    Raises:
+        ValueError: For hash modes without a digest function or unknown categories
+        FileNotFoundError: If no wordlist exists
+    """
+    settings = get_settings()
+    digest = get_digest_func(hash_type_id)
+    if digest is None:
+        raise ValueError(f"No CPU digest function for hash type {hash_type_id}")
+    mix = mix or DEFAULT_MIX
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise ValueError(f"Unknown corpus categories: {', '.join(sorted(unknown))}")
+
+    if wordlist is None:
+        wordlist = next(
+            (p for p in (settings.wordlists_dir / "rockyou.txt", settings.wordlists_dir / "top100k.txt") if p.is_file()),
+            None,
+        )
+    if wordlist is None or not Path(wordlist).is_file():
+        raise FileNotFoundError("No wordlist found to build the benchmark corpus from")
+    words = _read_words(Path(wordlist), max_words)
+    if not words:
+        raise ValueError(f"Wordlist {wordlist} is empty")
+
+    rules_file = Path(rules_file or settings.rules_dir / "best64.rule")
+    rules = load_rules(rules_file) if rules_file.is_file() else list(FALLBACK_RULES)
+    compiled = [(rule, compile_rule(rule)) for rule in rules]
+
+    from app.cracking.phases.phase4_mask import COMMON_MASKS
+
+    masks = sorted({m for mask in COMMON_MASKS for m in expand_increment(mask, _MASK_MIN_LENGTH)})
+    random_charset = CHARSETS["a"].encode("ascii")
+
+    rng = random.Random(seed)
+    categories = list(mix)
+    weights = [mix[c] for c in categories]
+    entries = []
+    seen = set()
+    attempts = 0
+    while len(entries) < size and attempts < size * 20:
+        attempts += 1
+        category = rng.choices(categories, weights)[0]
+        detail: dict = {}
+        if category == "wordlist":
+            rank = _pick_rank(rng, len(words))
+            plain, detail = words[rank], {"rank": rank + 1}
+        elif category == "rule":
+            rank = _pick_rank(rng, len(words))
+            rule, func = compiled[rng.randrange(len(compiled))]
+            plain = func(words[rank])
+            if not plain or plain == words[rank]:
+                continue
+            detail = {"rank": rank + 1, "rule": rule}
+        elif category == "mask":
+            mask = masks[rng.randrange(len(masks))]
+            plain = bytes(rng.choice(charset) for charset in parse_mask(mask))
+            detail = {"mask": mask}
+        else:
+            plain = bytes(rng.choice(random_charset) for _ in range(_RANDOM_LENGTH))
+
+        if plain in seen:
+            continue
+        seen.add(plain)
+        entries.append({
+            "id": len(entries),
+            "category": category,
+            "plaintext": plain.decode("utf-8", errors="surrogateescape"),
+            "hash": digest(plain).hex(),
+            **detail,
+        })
+
+    return {
+        "format_version": CORPUS_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "seed": seed,
+        "hash_type_id": hash_type_id,
+        "mix": mix,
+        "wordlist": source_fingerprints([Path(wordlist)])[0],
+        "rules": str(rules_file) if rules_file.is_file() else None,
+        "entries": entries,
+    }
+
+
+def write_benchmark_corpus(corpus: dict, path: Path) -> Path:
+    """Write a corpus as JSON."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(corpus, indent=1, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def load_benchmark_corpus(path: Path) -> dict:
+    """Read a corpus written by ``write_benchmark_corpus``.
+
+    Raises:
+        ValueError: If the corpus has another format version
+    """
+    corpus = json.loads(Path(path).read_text(encoding="utf-8"))
+    if corpus.get("format_version") != CORPUS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported benchmark corpus format: {corpus.get('format_version')}")
+    return corpus
+
+
+class _BenchmarkPipeline(CrackingPipeline):
+    """Pipeline that records each phase's budget and outcome."""
+
+    def __init__(self):
+        super().__init__()
+        self.phase_runs: List[dict] = []
+        self._budgets: Dict[int, float] = {}
+
+    def _phase_timeout(self, plan, phase_num, timeout, elapsed):
+        budget = super()._phase_timeout(plan, phase_num, timeout, elapsed)
+        self._budgets[phase_num] = budget
+        return budget
+
+    def _record_outcome(self, hash_type_id, phase_num, hashes, cracks, seconds, attempts, phase_timeout):
+        super()._record_outcome(hash_type_id, phase_num, hashes, cracks, seconds, attempts, phase_timeout)
+        self.phase_runs.append({
+            "phase": phase_num,
+            "budget": self._budgets.get(phase_num, phase_timeout),
+            "seconds": seconds,
+            "attempts": attempts,
+            "cracks": cracks,
+        })
+
+
+def _percentile(values: Sequence[float], share: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(share * len(ordered)))], 3)
+
+
+def run_benchmark(
+    corpus: dict,
+    timeout: int,
+    engine: str = "cpu",
+    limit: Optional[int] = None,
+) -> dict:
+    """Run the cracking pipeline against every hash of a corpus.
+
+    Args:
+        corpus: Corpus from ``build_benchmark_corpus``
+        timeout: Job timeout per hash in seconds
+        engine: ``"cpu"`` runs against ``HASHCAT_STUB``, ``"hashcat"`` against
+            the configured hashcat binary
+        limit: Only run the first ``limit`` hashes
+
+    Returns:
+        Benchmark report
+    """
+    hash_type_id = corpus["hash_type_id"]
+    entries = corpus["entries"][:limit] if limit else corpus["entries"]
+
+    started = time.time()
+    results = []
+    phase_runs: List[dict] = []
+    with tempfile.TemporaryDirectory(prefix="hash_breaker_bench_") as tmp_dir, memory_redis() as memory:
+        overrides = {
+            "potfile_enabled": False,
+            "singleflight_enabled": False,
+            "keyspace_shards": 1,
+            "telemetry_enabled": False,
+            "sessions_dir": Path(tmp_dir) / "sessions",
+        }
+        if engine == "cpu":
+            overrides["hashcat_path"] = str(write_hashcat_stub(Path(tmp_dir)))
+        with _settings_overrides(**overrides):
+            pipeline = _BenchmarkPipeline()
+            for entry in entries:
+                job_id = f"bench-{entry['id']}"
+                memory.set_fields(f"job:{job_id}", JobState(
+                    job_id=job_id,
+                    status=JobStatus.PENDING,
+                    submitted_at=datetime.utcnow(),
+                    hash_type_id=hash_type_id,
+                    timeout_seconds=timeout,
+                    priority=JobPriority.NORMAL,
+                    progress=0,
+                ).model_dump(mode="json"))
+
+                pipeline.phase_runs = []
+                outcome = pipeline.execute(job_id, entry["hash"], hash_type_id, timeout)
+                cracked = outcome.get("status") == JobStatus.SUCCESS
+                if cracked and outcome.get("result") != entry["plaintext"]:
+                    logger.warning(f"Benchmark: hash {entry['id']} cracked to an unexpected plaintext")
+                results.append({
+                    "id": entry["id"],
+                    "category": entry["category"],
+                    "cracked": cracked,
+                    "phase": outcome.get("cracked_in_phase") if cracked else None,
+                    "seconds": round(float(outcome.get("time_elapsed") or 0.0), 3),
+                    "attempts": int(outcome.get("attempts") or 0),
+                })
+                phase_runs.extend(pipeline.phase_runs)
+                logger.info(
+                    f"Benchmark: {len(results)}/{len(entries)} {entry['category']} "
+                    f"{'cracked in phase ' + str(results[-1]['phase']) if cracked else 'not cracked'} "
+                    f"({results[-1]['seconds']:.1f}s)"
+                )
+
+    return _report(corpus, results, phase_runs, timeout, engine, time.time() - started)
+
+
+def _report(corpus: dict, results: List[dict], phase_runs: List[dict], timeout: int, engine: str, duration: float) -> dict:
+    cracked = [r for r in results if r["cracked"]]
+    times = [r["seconds"] for r in cracked]
+
+    by_category = {}
+    for category in sorted({r["category"] for r in results}):
+        members = [r for r in results if r["category"] == category]
+        hits = sum(r["cracked"] for r in members)
+        by_category[category] = {"hashes": len(members), "cracked": hits, "crack_rate": round(hits / len(members), 4)}
+
+    by_phase = {}
+    labels = {phase[0]: phase[1] for phase in PHASES}
+    for phase_num in sorted({run["phase"] for run in phase_runs} | {r["phase"] for r in cracked}):
+        runs = [run for run in phase_runs if run["phase"] == phase_num]
+        seconds = sum(run["seconds"] for run in runs)
+        budget = sum(run["budget"] for run in runs)
+        attempts = sum(run["attempts"] for run in runs)
+        by_phase[str(phase_num)] = {
+            "label": labels.get(phase_num),
+            "runs": len(runs),
+            "cracks": sum(1 for r in cracked if r["phase"] == phase_num),
+            "seconds": round(seconds, 3),
+            "budget_seconds": round(budget, 3),
+            "budget_utilisation": round(seconds / budget, 4) if budget else None,
+            "guesses": attempts,
+            "guesses_per_second": round(attempts / seconds, 1) if seconds else None,
+        }
+
+    return {
+        "format_version": REPORT_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "engine": engine,
+        "timeout": timeout,
+        "duration": round(duration, 3),
+        "corpus": {
+            "seed": corpus.get("seed"),
+            "hash_type_id": corpus["hash_type_id"],
+            "hashes": len(results),
+            "wordlist": corpus.get("wordlist"),
+        },
+        "hashes": len(results),
+        "cracked": len(cracked),
+        "crack_rate": round(len(cracked) / len(results), 4) if results else 0.0,
+        "time_to_crack": {
+            "mean": round(sum(times) / len(times), 3) if times else None,
+            "p50": _percentile(times, 0.5),
+            "p90": _percentile(times, 0.9),
+            "p99": _percentile(times, 0.99),
+            "max": round(max(times), 3) if times else None,
+        },
+        "by_category": by_category,
+        "by_phase": by_phase,
+        "results": results,
+    }
+
+
+def _lookup(report: dict, path: str):
+    value = report
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def compare_benchmarks(current: dict, baseline: dict, tolerance: float = 0.05) -> dict:
+    """Diff a benchmark report against a baseline.
+
+    A metric regresses when it moves the wrong way by more than
+    ``tolerance`` (relative; absolute for rates).
+
+    Args:
+        current: New report
+        baseline: Stored report to compare with
+        tolerance: Allowed change before a metric counts as regressed
+
+    Returns:
+        ``{"metrics": {name: {baseline, current, change, regressed}}, "regressed": [...]}``
+    """
+    metrics = {}
+    names = dict(_COMPARED)
+    for category in sorted(set(current.get("by_category", {})) | set(baseline.get("by_category", {}))):
+        names[f"by_category.{category}.crack_rate"] = True
+    for phase in sorted(set(current.get("by_phase", {})) | set(baseline.get("by_phase", {}))):
+        names[f"by_phase.{phase}.cracks"] = True
+        names[f"by_phase.{phase}.guesses_per_second"] = True
+
+    for name, higher_is_better in names.items():
+        old, new = _lookup(baseline, name), _lookup(current, name)
+        entry = {"baseline": old, "current": new, "change": None, "regressed": False}
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+            entry["change"] = round(new - old, 4)
+            if name.endswith("crack_rate"):
+                worse = old - new if higher_is_better else new - old
+                entry["regressed"] = worse > tolerance
+            elif old:
+                relative = (new - old) / abs(old)
+                entry["regressed"] = (-relative if higher_is_better else relative) > tolerance
+        metrics[name] = entry
+
+    if current.get("corpus", {}).get("seed") != baseline.get("corpus", {}).get("seed"):
+        logger.warning("Benchmark reports were run on different corpora; the diff is not like for like")
+    return {"metrics": metrics, "regressed": [name for name, entry in metrics.items() if entry["regressed"]]}
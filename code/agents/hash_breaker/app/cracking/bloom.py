@@ -0,0 +1,210 @@
+"""Bloom filters for dropping candidates that were already tried.
+
+Two filters are used in phase 3: a persistent one built offline from the
+phase 1/2 wordlists (``settings.candidate_filter_dir``) and a per-job one
+that remembers every candidate already sent to hashcat. Layout of the
+persistent filter directory:
+
+    bits.bin          the bit array
+    manifest.json     format version, size, hash count, source wordlist stamp
+
+Candidates are hashed once with BLAKE2b; the two 64-bit halves of the
+digest derive all probe positions (Kirsch-Mitzenmacher double hashing), and
+membership tests run over whole batches with numpy.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.config import get_settings
+from app.utils.fingerprints import source_fingerprints
+
+logger = logging.getLogger(__name__)
+
+FILTER_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+BITS_NAME = "bits.bin"
+_BUILD_BATCH = 100000
+
+
+class BloomFilter:
+    """Bit-array Bloom filter with batch add and membership tests."""
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[np.ndarray] = None):
+        """Create an empty filter or wrap an existing bit array.
+
+        Args:
+            num_bits: Size of the bit array
+            num_hashes: Probes per item
+            bits: Existing uint8 bit array (e.g. a read-only memory map)
+        """
+        self.num_bits = max(8, int(num_bits))
+        self.num_hashes = max(1, int(num_hashes))
+        self.bits = bits if bits is not None else np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self._probe = np.arange(self.num_hashes, dtype=np.uint64)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp_rate: float) -> "BloomFilter":
+        """Size a filter for ``capacity`` items at the given false positive rate."""
+        capacity = max(1, int(capacity))
+        num_bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        num_hashes = round(num_bits / capacity * math.log(2))
+        return cls(num_bits, num_hashes)
+
+    def add_many(self, items: Sequence[bytes]) -> None:
+        """Insert a batch of items."""
+        if not items:
+            return
+        positions = self._positions(items).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), _masks(positions))
+
+    def contains_many(self, items: Sequence[bytes]) -> np.ndarray:
+        """Test a batch of items; True may be a false positive, False is exact."""
+        if not items:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(items)
+        return ((self.bits[positions >> np.uint64(3)] & _masks(positions)) != 0).all(axis=1)
+
+    def _positions(self, items: Sequence[bytes]) -> np.ndarray:
+        digests = b"".join(hashlib.blake2b(item, digest_size=16).digest() for item in items)
+        halves = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+        with np.errstate(over="ignore"):
+            combined = halves[:, :1] + self._probe * (halves[:, 1:2] | np.uint64(1))
+        return combined % np.uint64(self.num_bits)
+
+
+def _masks(positions: np.ndarray) -> np.ndarray:
+    return np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+
+
+class WordlistFilter(BloomFilter):
+    """Read-only, memory-mapped filter of the phase 1/2 wordlists."""
+
+    def __init__(self, filter_dir: Path):
+        """Open a filter built by ``build_wordlist_filter``.
+
+        Args:
+            filter_dir: Directory containing the manifest and bit array
+
+        Raises:
+            FileNotFoundError: If the manifest or bit array is missing
+            ValueError: If the filter was built with another format version
+        """
+        self.filter_dir = Path(filter_dir)
+        self.manifest = json.loads((self.filter_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        if self.manifest.get("format_version") != FILTER_FORMAT_VERSION:
+            raise ValueError(f"Unsupported candidate filter format: {self.manifest.get('format_version')}")
+        bits = np.memmap(self.filter_dir / BITS_NAME, dtype=np.uint8, mode="r")
+        super().__init__(self.manifest["num_bits"], self.manifest["num_hashes"], bits)
+
+    def is_stale(self) -> bool:
+        """Whether any source wordlist changed since the filter was built."""
+        return source_fingerprints(
+            [Path(src["path"]) for src in self.manifest.get("sources", [])]
+        ) != self.manifest.get("sources", [])
+
+
+def build_wordlist_filter(wordlists: Sequence[Path], filter_dir: Path, fp_rate: float) -> dict:
+    """Build the persistent candidate filter from wordlists.
+
+    Args:
+        wordlists: Source wordlists (missing files are skipped)
+        filter_dir: Output directory (an existing filter is replaced)
+        fp_rate: Target false positive rate
+
+    Returns:
+        The written manifest
+    """
+    filter_dir = Path(filter_dir)
+    filter_dir.mkdir(parents=True, exist_ok=True)
+    sources = [Path(w) for w in wordlists if Path(w).is_file()]
+    if not sources:
+        raise FileNotFoundError("No wordlists found to build the candidate filter from")
+
+    started = time.time()
+    capacity = sum(_count_lines(source) for source in sources)
+    bloom = BloomFilter.for_capacity(capacity, fp_rate)
+    items = 0
+    for source in sources:
+        with source.open("rb") as handle:
+            batch: List[bytes] = []
+            for line in handle:
+                word = line.rstrip(b"\r\n")
+                if word:
+                    batch.append(word)
+                if len(batch) >= _BUILD_BATCH:
+                    bloom.add_many(batch)
+                    items += len(batch)
+                    batch = []
+            bloom.add_many(batch)
+            items += len(batch)
+
+    bits_tmp = filter_dir / f"{BITS_NAME}.tmp"
+    bloom.bits.tofile(bits_tmp)
+    os.replace(bits_tmp, filter_dir / BITS_NAME)
+
+    manifest = {
+        "format_version": FILTER_FORMAT_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sources": source_fingerprints(sources),
+        "items": items,
+        "num_bits": bloom.num_bits,
+        "num_hashes": bloom.num_hashes,
+        "fp_rate": fp_rate,
+    }
+    (filter_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    logger.info(
+        f"Candidate filter: {items} words, {bloom.bits.nbytes / 2 ** 20:.1f} MiB, "
+        f"{bloom.num_hashes} probes ({time.time() - started:.1f}s)"
+    )
+    return manifest
+
+
+def _count_lines(path: Path) -> int:
+    count = 0
+    last = b"\n"
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            count += block.count(b"\n")
+            last = block[-1:]
+    return count + (0 if last == b"\n" else 1)
+
+
+# Global filter instance
+_wordlist_filter: Optional[WordlistFilter] = None
+_wordlist_filter_checked = False
+
+
+def get_wordlist_filter() -> Optional[WordlistFilter]:
+    """Get the process-wide wordlist filter, or None if it has not been built.
+
+    Returns:
+        WordlistFilter instance or None
+    """
+    global _wordlist_filter, _wordlist_filter_checked
+
+    if not _wordlist_filter_checked:
+        _wordlist_filter_checked = True
+        filter_dir = get_settings().candidate_filter_dir
+        if not (filter_dir / MANIFEST_NAME).exists():
+            logger.info(f"Candidate filter not found at {filter_dir}, only per-job dedup is applied")
+            return None
+        try:
+            _wordlist_filter = WordlistFilter(filter_dir)
+            if _wordlist_filter.is_stale():
+                logger.warning("Candidate filter is older than its wordlists; rebuild it with build-candidate-filter")
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning(f"Failed to open candidate filter: {exc}")
+            _wordlist_filter = None
+
+    return _wordlist_filter
@@ -0,0 +1,252 @@
+"""Adaptive phase time budgets learned from recorded phase outcomes.
+
+Every finished phase adds its outcome to per-hash-type counters:
+
+    phase_stats:{hash_type_id}:outcomes   ``{phase}:{counter}`` -> integer
+    phase_stats:hash_types                hash mode -> phases recorded
+
+with the counters ``runs``, ``hashes`` (targets attacked), ``cracks``,
+``seconds_ms`` (time spent), ``cracked_runs``/``crack_ms`` (runs that
+cracked something and their time), ``exhausted``/``exhausted_ms`` (runs
+that ran out of keyspace before their budget) and ``guesses``.
+
+Once every phase has ``adaptive_budget_min_samples`` runs for a hash mode,
+the budget split for that mode is re-weighted by each phase's cracks per
+hash per second of budget. Phases that usually exhaust their keyspace early
+are capped at the time they need and the rest is handed to the others;
+optionally phases are reordered by that rate or skipped when they (almost)
+never crack anything. A skipped phase still runs at the minimum share in
+``adaptive_budget_explore_rate`` of the plans, so its statistics keep up
+with the hashes being submitted. Without enough samples the fixed ``phaseN_time_ratio``
+split and order apply.
+"""
+
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from app.config import Settings, get_settings
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Phases sharing the job timeout; phase 0 is a lookup without a budget
+BUDGETED_PHASES = (1, 2, 3, 4)
+
+_HASH_TYPES_KEY = "phase_stats:hash_types"
+
+# Headroom over the typical time of a phase that exhausts its keyspace
+_EXHAUSTED_HEADROOM = 1.25
+
+
+def _outcomes_key(hash_type_id: int) -> str:
+    return f"phase_stats:{hash_type_id}:outcomes"
+
+
+@dataclass(frozen=True)
+class PhaseStats:
+    """Recorded outcomes of one phase for one hash mode."""
+
+    runs: int = 0
+    hashes: int = 0
+    cracks: int = 0
+    seconds_ms: int = 0
+    cracked_runs: int = 0
+    crack_ms: int = 0
+    exhausted: int = 0
+    exhausted_ms: int = 0
+    guesses: int = 0
+
+    @property
+    def crack_rate(self) -> float:
+        """Share of attacked hashes the phase cracked."""
+        return self.cracks / self.hashes if self.hashes else 0.0
+
+    @property
+    def avg_seconds(self) -> float:
+        return self.seconds_ms / self.runs / 1000 if self.runs else 0.0
+
+    @property
+    def avg_time_to_crack(self) -> Optional[float]:
+        return self.crack_ms / self.cracked_runs / 1000 if self.cracked_runs else None
+
+    @property
+    def exhausted_rate(self) -> float:
+        return self.exhausted / self.runs if self.runs else 0.0
+
+    @property
+    def exhausted_seconds(self) -> Optional[float]:
+        """Typical time of a run that exhausts the phase's keyspace."""
+        return self.exhausted_ms / self.exhausted / 1000 if self.exhausted else None
+
+    @property
+    def guesses_per_second(self) -> float:
+        return self.guesses * 1000 / self.seconds_ms if self.seconds_ms else 0.0
+
+    @property
+    def efficiency(self) -> float:
+        """Cracks per attacked hash per second spent in the phase."""
+        return self.crack_rate / self.avg_seconds if self.avg_seconds else 0.0
+
+
+@dataclass(frozen=True)
+class PhasePlan:
+    """Order and time shares of the phases of a job."""
+
+    order: Tuple[int, ...]
+    ratios: Dict[int, float] = field(default_factory=dict)
+    adaptive: bool = False
+
+    def budget(self, phase_num: int, timeout: float) -> int:
+        """Time budget of a phase in seconds."""
+        return int(timeout * self.ratios.get(phase_num, 0.0))
+
+
+def record_phase_outcome(
+    hash_type_id: int,
+    phase_num: int,
+    hashes: int,
+    cracks: int,
+    seconds: float,
+    attempts: int,
+    exhausted: bool,
+) -> None:
+    """Add a finished phase to the statistics of its hash mode.
+
+    Args:
+        hash_type_id: Hashcat hash mode
+        phase_num: Phase number
+        hashes: Hashes the phase attacked
+        cracks: Hashes the phase cracked
+        seconds: Time the phase ran (excluding preemption pauses)
+        attempts: Attempts reported by the phase
+        exhausted: Whether the phase ran out of candidates before its budget
+    """
+    elapsed_ms = int(seconds * 1000)
+    counters = {
+        "runs": 1,
+        "hashes": hashes,
+        "cracks": cracks,
+        "seconds_ms": elapsed_ms,
+        "guesses": attempts,
+    }
+    if cracks:
+        counters.update(cracked_runs=1, crack_ms=elapsed_ms)
+    if exhausted:
+        counters.update(exhausted=1, exhausted_ms=elapsed_ms)
+
+    redis = get_redis()
+    redis.increment_fields(_outcomes_key(hash_type_id), {f"{phase_num}:{k}": v for k, v in counters.items()})
+    redis.increment_fields(_HASH_TYPES_KEY, {str(hash_type_id): 1})
+
+
+def recorded_hash_types() -> Dict[int, int]:
+    """Hash modes with recorded outcomes and their number of recorded phases."""
+    return {int(k): v for k, v in get_redis().get_counters(_HASH_TYPES_KEY).items() if k.isdigit()}
+
+
+def load_phase_stats(hash_type_id: int) -> Dict[int, PhaseStats]:
+    """Recorded outcomes of every budgeted phase for a hash mode."""
+    counters = get_redis().get_counters(_outcomes_key(hash_type_id))
+    names = PhaseStats.__dataclass_fields__
+    stats = {}
+    for phase_num in BUDGETED_PHASES:
+        prefix = f"{phase_num}:"
+        stats[phase_num] = PhaseStats(**{
+            k[len(prefix):]: v for k, v in counters.items() if k.startswith(prefix) and k[len(prefix):] in names
+        })
+    return stats
+
+
+def static_plan(settings: Optional[Settings] = None) -> PhasePlan:
+    """The configured fixed split, phases in pipeline order."""
+    settings = settings or get_settings()
+    return PhasePlan(
+        order=(0, *BUDGETED_PHASES),
+        ratios={phase: getattr(settings, f"phase{phase}_time_ratio") for phase in BUDGETED_PHASES},
+    )
+
+
+def plan_phase_budgets(
+    stats: Dict[int, PhaseStats],
+    timeout: float,
+    settings: Optional[Settings] = None,
+) -> PhasePlan:
+    """Split a job's timeout across its phases from recorded outcomes.
+
+    Phases share the timeout in proportion to their configured share times
+    their efficiency. Phases that usually exhaust their keyspace are capped
+    at the time they typically need, phases that would get less than
+    ``adaptive_budget_min_ratio`` are raised to it, and the rest is shared
+    again by weight. Skipped phases are dropped, except in the plans that
+    explore them at ``adaptive_budget_min_ratio``.
+
+    Args:
+        stats: Per-phase statistics of the hash mode (``load_phase_stats``)
+        timeout: Job timeout in seconds
+        settings: Settings holding the ``adaptive_budget_*`` knobs
+
+    Returns:
+        Phase plan; the static plan while any phase lacks samples
+    """
+    settings = settings or get_settings()
+    fallback = static_plan(settings)
+    min_samples = settings.adaptive_budget_min_samples
+    if timeout <= 0 or any(stats.get(p, PhaseStats()).runs < min_samples for p in BUDGETED_PHASES):
+        return fallback
+
+    phases = [p for p in BUDGETED_PHASES if stats[p].crack_rate >= settings.adaptive_budget_skip_rate]
+    if not phases:
+        return fallback
+    skipped = [p for p in BUDGETED_PHASES if p not in phases]
+    explored = skipped if skipped and random.random() < settings.adaptive_budget_explore_rate else []
+
+    # Expected cracks per second of budget: configured share times observed efficiency
+    weights = {p: fallback.ratios[p] * stats[p].efficiency for p in phases}
+    if not any(weights.values()):
+        weights = {p: fallback.ratios[p] for p in phases}
+
+    caps = {}
+    for p in phases:
+        need = stats[p].exhausted_seconds
+        if need is not None and stats[p].exhausted_rate >= 0.5:
+            caps[p] = min(1.0, need * _EXHAUSTED_HEADROOM / timeout)
+
+    # Water-fill: pin phases over their cap (then under the floor) and share the rest by weight
+    floor = settings.adaptive_budget_min_ratio
+    ratios: Dict[int, float] = {p: min(floor, 1.0 / len(BUDGETED_PHASES)) for p in explored}
+    free = list(phases)
+    left = 1.0 - sum(ratios.values())
+    while free:
+        total = sum(weights[p] for p in free)
+        shares = {p: left * weights[p] / total if total else left / len(free) for p in free}
+        pinned = {p: caps[p] for p in free if p in caps and shares[p] > caps[p]}
+        if not pinned:
+            pinned = {p: floor for p in free if shares[p] < floor}
+            if not pinned or len(pinned) == len(free) or floor * len(pinned) >= left:
+                ratios.update(shares)
+                break
+        for p, share in pinned.items():
+            ratios[p] = share
+            left -= share
+            free.remove(p)
+
+    order = [p for p in BUDGETED_PHASES if p in ratios]
+    if settings.adaptive_budget_reorder:
+        order.sort(key=lambda p: stats[p].efficiency, reverse=True)
+    return PhasePlan(order=(0, *order), ratios=ratios, adaptive=True)
+
+
+def get_phase_plan(hash_type_id: int, timeout: float) -> PhasePlan:
+    """Phase plan of a job, adaptive when ``adaptive_budgets_enabled`` is set."""
+    settings = get_settings()
+    if not settings.adaptive_budgets_enabled:
+        return static_plan(settings)
+    plan = plan_phase_budgets(load_phase_stats(hash_type_id), timeout, settings)
+    if plan.adaptive:
+        logger.debug(
+            f"Adaptive budgets for hash type {hash_type_id}: order {plan.order}, "
+            + ", ".join(f"phase {p} {r:.0%}" for p, r in sorted(plan.ratios.items()))
+        )
+    return plan
@@ -0,0 +1,153 @@
+"""Checkpoint/resume of cracking jobs across Dramatiq retries.
+
+A job's progress is persisted in Redis under ``job:{job_id}:checkpoint``:
+which phases already finished, attempts and time spent so far, and how many
+candidates streamed phases have consumed. Hashcat phases run under a named
+session whose restore file, hash file and outfile live on the shared
+``settings.sessions_dir`` volume, so a retried (or preempted) job restarts
+the interrupted phase with ``--restore`` instead of rescanning its keyspace.
+"""
+
+from __future__ import annotations
+
+import logging
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+from app.config import get_settings
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HashcatSession:
+    """Files of one named hashcat session."""
+
+    name: str
+    work_dir: Path
+
+    @property
+    def restore_file(self) -> Path:
+        return self.work_dir / f"{self.name}.restore"
+
+    @property
+    def hash_file(self) -> Path:
+        return self.work_dir / "hashes.txt"
+
+    @property
+    def outfile(self) -> Path:
+        return self.work_dir / "hashcat.out"
+
+    def can_restore(self) -> bool:
+        """Whether hashcat left a restore point for this session."""
+        return self.restore_file.exists() and self.hash_file.exists()
+
+    def cleanup(self) -> None:
+        """Remove the session directory."""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class JobCheckpoint:
+    """Persistent per-job progress used to resume retried jobs."""
+
+    def __init__(self, job_id: str, scope: str = ""):
+        """Load (or start) the checkpoint of a job.
+
+        Args:
+            job_id: Job identifier
+            scope: Part of the job with a checkpoint of its own, e.g. a
+                keyspace shard run by another worker process; empty for the
+                job itself
+        """
+        self.job_id = job_id
+        self.scope = scope
+        self.settings = get_settings()
+        self.redis = get_redis()
+        self.key = f"job:{job_id}:checkpoint" + (f":{scope}" if scope else "")
+        self.session_root = self.settings.sessions_dir / job_id / scope if scope else self.settings.sessions_dir / job_id
+        self._started = time.time()
+        self.state: Dict = self.redis.get(self.key) or {
+            "completed_phases": [],
+            "attempts": 0,
+            "elapsed": 0.0,
+            "stream_offsets": {},
+        }
+
+    @property
+    def resumed(self) -> bool:
+        """Whether an earlier attempt of this job made progress."""
+        return bool(self.state["completed_phases"] or self.state["stream_offsets"] or self.state["elapsed"])
+
+    @property
+    def attempts(self) -> int:
+        return int(self.state["attempts"])
+
+    @property
+    def elapsed(self) -> float:
+        """Time spent by earlier attempts of the job."""
+        return float(self.state["elapsed"])
+
+    def is_complete(self, phase_key: str) -> bool:
+        """Whether a phase (or sub-step such as one mask) already finished."""
+        return phase_key in self.state["completed_phases"]
+
+    def session(self, phase_key: str) -> HashcatSession:
+        """Named hashcat session for a phase of this job."""
+        name = f"{self.job_id}_{self.scope}_{phase_key}" if self.scope else f"{self.job_id}_{phase_key}"
+        return HashcatSession(name=name, work_dir=self.session_root / phase_key)
+
+    def start(self, phase_key: str) -> None:
+        """Record that a phase is about to run."""
+        self.state["current_phase"] = phase_key
+        self._save()
+
+    def stream_offset(self, phase_key: str) -> int:
+        """Candidates a streamed phase already fed to hashcat."""
+        return int(self.state["stream_offsets"].get(phase_key, 0))
+
+    def record_stream_offset(self, phase_key: str, offset: int) -> None:
+        """Persist how many candidates a streamed phase has consumed."""
+        self.state["stream_offsets"][phase_key] = int(offset)
+        self._save()
+
+    def complete(self, phase_key: str, attempts: int = 0) -> None:
+        """Mark a phase finished and drop its hashcat session files.
+
+        Args:
+            phase_key: Phase key, e.g. ``"phase2"`` or ``"phase4_mask0"``
+            attempts: Attempts made by the phase
+        """
+        if phase_key not in self.state["completed_phases"]:
+            self.state["completed_phases"].append(phase_key)
+        self.state["attempts"] = self.attempts + int(attempts or 0)
+        self.state["stream_offsets"].pop(phase_key, None)
+        self.session(phase_key).cleanup()
+        self._save()
+
+    def clear(self) -> None:
+        """Remove the checkpoint once the job (or its scope) reached a terminal state."""
+        if not self.scope:
+            clear_checkpoint(self.job_id)
+            return
+        self.redis.delete(self.key)
+        shutil.rmtree(self.session_root, ignore_errors=True)
+
+    def _save(self) -> None:
+        now = time.time()
+        self.state["elapsed"] = self.elapsed + (now - self._started)
+        self._started = now
+        self.redis.set(self.key, self.state, ex=self.settings.redis_ttl)
+
+
+def clear_checkpoint(job_id: str) -> None:
+    """Drop the Redis checkpoint and hashcat session files of a job.
+
+    Args:
+        job_id: Job identifier
+    """
+    get_redis().delete(f"job:{job_id}:checkpoint")
+    shutil.rmtree(get_settings().sessions_dir / job_id, ignore_errors=True)
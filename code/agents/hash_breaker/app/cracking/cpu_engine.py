@@ -0,0 +1,364 @@
+"""Multi-core CPU cracking engine used when hashcat has no usable device.
+
+Candidate sources are split into independent work units (for example byte
+ranges of a memory-mapped wordlist) and hashed in batches across a shared
+process pool. Every unit reports an exact attempt count, and a run can be
+stopped early when all targets are cracked, the deadline passes, or the
+caller signals cancellation.
+
+A work unit is any picklable object with ``iter_batches(block_bytes)``
+yielding ``(candidates, tags)``; ``tags`` is None or a list parallel to
+``candidates`` naming what produced each one (a rule, a mask), and is
+reported back for cracked hashes.
+"""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+from app.cracking.hash_algorithms import get_digest_func
+from app.cracking.wordlist_store import get_wordlist_store
+from app.utils.metrics import cpu_guess_rate
+from app.utils.telemetry import observe
+
+logger = logging.getLogger(__name__)
+
+_POLL_INTERVAL = 0.25
+# Conservative per-process guess rate used until a run has been measured
+_DEFAULT_RATE_PER_WORKER = 500_000
+_measured_rates: Dict[int, float] = {}
+
+
+@dataclass
+class CpuAttackResult:
+    """Outcome of a CPU engine run."""
+
+    cracked_hashes: Dict[str, str] = field(default_factory=dict)
+    hit_tags: Dict[str, str] = field(default_factory=dict)
+    attempts: int = 0
+    duration: float = 0.0
+    timeout: bool = False
+    cancelled: bool = False
+
+    @property
+    def guesses_per_second(self) -> float:
+        return self.attempts / self.duration if self.duration > 0 else 0.0
+
+
+@dataclass(frozen=True)
+class WordlistRange:
+    """A byte range of a wordlist that starts and ends on line boundaries."""
+
+    path: str
+    start: int
+    end: int
+
+    def iter_batches(self, block_bytes: int) -> Iterator[Tuple[List[bytes], None]]:
+        """Yield the words of the range in blocks of roughly ``block_bytes``."""
+        if self.end <= self.start:
+            return
+        with open(self.path, "rb") as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = self.start
+                while pos < self.end:
+                    block_end = self.end
+                    if pos + block_bytes < self.end:
+                        newline = mm.find(b"\n", pos + block_bytes, self.end)
+                        if newline != -1:
+                            block_end = newline + 1
+                    words = [w.rstrip(b"\r") for w in mm[pos:block_end].split(b"\n")]
+                    yield [w for w in words if w], None
+                    pos = block_end
+
+
+def split_wordlist(path: Path, chunks: int, start: int = 0, end: Optional[int] = None) -> List[WordlistRange]:
+    """Split a wordlist into ``chunks`` byte ranges aligned to line boundaries.
+
+    Args:
+        path: Wordlist path
+        chunks: Desired number of ranges
+        start: Byte offset to start at (a line start)
+        end: Byte offset to stop at (a line start; None = end of file)
+
+    Returns:
+        Non-empty ranges covering ``[start, end)``
+    """
+    size = os.path.getsize(path)
+    end = size if end is None else min(end, size)
+    span = end - start
+    if span <= 0:
+        return []
+    chunks = max(1, min(chunks, span))
+    ranges = []
+    with open(path, "rb") as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, chunks + 1):
+                if i == chunks:
+                    stop = end
+                else:
+                    newline = mm.find(b"\n", max(start, end - span + span * i // chunks), end)
+                    stop = end if newline == -1 else newline + 1
+                if stop > start:
+                    ranges.append(WordlistRange(str(path), start, stop))
+                start = stop
+                if start >= end:
+                    break
+    return ranges
+
+
+def line_offsets(path: Path, lines: Sequence[int]) -> List[int]:
+    """Byte offset at which each given (0-based) line of a file starts.
+
+    Lines past the end of the file map to the file size.
+    """
+    wanted = sorted({n for n in lines if n > 0})
+    found = {0: 0}
+    if wanted:
+        with open(path, "rb") as handle:
+            pos = 0
+            pending = iter(wanted)
+            target = next(pending)
+            for count, line in enumerate(handle, 1):
+                pos += len(line)
+                if count == target:
+                    found[target] = pos
+                    target = next(pending, None)
+                    if target is None:
+                        break
+    size = os.path.getsize(path)
+    return [found.get(n, size) for n in lines]
+
+
+def wordlist_sources(wordlist: Path, chunks: int) -> List:
+    """Work units covering a wordlist.
+
+    Fixed-width buckets of the preprocessed wordlist store, limited to the
+    configured length policy, when the wordlist is in the store; otherwise
+    line-aligned byte ranges of the raw file.
+
+    Args:
+        wordlist: Source wordlist path
+        chunks: Desired number of units
+
+    Returns:
+        ``BucketRange`` or ``WordlistRange`` units
+    """
+    store = get_wordlist_store()
+    if store is not None:
+        settings = get_settings()
+        try:
+            ranges = store.ranges(Path(wordlist), chunks, settings.wordlist_min_length, settings.wordlist_max_length)
+        except OSError as exc:
+            logger.warning(f"Wordlist store: cannot read {Path(wordlist).name}, using the raw file: {exc}")
+            ranges = None
+        if ranges is not None:
+            return ranges
+    return split_wordlist(Path(wordlist), chunks)
+
+
+def run_cpu_attack(
+    sources: Sequence,
+    target_hashes: Sequence[str],
+    hash_type_id: int,
+    timeout: float,
+    phase: str,
+    should_cancel: Optional[Callable[[], bool]] = None,
+) -> CpuAttackResult:
+    """Hash the candidates of ``sources`` across the process pool.
+
+    Args:
+        sources: Picklable work units exposing ``iter_batches(block_bytes)``
+        target_hashes: Hex digests to recover
+        hash_type_id: Hashcat hash mode (must be supported by hash_algorithms)
+        timeout: Time budget in seconds
+        phase: Metrics label of the calling phase
+        should_cancel: Optional callback polled a few times per second
+
+    Returns:
+        CpuAttackResult with exact attempt count and recovered passwords
+
+    Raises:
+        ValueError: If the hash mode is not supported on CPU
+    """
+    if get_digest_func(hash_type_id) is None:
+        raise ValueError(f"Unsupported hash type for CPU engine: {hash_type_id}")
+
+    targets: Dict[bytes, str] = {}
+    for target in target_hashes:
+        try:
+            targets[bytes.fromhex(target.strip())] = target.strip().lower()
+        except ValueError:
+            logger.warning(f"CPU engine: skipping non-hex target {target!r}")
+
+    result = CpuAttackResult()
+    if not targets or not sources:
+        return result
+
+    settings = get_settings()
+    start_time = time.time()
+    deadline = start_time + max(0.0, timeout)
+    executor, manager = _get_pool()
+    stop_event = manager.Event()
+    target_digests = frozenset(targets)
+
+    try:
+        pending = {
+            executor.submit(
+                _crack_source,
+                source,
+                hash_type_id,
+                target_digests,
+                stop_event,
+                deadline,
+                settings.cpu_engine_block_bytes,
+            )
+            for source in sources
+        }
+        while pending:
+            done, pending = wait(pending, timeout=_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                found, attempts = future.result()
+                result.attempts += attempts
+                for digest, (password, tag) in found.items():
+                    result.cracked_hashes[targets[digest]] = password.decode("utf-8", errors="replace")
+                    if tag is not None:
+                        result.hit_tags[targets[digest]] = tag
+
+            if stop_event.is_set() or not pending:
+                continue
+            if len(result.cracked_hashes) == len(targets):
+                stop_event.set()
+            elif should_cancel is not None and should_cancel():
+                result.cancelled = True
+                stop_event.set()
+    except BrokenProcessPool:
+        stop_event.set()
+        _reset_pool()
+        raise
+    except BaseException:
+        # A failed worker fails the attack; stop the others instead of
+        # letting them run on until the deadline
+        stop_event.set()
+        raise
+
+    result.duration = time.time() - start_time
+    result.timeout = not result.cancelled and len(result.cracked_hashes) < len(targets) and time.time() >= deadline
+    cpu_guess_rate.labels(phase=phase).set(result.guesses_per_second)
+    if result.attempts and result.duration >= 1:
+        _measured_rates[hash_type_id] = result.guesses_per_second
+        observe("phase_guesses_per_second", result.guesses_per_second, phase)
+    logger.info(
+        f"CPU engine ({phase}): {result.attempts} candidates in {result.duration:.2f}s "
+        f"({result.guesses_per_second:,.0f} H/s), {len(result.cracked_hashes)}/{len(targets)} cracked"
+    )
+    return result
+
+
+def cpu_dictionary_attack(
+    target_hashes: Sequence[str],
+    hash_type_id: int,
+    wordlist: Path,
+    timeout: float,
+    phase: str,
+    should_cancel: Optional[Callable[[], bool]] = None,
+) -> CpuAttackResult:
+    """Run a straight dictionary attack with the CPU engine.
+
+    Args:
+        target_hashes: Hex digests to recover
+        hash_type_id: Hashcat hash mode
+        wordlist: Wordlist path
+        timeout: Time budget in seconds
+        phase: Metrics label of the calling phase
+        should_cancel: Optional cancellation callback
+
+    Returns:
+        CpuAttackResult
+    """
+    sources = wordlist_sources(Path(wordlist), cpu_worker_count() * get_settings().cpu_engine_chunks_per_worker)
+    return run_cpu_attack(sources, target_hashes, hash_type_id, timeout, phase, should_cancel)
+
+
+def estimate_rate(hash_type_id: int) -> float:
+    """Expected guesses/sec of the engine for a hash mode.
+
+    Uses the rate measured by the last run of at least one second in this
+    process, or a conservative per-worker default.
+    """
+    return _measured_rates.get(hash_type_id) or _DEFAULT_RATE_PER_WORKER * cpu_worker_count()
+
+
+def cpu_worker_count() -> int:
+    """Number of processes in the CPU engine pool."""
+    configured = get_settings().cpu_engine_workers
+    return configured if configured > 0 else (os.cpu_count() or 1)
+
+
+def _crack_source(
+    source,
+    hash_type_id: int,
+    target_digests: frozenset,
+    stop_event,
+    deadline: float,
+    block_bytes: int,
+) -> Tuple[Dict[bytes, Tuple[bytes, Optional[str]]], int]:
+    """Pool worker: hash every candidate of one work unit."""
+    digest_func = get_digest_func(hash_type_id)
+    found: Dict[bytes, Tuple[bytes, Optional[str]]] = {}
+    attempts = 0
+
+    for batch, tags in source.iter_batches(block_bytes):
+        if stop_event.is_set() or time.time() >= deadline:
+            break
+        for candidate in batch:
+            digest = digest_func(candidate)
+            if digest in target_digests and digest not in found:
+                found[digest] = (candidate, tags[batch.index(candidate)] if tags else None)
+        attempts += len(batch)
+        if len(found) == len(target_digests):
+            stop_event.set()
+            break
+
+    return found, attempts
+
+
+# Global process pool shared by all phases of this worker process
+_pool: Optional[ProcessPoolExecutor] = None
+_manager = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _manager
+
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the Dramatiq worker is multithreaded, forking it is unsafe
+            context = multiprocessing.get_context("spawn")
+            _manager = context.Manager()
+            _pool = ProcessPoolExecutor(max_workers=cpu_worker_count(), mp_context=context)
+            logger.info(f"CPU engine: started pool with {cpu_worker_count()} processes")
+        return _pool, _manager
+
+
+def _reset_pool() -> None:
+    global _pool, _manager
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        if _manager is not None:
+            _manager.shutdown()
+        _pool = None
+        _manager = None
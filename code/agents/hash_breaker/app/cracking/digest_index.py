@@ -0,0 +1,271 @@
+"""Precomputed digest index for instant lookups of common passwords.
+
+The index answers "is this hash the digest of a word in our top wordlists?"
+without starting hashcat. Layout of ``settings.digest_index_dir``:
+
+    plains.bin        every indexed word, newline terminated
+    <algo>.keys       sorted uint64 keys (first 8 digest bytes, big-endian)
+    <algo>.offsets    uint32 offset into plains.bin for each key
+    manifest.json     format version, source wordlist stamp, record counts
+
+Keys are truncated digests, so every hit is verified by re-hashing the stored
+plaintext; a truncated-key collision can therefore never produce a wrong
+password. Both tables are memory-mapped and searched with a binary search.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from app.config import get_settings
+from app.cracking.hash_algorithms import DIGEST_ALGORITHMS, get_digest_func
+from app.utils.fingerprints import source_fingerprints
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+PLAINS_NAME = "plains.bin"
+_MAX_PLAINS_SIZE = 2 ** 32
+
+
+@dataclass
+class _DigestTable:
+    keys: np.ndarray
+    offsets: np.ndarray
+    digest_size: int
+
+
+class DigestIndex:
+    """Read-only, memory-mapped digest index."""
+
+    def __init__(self, index_dir: Path):
+        """Open an index built by ``build_digest_index``.
+
+        Args:
+            index_dir: Directory containing the manifest and tables
+
+        Raises:
+            FileNotFoundError: If the manifest or plaintext store is missing
+            ValueError: If the index was built with another format version
+        """
+        self.index_dir = Path(index_dir)
+        self.manifest = json.loads((self.index_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        if self.manifest.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported digest index format: {self.manifest.get('format_version')}")
+
+        self._plains_handle = open(self.index_dir / PLAINS_NAME, "rb")
+        self._plains = mmap.mmap(self._plains_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._tables: Dict[int, _DigestTable] = {}
+
+        for name, info in self.manifest.get("types", {}).items():
+            hash_type_id = int(info["hash_type_id"])
+            if hash_type_id not in DIGEST_ALGORITHMS or not info.get("records"):
+                continue
+            self._tables[hash_type_id] = _DigestTable(
+                keys=np.memmap(self.index_dir / f"{name}.keys", dtype="<u8", mode="r"),
+                offsets=np.memmap(self.index_dir / f"{name}.offsets", dtype="<u4", mode="r"),
+                digest_size=DIGEST_ALGORITHMS[hash_type_id][2],
+            )
+
+    @property
+    def version(self) -> str:
+        """Version stamp of the wordlists the index was built from."""
+        return self.manifest.get("version", "")
+
+    def supports(self, hash_type_id: int) -> bool:
+        """Whether a table exists for the given hash mode."""
+        return hash_type_id in self._tables
+
+    def is_stale(self) -> bool:
+        """Whether any source wordlist changed since the index was built.
+
+        A stale index is still correct (every hit is verified) but no longer
+        covers the current wordlists, so it should be rebuilt.
+        """
+        return source_fingerprints(
+            [Path(src["path"]) for src in self.manifest.get("sources", [])]
+        ) != self.manifest.get("sources", [])
+
+    def lookup(self, hash_type_id: int, target_hash: str) -> Optional[str]:
+        """Look up the plaintext of a single hex digest.
+
+        Args:
+            hash_type_id: Hashcat hash mode
+            target_hash: Hex encoded digest
+
+        Returns:
+            The plaintext if the digest is indexed, otherwise None
+        """
+        table = self._tables.get(hash_type_id)
+        if table is None:
+            return None
+        try:
+            digest = bytes.fromhex(target_hash.strip())
+        except ValueError:
+            return None
+        if len(digest) != table.digest_size:
+            return None
+
+        digest_func = get_digest_func(hash_type_id)
+        key = np.uint64(int.from_bytes(digest[:8], "big"))
+        pos = int(np.searchsorted(table.keys, key, side="left"))
+        while pos < len(table.keys) and table.keys[pos] == key:
+            word = self._plain_at(int(table.offsets[pos]))
+            if digest_func(word) == digest:
+                return word.decode("utf-8", errors="replace")
+            pos += 1
+        return None
+
+    def lookup_many(self, hash_type_id: int, target_hashes: Iterable[str]) -> Dict[str, str]:
+        """Look up several digests, returning only the ones found."""
+        found = {}
+        for target_hash in target_hashes:
+            password = self.lookup(hash_type_id, target_hash)
+            if password is not None:
+                found[target_hash] = password
+        return found
+
+    def close(self) -> None:
+        """Release the memory maps."""
+        self._tables.clear()
+        self._plains.close()
+        self._plains_handle.close()
+
+    def _plain_at(self, offset: int) -> bytes:
+        end = self._plains.find(b"\n", offset)
+        return self._plains[offset:end if end != -1 else len(self._plains)]
+
+
+def build_digest_index(
+    wordlists: Sequence[Path],
+    index_dir: Path,
+    hash_type_ids: Optional[Sequence[int]] = None,
+) -> dict:
+    """Build the on-disk digest index from wordlists.
+
+    Words are indexed in wordlist order; duplicate words collapse onto the
+    same key and only the first occurrence is kept.
+
+    Args:
+        wordlists: Source wordlists (missing files are skipped)
+        index_dir: Output directory (existing tables are replaced)
+        hash_type_ids: Hash modes to index (defaults to every supported mode)
+
+    Returns:
+        The written manifest
+    """
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    sources = [Path(w) for w in wordlists if Path(w).is_file()]
+    if not sources:
+        raise FileNotFoundError("No wordlists found to index")
+    hash_type_ids = list(hash_type_ids or DIGEST_ALGORITHMS.keys())
+
+    started = time.time()
+    offsets = array("I")
+    plains_tmp = index_dir / f"{PLAINS_NAME}.tmp"
+    written = 0
+    with plains_tmp.open("wb") as out:
+        for source in sources:
+            with source.open("rb") as handle:
+                for line in handle:
+                    word = line.rstrip(b"\r\n")
+                    if not word:
+                        continue
+                    if written + len(word) + 1 > _MAX_PLAINS_SIZE:
+                        raise ValueError("Wordlists exceed the 4 GiB plaintext store limit")
+                    offsets.append(written)
+                    out.write(word + b"\n")
+                    written += len(word) + 1
+    os.replace(plains_tmp, index_dir / PLAINS_NAME)
+    offsets_np = np.frombuffer(offsets, dtype=np.uint32)
+    logger.info(f"Digest index: stored {len(offsets_np)} words from {len(sources)} wordlists")
+
+    types = {}
+    for hash_type_id in hash_type_ids:
+        if hash_type_id not in DIGEST_ALGORITHMS:
+            logger.warning(f"Digest index: hash type {hash_type_id} is not supported, skipping")
+            continue
+        name, digest_func, _ = DIGEST_ALGORITHMS[hash_type_id]
+        type_started = time.time()
+
+        prefixes = bytearray()
+        with (index_dir / PLAINS_NAME).open("rb") as handle:
+            for line in handle:
+                prefixes += digest_func(line[:-1])[:8]
+        keys = np.frombuffer(bytes(prefixes), dtype=">u8").astype("<u8")
+
+        unique_keys, first_index = np.unique(keys, return_index=True)
+        unique_keys.tofile(index_dir / f"{name}.keys")
+        offsets_np[first_index].astype("<u4").tofile(index_dir / f"{name}.offsets")
+
+        types[name] = {"hash_type_id": hash_type_id, "records": int(len(unique_keys))}
+        logger.info(
+            f"Digest index: {name} table with {len(unique_keys)} records "
+            f"({time.time() - type_started:.1f}s)"
+        )
+
+    fingerprints = source_fingerprints(sources)
+    manifest = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "version": _version_stamp(sources),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sources": fingerprints,
+        "words": int(len(offsets_np)),
+        "types": types,
+    }
+    (index_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    logger.info(f"Digest index: built version {manifest['version']} in {time.time() - started:.1f}s")
+    return manifest
+
+
+def _version_stamp(sources: Sequence[Path]) -> str:
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(source.name.encode("utf-8") + b"\0")
+        with source.open("rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+# Global index instance
+_digest_index: Optional[DigestIndex] = None
+_digest_index_checked = False
+
+
+def get_digest_index() -> Optional[DigestIndex]:
+    """Get the process-wide digest index, or None if it has not been built.
+
+    Returns:
+        DigestIndex instance or None
+    """
+    global _digest_index, _digest_index_checked
+
+    if not _digest_index_checked:
+        _digest_index_checked = True
+        index_dir = get_settings().digest_index_dir
+        if not (index_dir / MANIFEST_NAME).exists():
+            logger.info(f"Digest index not found at {index_dir}, instant lookup disabled")
+            return None
+        try:
+            _digest_index = DigestIndex(index_dir)
+            if _digest_index.is_stale():
+                logger.warning("Digest index is older than its wordlists; rebuild it with build-digest-index")
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Failed to open digest index: {exc}")
+            _digest_index = None
+
+    return _digest_index
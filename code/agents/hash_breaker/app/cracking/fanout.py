@@ -0,0 +1,346 @@
+"""Keyspace fan-out of long phases across the worker pool.
+
+A fanned-out phase is split into ``count`` keyspace shards (hashcat
+``--skip``/``--limit``, or a share of the work units in the CPU engines).
+The job's own worker claims shard 0 and enqueues the others as
+``process_keyspace_shard`` messages. Idle workers get
+``keyspace_shard_claim_grace`` seconds to claim them; the parent then claims
+every shard still unclaimed and splits the rest of the phase budget among
+the shards it owns, so no slice is left uncovered on a busy pool. When no
+worker claimed any shard the phase simply runs unsharded on the parent.
+
+Every shard keeps its own checkpoint (``JobCheckpoint`` scoped to the
+shard), so a retried job restores the hashcat sessions of its shards, and
+runs under a device lease, so shards yield to higher priority jobs like
+unsharded phases do.
+
+Shard state lives in Redis next to the job:
+
+    job:{job_id}:shards:phase{N}             hash of shard index -> result,
+                                             plus ``stop`` once every
+                                             target hash is cracked
+    job:{job_id}:shards:phase{N}:claim:{i}   owner of shard i
+
+Shards poll ``stop`` and the job status, so the first crack of the last
+uncracked hash (or a cancellation) kills the hashcat runs of all shards.
+"""
+
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+from app.config import get_settings
+from app.cracking.checkpoint import JobCheckpoint
+from app.cracking.hashcat_runner import CancelCallback, KeyspaceShard, StatusCallback, normalize_hash
+from app.cracking.phases import mask_attack, rule_based_attack
+from app.cracking.scheduler import DeviceLease, get_scheduler
+from app.models.enums import JobPriority, JobStatus
+from app.utils.metrics import keyspace_shards_total
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Phases whose keyspace can be split with --skip/--limit
+SHARDED_PHASES = {
+    2: rule_based_attack,
+    4: mask_attack,
+}
+
+# How long the parent waits for shards still running on other workers
+# after the phase deadline
+_STRAGGLER_GRACE = 15
+_POLL_INTERVAL = 0.5
+
+_TERMINAL_STATUSES = (JobStatus.SUCCESS, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class KeyspaceFanout:
+    """Shared state of one fanned-out phase of a job."""
+
+    def __init__(self, job_id: str, phase_num: int, count: int):
+        """Initialize the fan-out.
+
+        Args:
+            job_id: Parent job identifier
+            phase_num: Phase being split (a key of ``SHARDED_PHASES``)
+            count: Number of shards
+        """
+        self.job_id = job_id
+        self.phase_num = phase_num
+        self.count = count
+        self.redis = get_redis()
+        self.key = f"job:{job_id}:shards:phase{phase_num}"
+
+    def run(
+        self,
+        target_hashes: Sequence[str],
+        hash_type_id: int,
+        timeout: float,
+        on_status: Optional[StatusCallback] = None,
+        checkpoint: Optional[JobCheckpoint] = None,
+        lease: Optional[DeviceLease] = None,
+    ) -> Dict:
+        """Run the phase on the worker pool and merge the shard results.
+
+        Args:
+            target_hashes: Hashes to crack (all of ``hash_type_id``)
+            hash_type_id: Hashcat hash mode
+            timeout: Phase time budget in seconds
+            on_status: Status callback for the shards run by this worker
+            checkpoint: Job checkpoint, used when the phase runs unsharded
+            lease: Device lease of the job, for the shards run by this worker
+
+        Returns:
+            Phase result dict, as returned by the unsharded attack
+        """
+        from app.workers.cracking_worker import process_keyspace_shard
+
+        targets = list(target_hashes)
+        deadline = time.time() + timeout
+        owner = f"parent:{uuid.uuid4()}"
+        ttl = int(timeout) + _STRAGGLER_GRACE
+        self._reset(ttl)
+        self.claim(0, owner, ttl)
+        for index in range(1, self.count):
+            process_keyspace_shard.send(
+                self.job_id, self.phase_num, index, self.count, targets, hash_type_id, deadline
+            )
+        logger.info(f"Phase {self.phase_num}: Fanned out into {self.count} keyspace shards")
+
+        grace = min(get_settings().keyspace_shard_claim_grace, timeout / 2)
+        owned = self._claim_leftovers(owner, ttl, time.time() + grace)
+        if len(owned) == self.count:
+            logger.info(f"Phase {self.phase_num}: No worker claimed a shard, running the phase unsharded")
+            result = _run_attack(
+                self.phase_num, targets, hash_type_id, deadline, checkpoint, on_status, self.stopped, lease
+            )
+            self.redis.delete(self.key)
+            return result
+
+        # Split what is left of the budget among the shards this worker owns
+        for position, index in enumerate(owned):
+            share = (deadline - time.time()) / (len(owned) - position)
+            run_keyspace_shard(
+                self.job_id,
+                self.phase_num,
+                index,
+                self.count,
+                targets,
+                hash_type_id,
+                time.time() + share,
+                runner="parent",
+                owner=owner,
+                on_status=on_status,
+                lease=lease,
+            )
+
+        return self._merge(self._wait(deadline + _STRAGGLER_GRACE), targets, hash_type_id)
+
+    def claim(self, index: int, owner: str, ttl: int) -> bool:
+        """Claim a shard; only the owner of a shard runs it."""
+        return self.redis.claim(f"{self.key}:claim:{index}", owner, ex=max(1, ttl)) == owner
+
+    def stopped(self) -> bool:
+        """Whether shards should stop: every hash cracked or the job is over."""
+        if self.redis.get_field(self.key, "stop"):
+            return True
+        return self.redis.get_field(f"job:{self.job_id}", "status") in _TERMINAL_STATUSES
+
+    def report(self, index: int, result: Dict, target_hashes: Sequence[str], hash_type_id: int) -> None:
+        """Store a shard result; stop the other shards once every hash is cracked."""
+        self.redis.set_fields(
+            self.key,
+            {
+                str(index): {
+                    "cracked_hashes": result.get("cracked_hashes") or {},
+                    "attempts": int(result.get("attempts", 0) or 0),
+                    "method": result.get("method"),
+                    "timeout": bool(result.get("timeout")),
+                    "error": result.get("error"),
+                }
+            },
+        )
+        if not result.get("cracked"):
+            return
+        cracked = set()
+        for entry in self._results().values():
+            cracked.update(entry["cracked_hashes"])
+        if all(normalize_hash(h, hash_type_id) in cracked for h in target_hashes):
+            self.redis.set_fields(self.key, {"stop": True})
+            logger.info(f"Phase {self.phase_num}: All hashes cracked, stopping remaining shards")
+
+    def _claim_leftovers(self, owner: str, ttl: int, until: float) -> List[int]:
+        """Wait until ``until`` for workers to claim shards, then claim the rest."""
+        claims = [f"{self.key}:claim:{index}" for index in range(1, self.count)]
+        while time.time() < until and not all(self.redis.exists(claim) for claim in claims):
+            time.sleep(_POLL_INTERVAL)
+        return [index for index in range(self.count) if self.claim(index, owner, ttl)]
+
+    def _reset(self, ttl: int) -> None:
+        self.redis.delete(self.key)
+        for index in range(self.count):
+            self.redis.delete(f"{self.key}:claim:{index}")
+        self.redis.set_fields(self.key, {"stop": False}, ex=ttl)
+
+    def _results(self) -> Dict[str, Dict]:
+        return {k: v for k, v in self.redis.get_fields(self.key).items() if k.isdigit()}
+
+    def _wait(self, until: float) -> Dict[str, Dict]:
+        results = self._results()
+        while len(results) < self.count and time.time() < until:
+            time.sleep(_POLL_INTERVAL)
+            results = self._results()
+        if len(results) < self.count:
+            logger.warning(f"Phase {self.phase_num}: {self.count - len(results)} shards did not report in time")
+        return results
+
+    def _merge(self, results: Dict[str, Dict], target_hashes: List[str], hash_type_id: int) -> Dict:
+        cracked_hashes: Dict[str, str] = {}
+        method = None
+        for entry in results.values():
+            if entry["cracked_hashes"] and method is None:
+                method = entry.get("method")
+            cracked_hashes.update(entry["cracked_hashes"])
+
+        merged = {
+            "cracked": bool(cracked_hashes),
+            "attempts": sum(entry["attempts"] for entry in results.values()),
+            "phase": self.phase_num,
+            "shards": self.count,
+        }
+        if cracked_hashes:
+            normalized = [normalize_hash(h, hash_type_id) for h in target_hashes]
+            merged["password"] = next(
+                (cracked_hashes[h] for h in normalized if h in cracked_hashes),
+                next(iter(cracked_hashes.values())),
+            )
+            merged["method"] = method
+            merged["cracked_hashes"] = cracked_hashes
+        if any(entry["timeout"] for entry in results.values()):
+            merged["timeout"] = True
+        if self.redis.get_field(f"job:{self.job_id}", "status") == JobStatus.CANCELLED:
+            merged["cancelled"] = True
+
+        self.redis.delete(self.key)
+        for index in range(self.count):
+            JobCheckpoint(self.job_id, _shard_scope(self.phase_num, index, self.count)).clear()
+        return merged
+
+
+def run_keyspace_shard(
+    job_id: str,
+    phase_num: int,
+    index: int,
+    count: int,
+    target_hashes: Sequence[str],
+    hash_type_id: int,
+    deadline: float,
+    runner: str = "worker",
+    owner: Optional[str] = None,
+    on_status: Optional[StatusCallback] = None,
+    lease: Optional[DeviceLease] = None,
+) -> Optional[Dict]:
+    """Claim and attack one keyspace shard of a phase.
+
+    Args:
+        job_id: Parent job identifier
+        phase_num: Phase being split
+        index: Shard index
+        count: Number of shards
+        target_hashes: Hashes to crack
+        hash_type_id: Hashcat hash mode
+        deadline: Epoch time the shard's budget runs out
+        runner: Metrics label of the caller (``worker`` or ``parent``)
+        owner: Claim the shard was already taken with (parent)
+        on_status: Callback receiving hashcat's periodic status reports
+        lease: Device lease the shard yields through when preempted; a
+            shard run by another worker takes its own with the job's priority
+
+    Returns:
+        Shard result dict, or None if another worker owns the shard
+    """
+    fanout = KeyspaceFanout(job_id, phase_num, count)
+    remaining = deadline - time.time()
+    owner = owner or f"{runner}:{uuid.uuid4()}"
+    if not fanout.claim(index, owner, max(0, int(remaining)) + _STRAGGLER_GRACE):
+        return None
+
+    if remaining < 1 or fanout.stopped():
+        # Report anyway so the parent does not wait for this shard
+        result = {"cracked": False, "attempts": 0, "phase": phase_num}
+        keyspace_shards_total.labels(phase=str(phase_num), runner="skipped").inc()
+    else:
+        logger.info(f"Job {job_id}: Phase {phase_num} shard {index + 1}/{count} ({runner}, {remaining:.0f}s)")
+        keyspace_shards_total.labels(phase=str(phase_num), runner=runner).inc()
+        scope = _shard_scope(phase_num, index, count)
+        own_lease = lease is None
+        if own_lease:
+            # A shard on another worker takes the device with its job's priority
+            priority = fanout.redis.get_field(f"job:{job_id}", "priority") or JobPriority.NORMAL
+            lease = get_scheduler().admit(f"{job_id}:{scope}", priority, max_pause=remaining)
+        try:
+            result = _run_attack(
+                phase_num,
+                target_hashes,
+                hash_type_id,
+                deadline,
+                JobCheckpoint(job_id, scope),
+                on_status,
+                fanout.stopped,
+                lease,
+                shard=KeyspaceShard(index, count),
+            )
+        finally:
+            if own_lease:
+                get_scheduler().release(lease.job_id)
+    fanout.report(index, result, target_hashes, hash_type_id)
+    return result
+
+
+def _run_attack(
+    phase_num: int,
+    target_hashes: Sequence[str],
+    hash_type_id: int,
+    deadline: float,
+    checkpoint: Optional[JobCheckpoint],
+    on_status: Optional[StatusCallback],
+    should_cancel: CancelCallback,
+    lease: Optional[DeviceLease],
+    shard: Optional[KeyspaceShard] = None,
+) -> Dict:
+    """Attack (a shard of) a phase until ``deadline``, yielding the device when asked.
+
+    A preempted run waits for the device and runs again, restoring its
+    hashcat sessions from ``checkpoint``; unlike an unsharded phase the wait
+    counts against the deadline the other shards share. Attempts are summed
+    over the runs.
+    """
+    should_pause = lease.should_yield if lease is not None and lease.preemptible else None
+    attempts = 0
+    while True:
+        result = SHARDED_PHASES[phase_num](
+            list(target_hashes),
+            hash_type_id,
+            max(1, int(deadline - time.time())),
+            checkpoint=checkpoint,
+            on_status=on_status,
+            should_cancel=should_cancel,
+            should_pause=should_pause,
+            shard=shard,
+        )
+        attempts += int(result.get("attempts", 0) or 0)
+        if not result.get("preempted") or result.get("cracked") or deadline - time.time() < 1:
+            break
+        lease.wait_turn(should_cancel, limit=deadline - time.time())
+        if should_cancel():
+            break
+    # Whatever was interrupted is out of time now; nothing is left to resume
+    result.pop("preempted", None)
+    result["attempts"] = attempts
+    return result
+
+
+def _shard_scope(phase_num: int, index: int, count: int) -> str:
+    """Checkpoint scope of a keyspace shard."""
+    return f"phase{phase_num}_shard{index}of{count}"
@@ -0,0 +1,105 @@
+"""Digest functions for the unsalted hash modes cracked outside hashcat.
+
+Maps hashcat hash modes to ``bytes -> digest bytes`` callables so the digest
+index and the CPU engines hash candidates exactly like hashcat does.
+"""
+
+import hashlib
+import struct
+from typing import Callable, Dict, Optional
+
+from app.config import HashType
+
+DigestFunc = Callable[[bytes], bytes]
+
+
+def _md5(data: bytes) -> bytes:
+    return hashlib.md5(data).digest()
+
+
+def _sha1(data: bytes) -> bytes:
+    return hashlib.sha1(data).digest()
+
+
+def _sha256(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def _sha512(data: bytes) -> bytes:
+    return hashlib.sha512(data).digest()
+
+
+def _ntlm(data: bytes) -> bytes:
+    return _md4(data.decode("utf-8", errors="replace").encode("utf-16-le"))
+
+
+def _md4(data: bytes) -> bytes:
+    try:
+        return hashlib.new("md4", data).digest()
+    except ValueError:
+        # OpenSSL 3 builds drop MD4 from the default provider
+        return _md4_pure(data)
+
+
+def _md4_pure(data: bytes) -> bytes:
+    """RFC 1320 MD4, used only when OpenSSL does not provide it."""
+    def rotl(x, n):
+        x &= 0xFFFFFFFF
+        return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
+    message = bytearray(data)
+    bit_len = (8 * len(data)) & 0xFFFFFFFFFFFFFFFF
+    message.append(0x80)
+    while len(message) % 64 != 56:
+        message.append(0)
+    message += struct.pack("<Q", bit_len)
+
+    a, b, c, d = 0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476
+    for chunk in range(0, len(message), 64):
+        x = struct.unpack("<16I", message[chunk:chunk + 64])
+        aa, bb, cc, dd = a, b, c, d
+
+        for i in (0, 4, 8, 12):
+            a = rotl(a + ((b & c) | (~b & d)) + x[i], 3)
+            d = rotl(d + ((a & b) | (~a & c)) + x[i + 1], 7)
+            c = rotl(c + ((d & a) | (~d & b)) + x[i + 2], 11)
+            b = rotl(b + ((c & d) | (~c & a)) + x[i + 3], 19)
+        for i in (0, 1, 2, 3):
+            a = rotl(a + ((b & c) | (b & d) | (c & d)) + x[i] + 0x5A827999, 3)
+            d = rotl(d + ((a & b) | (a & c) | (b & c)) + x[i + 4] + 0x5A827999, 5)
+            c = rotl(c + ((d & a) | (d & b) | (a & b)) + x[i + 8] + 0x5A827999, 9)
+            b = rotl(b + ((c & d) | (c & a) | (d & a)) + x[i + 12] + 0x5A827999, 13)
+        for i in (0, 2, 1, 3):
+            a = rotl(a + (b ^ c ^ d) + x[i] + 0x6ED9EBA1, 3)
+            d = rotl(d + (a ^ b ^ c) + x[i + 8] + 0x6ED9EBA1, 9)
+            c = rotl(c + (d ^ a ^ b) + x[i + 4] + 0x6ED9EBA1, 11)
+            b = rotl(b + (c ^ d ^ a) + x[i + 12] + 0x6ED9EBA1, 15)
+
+        a = (a + aa) & 0xFFFFFFFF
+        b = (b + bb) & 0xFFFFFFFF
+        c = (c + cc) & 0xFFFFFFFF
+        d = (d + dd) & 0xFFFFFFFF
+
+    return struct.pack("<4I", a, b, c, d)
+
+
+# hashcat mode -> (short name, digest function, digest size in bytes)
+DIGEST_ALGORITHMS: Dict[int, tuple] = {
+    HashType.MD5.value: ("md5", _md5, 16),
+    HashType.SHA1.value: ("sha1", _sha1, 20),
+    HashType.SHA256.value: ("sha256", _sha256, 32),
+    HashType.SHA512.value: ("sha512", _sha512, 64),
+    HashType.NTLM.value: ("ntlm", _ntlm, 16),
+}
+
+
+def get_digest_func(hash_type_id: int) -> Optional[DigestFunc]:
+    """Return the digest function for a hash mode, or None if unsupported."""
+    entry = DIGEST_ALGORITHMS.get(hash_type_id)
+    return entry[1] if entry else None
+
+
+def get_algorithm_name(hash_type_id: int) -> Optional[str]:
+    """Return the short algorithm name for a hash mode, or None if unsupported."""
+    entry = DIGEST_ALGORITHMS.get(hash_type_id)
+    return entry[0] if entry else None
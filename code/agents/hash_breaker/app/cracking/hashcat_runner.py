@@ -2,15 +2,25 @@
 
 from __future__ import annotations
 
+import io
+import json
 import logging
+import os
+import signal
 import subprocess
+import threading
 import time
-from dataclasses import dataclass
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Iterable, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-from app.config import get_settings
+from app.config import HashType, get_settings
+from app.utils.telemetry import observe
+
+if TYPE_CHECKING:
+    from app.cracking.checkpoint import HashcatSession
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +32,57 @@ _NO_DEVICE_ERRORS = (
     "no devices available",
 )
 
+# Candidates are written to hashcat's stdin in chunks of this size, or
+# sooner when a slow producer has not filled a chunk within the interval
+_STDIN_CHUNK_BYTES = 1 << 20
+_STDIN_FLUSH_INTERVAL = 0.5
+
+# hashcat exits with -1 (255) on errors such as an unreadable restore file
+_EXIT_ERROR = 255
+
+# How often a running hashcat polls its job's cancellation callback
+_CANCEL_POLL_INTERVAL = 0.5
+
+# How long an interrupted (preempted) hashcat may take to write its restore point
+_INTERRUPT_GRACE = 10
+
+# Upper bound for a --keyspace query (hashcat counts wordlist lines)
+_KEYSPACE_TIMEOUT = 60
+
+# Mask keyspaces never change; wordlist ones are queried every time
+_mask_keyspaces: Dict[tuple, int] = {}
+
+
+@dataclass
+class HashcatStatus:
+    """One ``--status-json`` report of a running hashcat process."""
+
+    status: int
+    progress_done: int
+    progress_total: int
+    speed: float
+    recovered: int
+    recovered_total: int
+    estimated_stop: Optional[float] = None
+
+    @property
+    def fraction(self) -> float:
+        """Share of the keyspace covered so far (0 for unknown keyspaces)."""
+        if self.progress_total <= 0:
+            return 0.0
+        return min(1.0, self.progress_done / self.progress_total)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds until hashcat expects to exhaust the keyspace."""
+        if self.estimated_stop is None:
+            return None
+        return max(0.0, self.estimated_stop - time.time())
+
+
+StatusCallback = Callable[[HashcatStatus], None]
+CancelCallback = Callable[[], bool]
+
 
 @dataclass
 class HashcatResult:
@@ -34,67 +95,224 @@ class HashcatResult:
     timeout: bool
     error_type: Optional[str] = None
     attempts: Optional[int] = None
+    cracked_hashes: Dict[str, str] = field(default_factory=dict)
+    status: Optional[HashcatStatus] = None
+    cancelled: bool = False
+    preempted: bool = False
+
+
+@dataclass
+class _RunOutcome:
+    """How one hashcat process ended."""
+
+    stdout: str
+    stderr: str
+    exit_code: int
+    timeout: bool = False
+    cancelled: bool = False
+    preempted: bool = False
+    attempts: Optional[int] = None
+    last_status: Optional[HashcatStatus] = None
+
+
+@dataclass(frozen=True)
+class KeyspaceShard:
+    """One of ``count`` equal slices of a phase's keyspace."""
+
+    index: int
+    count: int
+
+    def bounds(self, keyspace: int) -> tuple[int, int]:
+        """Return ``(skip, limit)`` of this slice of a keyspace."""
+        start = keyspace * self.index // self.count
+        end = keyspace * (self.index + 1) // self.count
+        return start, end - start
+
+    def hashcat_args(self, keyspace: int) -> List[str]:
+        """``--skip``/``--limit`` arguments restricting hashcat to this slice."""
+        skip, limit = self.bounds(keyspace)
+        return ["--skip", str(skip), "--limit", str(limit)]
+
+    def select(self, units: Sequence) -> list:
+        """Pick this shard's share of pre-split work units (CPU engines)."""
+        return list(units[self.index::self.count])
+
+
+def normalize_hash(target_hash: str, hash_type_id: int) -> str:
+    """Normalize a hash the way hashcat reports it in the outfile.
+
+    Hex digests are case-insensitive and hashcat prints them lowercase;
+    crypt-style hashes (bcrypt) are compared verbatim.
+    """
+    normalized = target_hash.strip()
+    if hash_type_id == HashType.BCRYPT.value:
+        return normalized
+    return normalized.lower()
 
 
 def run_hashcat_attack(
-    target_hash: str,
+    target_hash: Union[str, Sequence[str]],
     hash_type_id: int,
     attack_mode: int,
     attack_args: Optional[List[str]],
     timeout: int,
     stdin_iter: Optional[Iterable[str]] = None,
+    session: Optional["HashcatSession"] = None,
+    on_status: Optional[StatusCallback] = None,
+    should_cancel: Optional[CancelCallback] = None,
+    should_pause: Optional[CancelCallback] = None,
 ) -> HashcatResult:
-    """Run a hashcat attack with consistent handling and output parsing."""
+    """Run a hashcat attack with consistent handling and output parsing.
+
+    ``target_hash`` may be a single hash or a sequence of hashes of the same
+    type. All hashes are written into one hash file so a batch pays hashcat
+    startup, kernel compilation and the wordlist scan only once; every
+    recovered hash is returned in ``cracked_hashes``.
+
+    With a ``session``, hashcat runs as a named session whose files live in
+    the session directory instead of a temporary one. If an earlier run of
+    the same session left a restore point, hashcat is started with
+    ``--restore`` and continues from it. Stdin attacks cannot be restored by
+    hashcat, so they ignore ``session``.
+
+    Hashcat prints a JSON status report every ``hashcat_status_timer``
+    seconds; each one is passed to ``on_status`` from a reader thread, and
+    the last one provides the attempt count (keyspace progress) of the run.
+
+    ``should_cancel`` is polled every ``_CANCEL_POLL_INTERVAL`` seconds while
+    hashcat runs; when it returns True the whole hashcat process group is
+    killed and the result is marked ``cancelled``. ``should_pause`` is
+    polled the same way; when it returns True hashcat is interrupted with
+    SIGINT, which makes it write its restore point before exiting, and the
+    result is marked ``preempted`` so the session can be restored later.
+    """
     settings = get_settings()
-    normalized_hash = target_hash.strip()
+    targets = [target_hash] if isinstance(target_hash, str) else list(target_hash)
+    normalized_hashes = _unique_hashes(targets, hash_type_id)
     timeout = max(1, int(timeout))
     start_time = time.time()
     attack_args = attack_args or []
+    if stdin_iter is not None:
+        session = None
 
-    with TemporaryDirectory(prefix="hashcat_") as tmp_dir:
+    if session is None:
+        work_dir = TemporaryDirectory(prefix="hashcat_")
+    else:
+        session.work_dir.mkdir(parents=True, exist_ok=True)
+        work_dir = nullcontext(str(session.work_dir))
+
+    with work_dir as tmp_dir:
         tmp_path = Path(tmp_dir)
-        hash_file = _write_hash_file(tmp_path, normalized_hash)
         outfile = tmp_path / "hashcat.out"
 
-        cmd = _build_hashcat_cmd(
-            settings,
-            hash_type_id,
-            attack_mode,
-            hash_file,
-            attack_args,
-            outfile,
-            timeout,
-            use_stdin=stdin_iter is not None,
-        )
-
-        if stdin_iter is None:
-            stdout, stderr, exit_code, timeout_hit = _run_hashcat(cmd, timeout)
-            attempts = None
-        else:
-            stdout, stderr, exit_code, timeout_hit, attempts = _run_hashcat_streaming(
-                cmd,
-                stdin_iter,
+        restored = False
+        if session is not None and session.can_restore():
+            logger.info(f"Hashcat: restoring session {session.name}")
+            cmd = _build_restore_cmd(settings, session)
+            outcome = _run_hashcat(cmd, timeout, on_status, should_cancel, should_pause)
+            restored = (
+                outcome.timeout or outcome.cancelled or outcome.preempted or outcome.exit_code != _EXIT_ERROR
+            )
+            if not restored:
+                logger.warning(f"Hashcat: restore of session {session.name} failed, starting over")
+                session.restore_file.unlink(missing_ok=True)
+
+        if not restored:
+            hash_file = _write_hash_file(tmp_path, normalized_hashes)
+            cmd = _build_hashcat_cmd(
+                settings,
+                hash_type_id,
+                attack_mode,
+                hash_file,
+                attack_args,
+                outfile,
                 timeout,
-                start_time,
+                use_stdin=stdin_iter is not None,
             )
-
-        password = _read_outfile(outfile)
+            if session is not None:
+                cmd.extend(_session_args(session))
+
+            if stdin_iter is None:
+                outcome = _run_hashcat(cmd, timeout, on_status, should_cancel, should_pause)
+            else:
+                outcome = _run_hashcat_streaming(
+                    cmd,
+                    stdin_iter,
+                    timeout,
+                    start_time,
+                    on_status,
+                    should_cancel,
+                    should_pause,
+                )
+
+        attempts = outcome.attempts
+        if attempts is None and outcome.last_status is not None:
+            attempts = outcome.last_status.progress_done
+
+        cracked_hashes = _read_outfile(outfile, normalized_hashes)
+        password = _first_password(cracked_hashes, normalized_hashes)
         duration = time.time() - start_time
-        error_type = _detect_error_type(stderr)
+        error_type = _detect_error_type(outcome.stderr)
 
         return HashcatResult(
-            cracked=bool(password),
+            cracked=bool(cracked_hashes),
             password=password,
-            exit_code=exit_code,
-            stdout=stdout,
-            stderr=stderr,
+            exit_code=outcome.exit_code,
+            stdout=outcome.stdout,
+            stderr=outcome.stderr,
             duration=duration,
-            timeout=timeout_hit,
+            timeout=outcome.timeout,
             error_type=error_type,
             attempts=attempts,
+            cracked_hashes=cracked_hashes,
+            status=outcome.last_status,
+            cancelled=outcome.cancelled,
+            preempted=outcome.preempted,
         )
 
 
+def hashcat_keyspace(hash_type_id: int, attack_mode: int, attack_args: List[str]) -> Optional[int]:
+    """Ask hashcat for the ``--skip``/``--limit`` keyspace of an attack.
+
+    This is the base keyspace hashcat slices on (wordlist lines for rule
+    attacks, the outer mask positions for mask attacks), not the number of
+    candidates.
+
+    Returns:
+        Keyspace, or None if hashcat could not report it
+    """
+    cache_key = (hash_type_id, *attack_args)
+    if attack_mode == 3 and cache_key in _mask_keyspaces:
+        return _mask_keyspaces[cache_key]
+
+    settings = get_settings()
+    cmd = [
+        settings.hashcat_path,
+        "-m",
+        str(hash_type_id),
+        "-a",
+        str(attack_mode),
+        *attack_args,
+        "--keyspace",
+        "--quiet",
+    ]
+    if settings.hashcat_force:
+        cmd.append("--force")
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=_KEYSPACE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        logger.warning(f"Hashcat: keyspace query failed: {exc}")
+        return None
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines or not lines[-1].strip().isdigit():
+        logger.warning(f"Hashcat: keyspace query failed (exit code {proc.returncode}): {proc.stderr.strip()[:200]}")
+        return None
+    keyspace = int(lines[-1].strip())
+    if attack_mode == 3:
+        _mask_keyspaces[cache_key] = keyspace
+    return keyspace
+
+
 def _build_hashcat_cmd(
     settings,
     hash_type_id: int,
@@ -118,6 +336,20 @@ def _build_hashcat_cmd(
     return cmd
 
 
+def _session_args(session: "HashcatSession") -> List[str]:
+    return [
+        "--session",
+        session.name,
+        "--restore-file-path",
+        str(session.restore_file),
+    ]
+
+
+def _build_restore_cmd(settings, session: "HashcatSession") -> List[str]:
+    # The restore file records the original argv; only the session may be given
+    return [settings.hashcat_path, "--restore", *_session_args(session)]
+
+
 def _common_hashcat_args(settings, outfile: Path, timeout: int, use_stdin: bool) -> List[str]:
     args = [
         "--runtime",
@@ -126,7 +358,11 @@ def _common_hashcat_args(settings, outfile: Path, timeout: int, use_stdin: bool)
         "--outfile",
         str(outfile),
         "--outfile-format",
-        "2",
+        "1,2",
+        "--status",
+        "--status-json",
+        "--status-timer",
+        str(max(1, int(settings.hashcat_status_timer))),
     ]
 
     if settings.hashcat_force:
@@ -139,25 +375,19 @@ def _common_hashcat_args(settings, outfile: Path, timeout: int, use_stdin: bool)
     return args
 
 
-def _run_hashcat(cmd: List[str], timeout: int) -> tuple[str, str, int, bool]:
-    timeout_hit = False
-    try:
-        completed = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-        )
-        stdout = completed.stdout or ""
-        stderr = completed.stderr or ""
-        exit_code = completed.returncode
-    except subprocess.TimeoutExpired as exc:
-        stdout = exc.stdout or ""
-        stderr = exc.stderr or ""
-        exit_code = -1
-        timeout_hit = True
+def _run_hashcat(
+    cmd: List[str],
+    timeout: int,
+    on_status: Optional[StatusCallback] = None,
+    should_cancel: Optional[CancelCallback] = None,
+    should_pause: Optional[CancelCallback] = None,
+) -> _RunOutcome:
+    proc = _spawn(cmd, stdin=None)
+    reader = _OutputReader(proc, on_status, _attack_label(cmd))
+    stop = _wait(proc, time.time() + timeout, should_cancel, should_pause)
 
-    return stdout, stderr, exit_code, timeout_hit
+    stdout, stderr = reader.join()
+    return _outcome(proc, stdout, stderr, stop, reader.last_status)
 
 
 def _run_hashcat_streaming(
@@ -165,73 +395,324 @@ def _run_hashcat_streaming(
     stdin_iter: Iterable[str],
     timeout: int,
     start_time: float,
-) -> tuple[str, str, int, bool, int]:
-    timeout_hit = False
+    on_status: Optional[StatusCallback] = None,
+    should_cancel: Optional[CancelCallback] = None,
+    should_pause: Optional[CancelCallback] = None,
+) -> _RunOutcome:
+    stop = None
     attempts = 0
 
-    proc = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
+    proc = _spawn(cmd, stdin=subprocess.PIPE)
+    reader = _OutputReader(proc, on_status, _attack_label(cmd))
+    spawned_at = time.time()
 
+    # Candidates are joined into large binary chunks; a full pipe blocks the
+    # write, which backpressures the producer instead of buffering unbounded
+    chunk = bytearray()
+    chunk_count = 0
+    last_flush = time.time()
     for candidate in stdin_iter:
-        if time.time() - start_time >= timeout:
-            timeout_hit = True
-            break
-        if proc.poll() is not None:
+        now = time.time()
+        if now - start_time >= timeout:
+            stop = "timeout"
             break
         if not candidate:
             continue
-        try:
-            proc.stdin.write(candidate + "\n")
-            attempts += 1
-            if attempts % 1000 == 0:
-                proc.stdin.flush()
-        except BrokenPipeError:
-            break
+        chunk += candidate.encode("utf-8", errors="surrogateescape")
+        chunk += b"\n"
+        chunk_count += 1
+        if len(chunk) >= _STDIN_CHUNK_BYTES or now - last_flush >= _STDIN_FLUSH_INTERVAL:
+            stop = _poll_stop(should_cancel, should_pause)
+            if stop:
+                break
+            if proc.poll() is not None or not _write_chunk(proc, chunk):
+                chunk.clear()
+                break
+            attempts += chunk_count
+            chunk.clear()
+            chunk_count = 0
+            last_flush = now
+
+    if stop == "cancelled":
+        _kill_group(proc)
+    elif stop == "preempted":
+        _interrupt_group(proc)
+    elif chunk and stop is None and proc.poll() is None and _write_chunk(proc, chunk):
+        attempts += chunk_count
 
     if proc.stdin:
         try:
             proc.stdin.close()
         except Exception:
             pass
+    feed_seconds = time.time() - spawned_at
+    if attempts and feed_seconds > 0:
+        observe("hashcat_stdin_candidates_per_second", attempts / feed_seconds)
+
+    if stop in (None, "timeout"):
+        stop = _wait(proc, start_time + timeout, should_cancel, should_pause) or stop
+
+    stdout, stderr = reader.join()
+    outcome = _outcome(proc, stdout, stderr, stop, reader.last_status)
+    outcome.attempts = attempts
+    return outcome
+
+
+def _outcome(
+    proc: subprocess.Popen,
+    stdout: str,
+    stderr: str,
+    stop: Optional[str],
+    last_status: Optional[HashcatStatus],
+) -> _RunOutcome:
+    return _RunOutcome(
+        stdout=stdout,
+        stderr=stderr,
+        exit_code=-1 if stop or proc.returncode is None else proc.returncode,
+        timeout=stop == "timeout",
+        cancelled=stop == "cancelled",
+        preempted=stop == "preempted",
+        last_status=last_status,
+    )
+
+
+def _spawn(cmd: List[str], stdin) -> subprocess.Popen:
+    # A session of its own lets cancellation and timeouts kill hashcat
+    # together with any helper processes it started
+    started = time.time()
+    proc = subprocess.Popen(
+        cmd,
+        stdin=stdin,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    observe("hashcat_spawn_seconds", time.time() - started, _attack_label(cmd))
+    return proc
+
+
+def _attack_label(cmd: List[str]) -> str:
+    """Attack mode of a hashcat command line for telemetry (``restore`` for --restore)."""
+    if "-a" in cmd[:-1]:
+        return cmd[cmd.index("-a") + 1]
+    return "restore" if "--restore" in cmd else "unknown"
+
+
+def _poll_stop(should_cancel: Optional[CancelCallback], should_pause: Optional[CancelCallback]) -> Optional[str]:
+    if should_cancel is not None and should_cancel():
+        return "cancelled"
+    if should_pause is not None and should_pause():
+        return "preempted"
+    return None
 
-    remaining = max(0, timeout - (time.time() - start_time))
+
+def _wait(
+    proc: subprocess.Popen,
+    deadline: float,
+    should_cancel: Optional[CancelCallback],
+    should_pause: Optional[CancelCallback] = None,
+) -> Optional[str]:
+    """Wait for hashcat until it exits, the deadline passes, or the job is cancelled or preempted.
+
+    Returns:
+        None if hashcat exited on its own, else ``"timeout"``, ``"cancelled"``
+        or ``"preempted"``
+    """
+    polled = should_cancel is not None or should_pause is not None
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            _kill_group(proc)
+            return "timeout"
+        try:
+            proc.wait(timeout=min(remaining, _CANCEL_POLL_INTERVAL) if polled else remaining)
+            return None
+        except subprocess.TimeoutExpired:
+            pass
+        stop = _poll_stop(should_cancel, should_pause)
+        if stop == "cancelled":
+            _kill_group(proc)
+            return stop
+        if stop == "preempted":
+            _interrupt_group(proc)
+            return stop
+
+
+def _kill_group(proc: subprocess.Popen) -> None:
     try:
-        stdout, stderr = proc.communicate(timeout=remaining)
-    except subprocess.TimeoutExpired:
-        timeout_hit = True
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
         proc.kill()
-        stdout, stderr = proc.communicate()
+    proc.wait()
+
+
+def _interrupt_group(proc: subprocess.Popen) -> None:
+    # SIGINT makes hashcat write its restore point before exiting
+    try:
+        os.killpg(proc.pid, signal.SIGINT)
+        proc.wait(timeout=_INTERRUPT_GRACE)
+    except (ProcessLookupError, PermissionError, subprocess.TimeoutExpired):
+        _kill_group(proc)
 
-    exit_code = proc.returncode if proc.returncode is not None else -1
-    return stdout or "", stderr or "", exit_code, timeout_hit, attempts
 
+def _write_chunk(proc: subprocess.Popen, chunk: bytearray) -> bool:
+    try:
+        proc.stdin.write(chunk)
+        proc.stdin.flush()
+        return True
+    except (BrokenPipeError, OSError):
+        return False
+
+
+class _OutputReader:
+    """Drain hashcat's stdout and stderr on background threads.
+
+    Status reports are parsed out of stdout and handed to ``on_status``;
+    everything else is kept for error detection. The first report showing
+    progress is timed as the run's time to first guess.
+    """
+
+    def __init__(self, proc: subprocess.Popen, on_status: Optional[StatusCallback], label: str = "unknown"):
+        self.on_status = on_status
+        self.last_status: Optional[HashcatStatus] = None
+        self._label = label
+        self._started = time.time()
+        self._first_guess = False
+        self._stdout: List[str] = []
+        self._stderr: List[str] = []
+        self._threads = [
+            threading.Thread(target=self._read_stdout, args=(_text(proc.stdout),), daemon=True),
+            threading.Thread(target=self._stderr.extend, args=(_text(proc.stderr),), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _read_stdout(self, stream) -> None:
+        for line in stream:
+            status = parse_status_line(line)
+            if status is None:
+                self._stdout.append(line)
+                continue
+            self.last_status = status
+            if not self._first_guess and status.progress_done > 0:
+                self._first_guess = True
+                observe("hashcat_first_guess_seconds", time.time() - self._started, self._label)
+            if self.on_status is not None:
+                try:
+                    self.on_status(status)
+                except Exception as exc:
+                    logger.warning(f"Hashcat status callback failed: {exc}")
+
+    def join(self) -> tuple[str, str]:
+        for thread in self._threads:
+            thread.join(timeout=5)
+        return "".join(self._stdout), "".join(self._stderr)
+
+
+def _text(stream) -> io.TextIOWrapper:
+    return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+
+
+def parse_status_line(line: str) -> Optional[HashcatStatus]:
+    """Parse one ``--status-json`` line, returning None for other output."""
+    line = line.strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        data = json.loads(line)
+        progress = data.get("progress") or [0, 0]
+        recovered = data.get("recovered_hashes") or [0, 0]
+        return HashcatStatus(
+            status=int(data.get("status", 0)),
+            progress_done=int(progress[0]),
+            progress_total=int(progress[1]),
+            speed=float(sum(device.get("speed", 0) for device in data.get("devices") or [])),
+            recovered=int(recovered[0]),
+            recovered_total=int(recovered[1]),
+            estimated_stop=data.get("estimated_stop"),
+        )
+    except (ValueError, TypeError, IndexError, AttributeError):
+        return None
 
-def _write_hash_file(tmp_path: Path, target_hash: str) -> Path:
+
+def _unique_hashes(targets: Sequence[str], hash_type_id: int) -> List[str]:
+    seen = set()
+    unique = []
+    for target in targets:
+        normalized = normalize_hash(target, hash_type_id)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            unique.append(normalized)
+    return unique
+
+
+def _write_hash_file(tmp_path: Path, target_hashes: Sequence[str]) -> Path:
     hash_file = tmp_path / "hashes.txt"
-    hash_file.write_text(target_hash.strip() + "\n", encoding="utf-8")
+    hash_file.write_text("".join(f"{h}\n" for h in target_hashes), encoding="utf-8")
     return hash_file
 
 
-def _read_outfile(outfile: Path) -> Optional[str]:
+def _read_outfile(outfile: Path, target_hashes: Sequence[str]) -> Dict[str, str]:
+    """Parse a ``hash:plain`` outfile (format 1,2) into a hash -> password map.
+
+    Salted modes print ``hash:salt:plain``, so the line is matched against
+    the known target hashes as a prefix instead of being split on the first
+    ``:``. Lines matching no target fall back to the first-colon split.
+    """
+    cracked: Dict[str, str] = {}
+    targets = {target.lower(): target for target in target_hashes}
     try:
         if not outfile.exists():
-            return None
+            return cracked
         with outfile.open("r", encoding="utf-8", errors="ignore") as handle:
             for line in handle:
-                line = line.strip()
+                line = line.rstrip("\r\n")
                 if not line or ":" not in line:
                     continue
-                return line.split(":", 1)[1].strip()
+                matched = _match_target(line, targets)
+                if matched is None:
+                    cracked_hash, password = line.split(":", 1)
+                    cracked_hash = cracked_hash.strip()
+                else:
+                    cracked_hash, password = matched
+                cracked.setdefault(cracked_hash, _decode_plain(password))
     except OSError as exc:
         logger.warning(f"Failed reading hashcat outfile: {exc}")
+    return cracked
+
+
+def _match_target(line: str, targets: Dict[str, str]) -> Optional[Tuple[str, str]]:
+    """Split a line into ``(target, plain)`` at the longest prefix naming a target.
+
+    Longest first, so ``hash:salt`` wins over a bare ``hash`` sharing its
+    prefix and a plain containing ``:`` stays intact.
+    """
+    end = line.rfind(":")
+    while end > 0:
+        target = targets.get(line[:end].lower())
+        if target is not None:
+            return target, line[end + 1:]
+        end = line.rfind(":", 0, end)
     return None
 
 
+def _decode_plain(password: str) -> str:
+    # hashcat emits $HEX[...] for plains containing separators or non-printables
+    if password.startswith("$HEX[") and password.endswith("]"):
+        try:
+            return bytes.fromhex(password[5:-1]).decode("utf-8", errors="replace")
+        except ValueError:
+            return password
+    return password
+
+
+def _first_password(cracked_hashes: Dict[str, str], target_hashes: Sequence[str]) -> Optional[str]:
+    for target in target_hashes:
+        if target in cracked_hashes:
+            return cracked_hashes[target]
+    return next(iter(cracked_hashes.values()), None)
+
+
 def _detect_error_type(stderr: str) -> Optional[str]:
     if not stderr:
         return None
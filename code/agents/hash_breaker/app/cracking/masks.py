@@ -0,0 +1,275 @@
+"""Hashcat mask parsing, planning, keyspace partitioning and CPU enumeration.
+
+A mask keyspace is treated as a mixed-radix number: candidate ``i`` is
+derived arithmetically from its index, so any index range can be generated
+independently by a pool worker. Enumeration is vectorised with numpy and
+emits fixed-width candidates sliced out of one buffer per block.
+
+Masks can also be derived from PCFG structure frequencies (the D&C-GEN
+``pattern<TAB>rate`` file, e.g. ``L6 N2``), planned by probability per
+candidate and written out as a hashcat ``.hcmask`` queue.
+"""
+
+from __future__ import annotations
+
+import math
+import string
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+CHARSETS = {
+    "l": string.ascii_lowercase,
+    "u": string.ascii_uppercase,
+    "d": string.digits,
+    "s": " !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~",
+    "h": "0123456789abcdef",
+    "H": "0123456789ABCDEF",
+}
+CHARSETS["a"] = CHARSETS["l"] + CHARSETS["u"] + CHARSETS["d"] + CHARSETS["s"]
+
+# Index arithmetic is done in uint64
+MAX_KEYSPACE = 2 ** 64 - 1
+
+# Mask of each PCFG character class (letters, numbers, specials)
+PCFG_CLASSES = {"L": "?l", "N": "?d", "S": "?s"}
+
+# PCFG ``L`` covers both cases; approximate share of passwords whose letters
+# are all lowercase, and lowercase behind a capital first letter
+LETTER_CASE_SHARES = {"lower": 0.75, "capitalized": 0.15}
+
+
+def parse_mask(mask: str) -> List[bytes]:
+    """Parse a hashcat mask into one charset per position.
+
+    Args:
+        mask: Mask such as ``"?u?l?l?l?d?d"``; ``??`` is a literal ``?``
+
+    Returns:
+        Charset bytes for every position
+
+    Raises:
+        ValueError: On unknown built-in charsets or a dangling ``?``
+    """
+    charsets: List[bytes] = []
+    i = 0
+    while i < len(mask):
+        char = mask[i]
+        if char == "?":
+            if i + 1 >= len(mask):
+                raise ValueError(f"Dangling '?' in mask {mask!r}")
+            name = mask[i + 1]
+            if name == "?":
+                charsets.append(b"?")
+            elif name in CHARSETS:
+                charsets.append(CHARSETS[name].encode("ascii"))
+            else:
+                raise ValueError(f"Unsupported charset ?{name} in mask {mask!r}")
+            i += 2
+        else:
+            charsets.append(char.encode("latin-1"))
+            i += 1
+    return charsets
+
+
+def mask_length(mask: str) -> int:
+    """Number of positions of a mask."""
+    return len(parse_mask(mask))
+
+
+def mask_keyspace(mask: str) -> int:
+    """Number of candidates a mask enumerates."""
+    return math.prod(len(charset) for charset in parse_mask(mask))
+
+
+def mask_prefix(mask: str, length: int) -> str:
+    """Return the mask restricted to its first ``length`` positions."""
+    out = []
+    positions = 0
+    i = 0
+    while i < len(mask) and positions < length:
+        step = 2 if mask[i] == "?" else 1
+        out.append(mask[i:i + step])
+        positions += 1
+        i += step
+    return "".join(out)
+
+
+def expand_increment(mask: str, increment_min: int = 1) -> List[str]:
+    """Expand a mask the way ``--increment`` does: every prefix from ``increment_min`` up."""
+    length = mask_length(mask)
+    return [mask_prefix(mask, n) for n in range(max(1, increment_min), length + 1)]
+
+
+def pattern_mask(pattern: str, capitalize: bool = False) -> str:
+    """Translate a PCFG pattern such as ``"L6 N2"`` into a hashcat mask.
+
+    Args:
+        pattern: Space separated ``<class><length>`` segments
+        capitalize: Make the first position ``?u`` (the pattern must start with letters)
+
+    Returns:
+        Mask such as ``"?l?l?l?l?l?l?d?d"``
+
+    Raises:
+        ValueError: On unknown classes or malformed segments
+    """
+    positions: List[str] = []
+    for segment in pattern.split():
+        name, length = segment[:1], segment[1:]
+        if name not in PCFG_CLASSES or not length.isdigit() or int(length) < 1:
+            raise ValueError(f"Invalid PCFG segment {segment!r} in {pattern!r}")
+        positions.extend([PCFG_CLASSES[name]] * int(length))
+    if capitalize:
+        if not positions or positions[0] != "?l":
+            raise ValueError(f"Pattern {pattern!r} does not start with letters")
+        positions[0] = "?u"
+    return "".join(positions)
+
+
+def pcfg_masks(patterns: Sequence[Tuple[str, float]]) -> List[Tuple[str, float]]:
+    """Masks and hit probabilities for PCFG patterns and their rates.
+
+    Patterns starting with letters yield a lowercase and a capitalized mask,
+    splitting the pattern's rate by ``LETTER_CASE_SHARES``; malformed
+    patterns are skipped.
+
+    Args:
+        patterns: ``(pattern, rate)`` pairs (see ``load_patterns``)
+
+    Returns:
+        ``(mask, probability)`` pairs for ``plan_masks``
+    """
+    masks: List[Tuple[str, float]] = []
+    for pattern, rate in patterns:
+        try:
+            if pattern.lstrip().startswith("L"):
+                masks.append((pattern_mask(pattern), rate * LETTER_CASE_SHARES["lower"]))
+                masks.append((pattern_mask(pattern, capitalize=True), rate * LETTER_CASE_SHARES["capitalized"]))
+            else:
+                masks.append((pattern_mask(pattern), rate))
+        except ValueError:
+            continue
+    return masks
+
+
+def write_hcmask(plan: Sequence["PlannedMask"], path: Path) -> Path:
+    """Write planned masks as a hashcat ``.hcmask`` queue, one mask per line.
+
+    Hashcat runs the queue top to bottom, so the file keeps the plan order.
+    ``,`` in masks would start a custom charset definition and is escaped.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="latin-1") as handle:
+        for planned in plan:
+            handle.write(planned.mask.replace(",", "\\,") + "\n")
+    return path
+
+
+@dataclass(frozen=True)
+class MaskRange:
+    """A half-open index range ``[start, end)`` of one mask keyspace."""
+
+    mask: str
+    start: int
+    end: int
+
+    def iter_batches(self, block_bytes: int) -> Iterator[Tuple[List[bytes], List[str]]]:
+        """Yield ``(candidates, mask tags)`` for roughly ``block_bytes`` of candidates."""
+        charsets = parse_mask(self.mask)
+        width = len(charsets)
+        tables = [np.frombuffer(charset, dtype=np.uint8) for charset in charsets]
+        radices = [np.uint64(len(charset)) for charset in charsets]
+        per_block = max(1, block_bytes // max(1, width))
+
+        for block_start in range(self.start, self.end, per_block):
+            block_end = min(self.end, block_start + per_block)
+            count = block_end - block_start
+            index = np.arange(count, dtype=np.uint64) + np.uint64(block_start)
+            out = np.empty((count, width), dtype=np.uint8)
+            for pos in range(width - 1, -1, -1):
+                out[:, pos] = tables[pos][index % radices[pos]]
+                index //= radices[pos]
+            flat = out.tobytes()
+            yield [flat[i:i + width] for i in range(0, len(flat), width)], [self.mask] * count
+
+
+@dataclass
+class PlannedMask:
+    """A mask selected for a run, with how much of its keyspace to cover."""
+
+    mask: str
+    probability: float
+    keyspace: int
+    candidates: int
+
+    @property
+    def density(self) -> float:
+        """Estimated hit probability per candidate."""
+        return self.probability / self.keyspace if self.keyspace else 0.0
+
+
+def plan_masks(
+    masks: Sequence[Tuple[str, float]],
+    budget_candidates: int,
+    increment_min: int = 1,
+    increment: bool = True,
+) -> List[PlannedMask]:
+    """Schedule masks by estimated hit probability per candidate.
+
+    Each mask is expanded into its increment prefixes (which inherit the
+    mask's probability, so short and cheap prefixes run first). Masks are
+    then ordered by probability per unit of keyspace, i.e. expected hits per
+    second at a fixed guess rate, and the candidate budget is handed out in
+    that order; the last mask that does not fit is covered partially.
+
+    Args:
+        masks: ``(mask, estimated hit probability)`` pairs
+        budget_candidates: Candidates the time budget allows
+        increment_min: Shortest prefix length to include
+        increment: Expand increment prefixes; PCFG masks already carry
+            the probability of their exact length and are planned as is
+
+    Returns:
+        Planned masks in execution order
+    """
+    expanded = {}
+    for mask, probability in masks:
+        for prefix in expand_increment(mask, increment_min) if increment else [mask]:
+            keyspace = mask_keyspace(prefix)
+            if keyspace > MAX_KEYSPACE:
+                continue
+            if prefix not in expanded or expanded[prefix].probability < probability:
+                expanded[prefix] = PlannedMask(prefix, probability, keyspace, keyspace)
+
+    plan = []
+    remaining = max(0, int(budget_candidates))
+    for planned in sorted(expanded.values(), key=lambda p: p.density, reverse=True):
+        if remaining <= 0:
+            break
+        planned.candidates = min(planned.keyspace, remaining)
+        remaining -= planned.candidates
+        plan.append(planned)
+    return plan
+
+
+def split_mask_ranges(plan: Sequence[PlannedMask], units: int, min_unit: int = 50000) -> List[MaskRange]:
+    """Partition each planned mask's covered index range into work units.
+
+    Args:
+        plan: Planned masks in execution order
+        units: Target number of units per mask (typically workers x chunks)
+        min_unit: Smallest range worth a separate unit
+
+    Returns:
+        Mask ranges, preserving plan order
+    """
+    ranges: List[MaskRange] = []
+    for planned in plan:
+        size = max(min_unit, -(-planned.candidates // max(1, units)))
+        for start in range(0, planned.candidates, size):
+            ranges.append(MaskRange(planned.mask, start, min(planned.candidates, start + size)))
+    return ranges
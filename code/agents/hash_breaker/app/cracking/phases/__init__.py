@@ -1,11 +1,13 @@
 """Cracking phases implementation."""
 
+from .phase0_lookup import instant_lookup_attack
 from .phase1_dictionary import quick_dictionary_attack
 from .phase2_rules import rule_based_attack
 from .phase3_pagpassgpt import ai_generation_attack
 from .phase4_mask import mask_attack
 
 __all__ = [
+    "instant_lookup_attack",
     "quick_dictionary_attack",
     "rule_based_attack",
     "ai_generation_attack",
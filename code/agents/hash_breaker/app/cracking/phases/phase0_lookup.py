@@ -0,0 +1,79 @@
+"""Phase 0: Instant Digest Lookup.
+
+Answers common passwords from the precomputed digest index before any
+hashcat process is started.
+"""
+
+import logging
+from typing import Dict, Optional, Sequence, Union
+
+from app.cracking.checkpoint import JobCheckpoint
+from app.cracking.digest_index import get_digest_index
+from app.cracking.hashcat_runner import CancelCallback, StatusCallback, normalize_hash
+
+logger = logging.getLogger(__name__)
+
+
+def instant_lookup_attack(
+    target_hash: Union[str, Sequence[str]],
+    hash_type_id: int,
+    timeout: int = 0,
+    checkpoint: Optional[JobCheckpoint] = None,
+    on_status: Optional[StatusCallback] = None,
+    should_cancel: Optional[CancelCallback] = None,
+    should_pause: Optional[CancelCallback] = None,
+) -> Dict:
+    """Look target hashes up in the digest index.
+
+    Args:
+        target_hash: Target hash to crack, or a batch of hashes of one type
+        hash_type_id: Hashcat hash mode
+        timeout: Unused; lookups complete in microseconds
+        checkpoint: Unused; a lookup has nothing to resume
+        on_status: Unused; no hashcat process is started
+        should_cancel: Unused; nothing runs long enough to cancel
+        should_pause: Unused; nothing runs long enough to preempt
+
+    Returns:
+        Result dict with cracked status
+    """
+    index = get_digest_index()
+    if index is None or not index.supports(hash_type_id):
+        return {
+            "cracked": False,
+            "attempts": 0,
+            "phase": 0,
+            "skipped": True,
+        }
+
+    targets = [target_hash] if isinstance(target_hash, str) else target_hash
+    normalized = [normalize_hash(h, hash_type_id) for h in targets]
+
+    try:
+        cracked_hashes = index.lookup_many(hash_type_id, normalized)
+    except Exception as e:
+        logger.error(f"Phase 0 error: {e}")
+        return {
+            "cracked": False,
+            "error": str(e),
+            "phase": 0,
+        }
+
+    if cracked_hashes:
+        password = next(iter(cracked_hashes.values()))
+        logger.info(f"Phase 0: {len(cracked_hashes)} hash(es) found in digest index")
+        return {
+            "cracked": True,
+            "password": password,
+            "attempts": len(normalized),
+            "phase": 0,
+            "method": "digest_index",
+            "cracked_hashes": cracked_hashes,
+        }
+
+    logger.debug("Phase 0: No digest index hits")
+    return {
+        "cracked": False,
+        "attempts": len(normalized),
+        "phase": 0,
+    }
@@ -4,26 +4,38 @@ Uses top password lists for rapid low-hanging fruit recovery.
 """
 
 import logging
-from typing import Dict
+from typing import Dict, Optional, Sequence, Union
 
 from app.config import get_settings
-from app.cracking.hashcat_runner import run_hashcat_attack
-from app.models.enums import HashType
+from app.cracking.checkpoint import JobCheckpoint
+from app.cracking.cpu_engine import cpu_dictionary_attack
+from app.cracking.hash_algorithms import get_digest_func
+from app.cracking.hashcat_runner import CancelCallback, StatusCallback, normalize_hash, run_hashcat_attack
+from app.cracking.wordlist_store import resolve_wordlist
 
 logger = logging.getLogger(__name__)
 
 
 def quick_dictionary_attack(
-    target_hash: str,
+    target_hash: Union[str, Sequence[str]],
     hash_type_id: int,
-    timeout: int
+    timeout: int,
+    checkpoint: Optional[JobCheckpoint] = None,
+    on_status: Optional[StatusCallback] = None,
+    should_cancel: Optional[CancelCallback] = None,
+    should_pause: Optional[CancelCallback] = None,
 ) -> Dict:
     """Execute quick dictionary attack.
 
     Args:
-        target_hash: Target hash to crack
+        target_hash: Target hash to crack, or a batch of hashes of one type
         hash_type_id: Hashcat hash mode
         timeout: Time budget in seconds
+        checkpoint: Job checkpoint; runs hashcat as a resumable named session
+        on_status: Callback receiving hashcat's periodic status reports
+        should_cancel: Callback polled while hashcat runs; True kills it
+        should_pause: Callback polled while hashcat runs; True interrupts
+            it at a restore point so a later run resumes the session
 
     Returns:
         Result dict with keys:
@@ -31,6 +43,7 @@ def quick_dictionary_attack(
             - password (str, optional): Cracked password
             - attempts (int): Total attempts made
             - duration (float): Execution time
+            - cracked_hashes (dict): hash -> password for every recovered hash
     """
     settings = get_settings()
     wordlist = settings.wordlists_dir / "top100k.txt"
@@ -42,29 +55,54 @@ def quick_dictionary_attack(
             target_hash=target_hash,
             hash_type_id=hash_type_id,
             attack_mode=0,
-            attack_args=[str(wordlist)],
+            attack_args=[str(resolve_wordlist(wordlist))],
             timeout=timeout,
+            session=checkpoint.session("phase1") if checkpoint else None,
+            on_status=on_status,
+            should_cancel=should_cancel,
+            should_pause=should_pause,
         )
+        # Fall back to the wordlist size if hashcat exited before its first status report
+        attempts = result.attempts if result.attempts is not None else 100000
 
         if result.cracked:
             logger.info(f"Phase 1: Password cracked: {result.password}")
             return {
                 "cracked": True,
                 "password": result.password,
-                "attempts": 100000,
+                "attempts": attempts,
                 "phase": 1,
                 "method": "quick_dictionary",
+                "cracked_hashes": result.cracked_hashes,
+            }
+
+        if result.cancelled:
+            logger.info("Phase 1: Cancelled, hashcat stopped")
+            return {
+                "cracked": False,
+                "attempts": attempts,
+                "phase": 1,
+                "cancelled": True,
+            }
+
+        if result.preempted:
+            logger.info("Phase 1: Preempted, hashcat session saved")
+            return {
+                "cracked": False,
+                "attempts": attempts,
+                "phase": 1,
+                "preempted": True,
             }
 
         if result.error_type == "no_device":
             logger.warning("Phase 1: Hashcat requires GPU/OpenCL, using CPU-based fallback")
-            return _cpu_dictionary_attack(target_hash, hash_type_id, wordlist, timeout)
+            return _cpu_dictionary_attack(target_hash, hash_type_id, wordlist, timeout, should_cancel)
 
         if result.timeout:
             logger.warning(f"Phase 1: Timeout after {timeout}s")
             return {
                 "cracked": False,
-                "attempts": 100000,
+                "attempts": attempts,
                 "phase": 1,
                 "timeout": True,
             }
@@ -72,7 +110,7 @@ def quick_dictionary_attack(
         logger.info(f"Phase 1: No matches found (exit code {result.exit_code})")
         return {
             "cracked": False,
-            "attempts": 100000,  # Approximate
+            "attempts": attempts,
             "phase": 1,
         }
 
@@ -85,26 +123,27 @@ def quick_dictionary_attack(
         }
 
 
-def _cpu_dictionary_attack(target_hash: str, hash_type_id: int, wordlist, timeout: int) -> Dict:
-    """CPU-based dictionary attack using Python (hashcat fallback).
+def _cpu_dictionary_attack(
+    target_hash: Union[str, Sequence[str]],
+    hash_type_id: int,
+    wordlist,
+    timeout: int,
+    should_cancel: Optional[CancelCallback] = None,
+) -> Dict:
+    """CPU-based dictionary attack on the multi-core engine (hashcat fallback).
 
     Args:
-        target_hash: Target hash to crack
+        target_hash: Target hash (or batch of hashes) to crack
         wordlist: Path to wordlist file
         timeout: Time budget in seconds
+        should_cancel: Cancellation callback polled by the engine
 
     Returns:
         Result dict
     """
-    import time
-
     logger.info(f"Phase 1: Using CPU-based fallback (timeout={timeout}s)")
 
-    start_time = time.time()
-    attempts = 0
-
-    hash_func = _get_hash_func(hash_type_id)
-    if hash_func is None:
+    if get_digest_func(hash_type_id) is None:
         logger.warning(f"Phase 1: CPU fallback unsupported for hash type {hash_type_id}")
         return {
             "cracked": False,
@@ -113,66 +152,45 @@ def _cpu_dictionary_attack(target_hash: str, hash_type_id: int, wordlist, timeou
             "phase": 1,
         }
 
-    normalized_hash = target_hash.lower()
+    targets = [target_hash] if isinstance(target_hash, str) else target_hash
+    normalized = [normalize_hash(h, hash_type_id) for h in targets]
 
     try:
-        with open(wordlist, 'r', encoding='latin-1') as f:
-            for line in f:
-                # Check timeout
-                if time.time() - start_time > timeout:
-                    logger.warning(f"Phase 1: CPU fallback timeout after {attempts} attempts")
-                    return {
-                        "cracked": False,
-                        "attempts": attempts,
-                        "phase": 1,
-                        "timeout": True
-                    }
-
-                password = line.strip()
-                if not password:
-                    continue
-
-                attempts += 1
-
-                hash_obj = hash_func(password.encode('utf-8', errors='ignore'))
-                if hash_obj.hexdigest() == normalized_hash:
-                    logger.info(f"Phase 1: Password cracked (CPU fallback): {password}")
-                    return {
-                        "cracked": True,
-                        "password": password,
-                        "attempts": attempts,
-                        "phase": 1,
-                        "method": "cpu_dictionary",
-                    }
-
-        logger.info(f"Phase 1: CPU fallback checked {attempts} passwords, no match")
-        return {
-            "cracked": False,
-            "attempts": attempts,
-            "phase": 1
-        }
-
+        result = cpu_dictionary_attack(
+            normalized, hash_type_id, wordlist, timeout, phase="Quick Dictionary", should_cancel=should_cancel
+        )
     except Exception as e:
         logger.error(f"Phase 1 CPU fallback error: {e}")
         return {
             "cracked": False,
             "error": str(e),
-            "attempts": attempts,
+            "attempts": 0,
             "phase": 1
         }
 
+    if result.cracked_hashes:
+        password = result.cracked_hashes.get(normalized[0]) or next(iter(result.cracked_hashes.values()))
+        logger.info(f"Phase 1: Password cracked (CPU fallback): {password}")
+        return {
+            "cracked": True,
+            "password": password,
+            "attempts": result.attempts,
+            "phase": 1,
+            "method": "cpu_dictionary",
+            "cracked_hashes": result.cracked_hashes,
+        }
 
-def _get_hash_func(hash_type_id: int):
-    if hash_type_id == HashType.MD5.value:
-        import hashlib
-        return hashlib.md5
-    if hash_type_id == HashType.SHA1.value:
-        import hashlib
-        return hashlib.sha1
-    if hash_type_id == HashType.SHA256.value:
-        import hashlib
-        return hashlib.sha256
-    if hash_type_id == HashType.SHA512.value:
-        import hashlib
-        return hashlib.sha512
-    return None
+    if result.timeout:
+        logger.warning(f"Phase 1: CPU fallback timeout after {result.attempts} attempts")
+    else:
+        logger.info(f"Phase 1: CPU fallback checked {result.attempts} passwords, no match")
+    response = {
+        "cracked": False,
+        "attempts": result.attempts,
+        "phase": 1,
+    }
+    if result.timeout:
+        response["timeout"] = True
+    if result.cancelled:
+        response["cancelled"] = True
+    return response
@@ -1,28 +1,151 @@
 """Phase 2: Rule-Based Attack.
 
 Applies intelligent mutations to dictionary words using Hashcat rules.
+
+The phase runs in stages over the frequency-ordered wordlist and the rules
+ranked by recorded hits per candidate: the top ``RULE_STAGE_RULES[0]`` rules
+on the top ``RULE_STAGE_WORDS[0]`` words first, then both widen, so cheap
+high-yield combinations finish before the long tail starts. Each stage runs
+as hashcat runs over word x rule blocks covering only what earlier stages
+left out. Hashcat reports the rule behind every crack (``--debug-mode=1``)
+and each block's outcome is stored with the rule statistics, so the ranking
+improves over time.
 """
 
 import logging
-from typing import Dict
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 from app.config import get_settings
-from app.cracking.hashcat_runner import run_hashcat_attack
+from app.cracking.checkpoint import JobCheckpoint
+from app.cracking.cpu_engine import (
+    cpu_worker_count,
+    line_offsets,
+    run_cpu_attack,
+    split_wordlist,
+    wordlist_sources,
+)
+from app.cracking.hash_algorithms import get_digest_func
+from app.cracking.hashcat_runner import (
+    CancelCallback,
+    KeyspaceShard,
+    StatusCallback,
+    hashcat_keyspace,
+    normalize_hash,
+    run_hashcat_attack,
+)
+from app.cracking.rules import (
+    RuleStage,
+    RuleWordlistRange,
+    block_label,
+    plan_rule_stages,
+    ranked_rules,
+    read_rule_lines,
+    record_rule_stage,
+    stage_blocks,
+    write_rule_file,
+)
+from app.cracking.wordlist_store import resolve_wordlist
 
 logger = logging.getLogger(__name__)
 
 
+# One block over every word and every rule
+_SINGLE_BLOCK = RuleStage(block_label((0, None), (0, None)), 0, None)
+
+# Checkpoint step holding the rule ranking a job's blocks were planned with
+_RANKING_KEY = "phase2_ranking"
+
+
+def _step_key(stage: RuleStage) -> str:
+    """Checkpoint key of one block."""
+    return f"phase2_block{stage.label}"
+
+
+def _plan_stages(
+    hash_type_id: int, rules_file: Path, wordlist: Path, rules: int, shard: Optional[KeyspaceShard]
+) -> Optional[List[RuleStage]]:
+    """Blocks of this run, restricted to a shard's slice of the keyspace.
+
+    Returns:
+        Blocks in execution order, or None if this shard has nothing to do
+    """
+    settings = get_settings()
+    word_cutoffs, rule_cutoffs = settings.rule_stage_words, settings.rule_stage_rules
+    if not word_cutoffs and not rule_cutoffs and shard is None:
+        return [_SINGLE_BLOCK]
+
+    keyspace = hashcat_keyspace(hash_type_id, 0, ["-r", str(rules_file), str(wordlist)])
+    if keyspace is None:
+        if shard is not None and shard.index:
+            logger.warning(f"Phase 2: Keyspace unknown, leaving shard {shard.index} to shard 0")
+            return None
+        # Without a keyspace one block covers the whole phase
+        return [_SINGLE_BLOCK]
+
+    if shard is not None:
+        if not shard.bounds(keyspace)[1]:
+            return None
+        logger.info(f"Phase 2: Shard {shard.index + 1}/{shard.count} of {keyspace} words")
+    return plan_rule_stages(
+        keyspace, rules, word_cutoffs, rule_cutoffs, shard.bounds(keyspace) if shard is not None else None
+    )
+
+
+def _job_ranking(rules_file: Path, checkpoint: Optional[JobCheckpoint]) -> List[str]:
+    """Ranked rules of this run.
+
+    A checkpointed job keeps the ranking it started with, so a resumed job's
+    blocks hold the same rules as the blocks it already finished.
+    """
+    if checkpoint is None:
+        return ranked_rules(rules_file)
+    ranking_file = checkpoint.session(_RANKING_KEY).work_dir / rules_file.name
+    if ranking_file.exists():
+        return read_rule_lines(ranking_file)
+    rules = ranked_rules(rules_file)
+    write_rule_file(rules, ranking_file)
+    return rules
+
+
+def _read_debug_rules(debug_file: Path) -> List[str]:
+    """Rules hashcat logged for its cracks, consuming the debug file."""
+    if not debug_file.exists():
+        return []
+    rules = [line.rstrip("\r\n") for line in debug_file.read_text(encoding="latin-1").splitlines()]
+    debug_file.unlink(missing_ok=True)
+    return [rule for rule in rules if rule]
+
+
 def rule_based_attack(
-    target_hash: str,
+    target_hash: Union[str, Sequence[str]],
     hash_type_id: int,
-    timeout: int
+    timeout: int,
+    checkpoint: Optional[JobCheckpoint] = None,
+    on_status: Optional[StatusCallback] = None,
+    should_cancel: Optional[CancelCallback] = None,
+    shard: Optional[KeyspaceShard] = None,
+    should_pause: Optional[CancelCallback] = None,
 ) -> Dict:
     """Execute rule-based attack.
 
+    For a batch of hashes the stages keep running against the hashes that
+    are still uncracked until every hash is recovered or time runs out.
+
     Args:
-        target_hash: Target hash to crack
+        target_hash: Target hash to crack, or a batch of hashes of one type
         hash_type_id: Hashcat hash mode
         timeout: Time budget in seconds
+        checkpoint: Job checkpoint; each stage runs as its own resumable
+            hashcat session and finished stages are skipped on resume
+        on_status: Callback receiving hashcat's periodic status reports
+        should_cancel: Callback polled while hashcat runs; True kills it
+        shard: Slice of the wordlist to attack when the phase is fanned out
+            across workers (hashcat ``--skip``/``--limit``)
+        should_pause: Callback polled while hashcat runs; True interrupts
+            it at a restore point so a later run resumes the session
 
     Returns:
         Result dict with cracked status
@@ -33,45 +156,283 @@ def rule_based_attack(
 
     logger.info(f"Phase 2: Rule-Based Attack (timeout={timeout}s)")
 
+    start_time = time.time()
+    is_batch = not isinstance(target_hash, str)
+    targets = list(target_hash) if is_batch else [target_hash]
+    remaining_hashes = [normalize_hash(h, hash_type_id) for h in targets]
+    cracked_hashes: Dict[str, str] = {}
+    attempts = 0
+    reported = False
+    outcome = None
+    work_dir = None if checkpoint else tempfile.TemporaryDirectory(prefix="rules_")
+
     try:
-        result = run_hashcat_attack(
-            target_hash=target_hash,
-            hash_type_id=hash_type_id,
-            attack_mode=0,
-            attack_args=["-r", str(rules_file), str(wordlist)],
-            timeout=timeout,
-        )
-
-        if result.cracked:
-            logger.info(f"Phase 2: Password cracked: {result.password}")
-            return {
-                "cracked": True,
-                "password": result.password,
-                "attempts": 5000000,
-                "phase": 2,
-                "method": "rule_based",
-            }
-
-        if result.timeout:
-            logger.warning(f"Phase 2: Timeout after {timeout}s")
-            return {
-                "cracked": False,
-                "attempts": 5000000,
-                "phase": 2,
-                "timeout": True,
-            }
+        resolved = resolve_wordlist(wordlist)
+        rules = _job_ranking(rules_file, checkpoint)
+        stages = _plan_stages(hash_type_id, rules_file, resolved, len(rules), shard)
+        if stages is None:
+            return {"cracked": False, "attempts": 0, "phase": 2}
+        if checkpoint:
+            stages = [stage for stage in stages if not checkpoint.is_complete(_step_key(stage))]
+        if len(stages) > 1:
+            logger.info(f"Phase 2: {len(stages)} word x rule blocks over {len(rules)} ranked rules")
+
+        for stage in stages:
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                outcome = "timeout"
+                break
+
+            session = checkpoint.session(_step_key(stage)) if checkpoint else None
+            stage_dir = session.work_dir if session else Path(work_dir.name) / _step_key(stage)
+            stage_rules = stage_dir / rules_file.name
+            debug_file = stage_dir / "debug.rule"
+            block_rules = stage.select_rules(rules)
+            # A restored session replays the rule file its restore point refers to
+            if not (session and session.can_restore() and stage_rules.exists()):
+                write_rule_file(block_rules, stage_rules)
+
+            result = run_hashcat_attack(
+                target_hash=remaining_hashes if is_batch else target_hash,
+                hash_type_id=hash_type_id,
+                attack_mode=0,
+                attack_args=[
+                    "--debug-mode=1", "--debug-file", str(debug_file),
+                    "-r", str(stage_rules), str(resolved), *stage.hashcat_args(),
+                ],
+                timeout=max(1, int(remaining)),
+                session=session,
+                on_status=on_status,
+                should_cancel=should_cancel,
+                should_pause=should_pause,
+            )
+
+            if result.error_type == "no_device":
+                logger.warning("Phase 2: Hashcat requires GPU/OpenCL, using CPU rule engine")
+                cpu_timeout = max(1, int(timeout - (time.time() - start_time)))
+                return _cpu_rule_attack(
+                    remaining_hashes, hash_type_id, wordlist, rules_file, cpu_timeout, should_cancel, shard
+                )
+
+            if result.attempts is not None:
+                attempts += result.attempts
+                reported = True
+            new_cracks = {h: p for h, p in result.cracked_hashes.items() if h not in cracked_hashes}
+            record_rule_stage(
+                rules_file, stage.label, block_rules, result.attempts or 0, len(new_cracks), result.duration,
+                _read_debug_rules(debug_file), exhausted=result.exit_code in (0, 1),
+                words=stage.end - stage.start if stage.end is not None else None,
+            )
+            if checkpoint and result.exit_code in (0, 1):
+                # Slice exhausted (or every hash cracked); aborted runs keep their restore point
+                checkpoint.complete(_step_key(stage))
+
+            if new_cracks:
+                logger.info(f"Phase 2: Block {stage.label} cracked {len(new_cracks)} hashes")
+                cracked_hashes.update(new_cracks)
+                remaining_hashes = [h for h in remaining_hashes if h not in cracked_hashes]
+                if not remaining_hashes:
+                    break
+            if result.cancelled:
+                outcome = "cancelled"
+                break
+            if result.preempted:
+                outcome = "preempted"
+                break
+            if result.timeout:
+                outcome = "timeout"
+                break
+
+    except Exception as e:
+        logger.error(f"Phase 2 error: {e}")
+        return {
+            "cracked": False,
+            "error": str(e),
+            "phase": 2,
+        }
+    finally:
+        if work_dir is not None:
+            work_dir.cleanup()
+
+    # Fall back to an estimate if hashcat exited before its first status report
+    if not reported:
+        attempts = 5000000
 
+    if cracked_hashes:
+        password = cracked_hashes.get(normalize_hash(targets[0], hash_type_id)) or next(iter(cracked_hashes.values()))
+        logger.info(f"Phase 2: Password cracked: {password}")
+        response = {
+            "cracked": True,
+            "password": password,
+            "attempts": attempts,
+            "phase": 2,
+            "method": "rule_based",
+            "cracked_hashes": cracked_hashes,
+        }
+        if outcome in ("cancelled", "preempted"):
+            response[outcome] = True
+        return response
+
+    if outcome == "cancelled":
+        logger.info("Phase 2: Cancelled, hashcat stopped")
+    elif outcome == "preempted":
+        logger.info("Phase 2: Preempted, hashcat session saved")
+    elif outcome == "timeout":
+        logger.warning(f"Phase 2: Timeout after {timeout}s")
+    else:
         logger.info("Phase 2: No matches found")
+    response = {
+        "cracked": False,
+        "attempts": attempts,
+        "phase": 2,
+    }
+    if outcome:
+        response[outcome] = True
+    return response
+
+
+def _cpu_stage_sources(
+    wordlist: Path, rules: int, units: int, shard: Optional[KeyspaceShard]
+) -> List[Tuple[str, list, Tuple[int, Optional[int]]]]:
+    """Label, CPU engine work units and rule rank range of each block.
+
+    Blocks cut the frequency-ordered file hashcat reads at their word
+    boundaries; without word stages every block keeps the store's
+    fixed-width buckets.
+    """
+    count = shard.count if shard is not None else 1
+    settings = get_settings()
+    blocks = [
+        (words, rule_range) for words, rule_range in stage_blocks(settings.rule_stage_words, settings.rule_stage_rules)
+        if rule_range[0] < rules
+    ]
+    if not settings.rule_stage_words:
+        ranges = wordlist_sources(wordlist, units * count)
+        if shard is not None:
+            ranges = shard.select(ranges)
+        return [(block_label(words, rule_range), ranges, rule_range) for words, rule_range in blocks if ranges]
+
+    path = resolve_wordlist(wordlist)
+    ranks = sorted({rank for (start, end), _ in blocks for rank in (start, end) if rank is not None})
+    offsets = dict(zip(ranks, line_offsets(path, ranks)))
+    stages = []
+    for (start, end), rule_range in blocks:
+        ranges = split_wordlist(path, units * count, offsets[start], offsets[end] if end is not None else None)
+        if shard is not None:
+            ranges = shard.select(ranges)
+        if ranges:
+            stages.append((block_label((start, end), rule_range), ranges, rule_range))
+    return stages
+
+
+def _cpu_rule_attack(
+    target_hash: Union[str, Sequence[str]],
+    hash_type_id: int,
+    wordlist,
+    rules_file,
+    timeout: int,
+    should_cancel: Optional[CancelCallback] = None,
+    shard: Optional[KeyspaceShard] = None,
+) -> Dict:
+    """CPU rule attack on the multi-core engine (hashcat fallback).
+
+    Runs the same word x rule blocks as hashcat with rules ordered by
+    recorded hits per candidate; the rules that crack hashes are credited
+    back, so productive rules run first next time.
+
+    Args:
+        target_hash: Target hash (or batch of hashes) to crack
+        hash_type_id: Hashcat hash mode
+        wordlist: Path to wordlist file
+        rules_file: Path to hashcat rule file
+        timeout: Time budget in seconds
+        should_cancel: Cancellation callback polled by the engine
+        shard: Share of the wordlist ranges to attack
+
+    Returns:
+        Result dict
+    """
+    logger.info(f"Phase 2: Using CPU rule engine (timeout={timeout}s)")
+
+    if get_digest_func(hash_type_id) is None:
+        logger.warning(f"Phase 2: CPU rule engine unsupported for hash type {hash_type_id}")
         return {
             "cracked": False,
-            "attempts": 5000000,  # Approximate with rules
+            "error": f"Unsupported hash type for CPU fallback: {hash_type_id}",
+            "attempts": 0,
             "phase": 2,
         }
 
+    targets = [target_hash] if isinstance(target_hash, str) else target_hash
+    normalized = [normalize_hash(h, hash_type_id) for h in targets]
+    remaining_hashes = list(normalized)
+    cracked_hashes: Dict[str, str] = {}
+    attempts = 0
+    timed_out = False
+    cancelled = False
+    start_time = time.time()
+
+    try:
+        rules = ranked_rules(rules_file, supported_only=True)
+        if not rules:
+            raise ValueError(f"No usable rules in {rules_file}")
+
+        settings = get_settings()
+        units = cpu_worker_count() * settings.cpu_engine_chunks_per_worker
+        for label, ranges, (rule_start, rule_end) in _cpu_stage_sources(wordlist, len(rules), units, shard):
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                timed_out = True
+                break
+            block_rules = rules[rule_start:rule_end]
+            sources = [RuleWordlistRange(words, tuple(block_rules)) for words in ranges]
+            result = run_cpu_attack(
+                sources, remaining_hashes, hash_type_id, remaining, phase="Rule-Based", should_cancel=should_cancel
+            )
+            attempts += result.attempts
+            record_rule_stage(
+                rules_file, label, block_rules, result.attempts, len(result.cracked_hashes), result.duration,
+                list(result.hit_tags.values()), exhausted=not (result.timeout or result.cancelled),
+            )
+            cracked_hashes.update(result.cracked_hashes)
+            remaining_hashes = [h for h in remaining_hashes if h not in cracked_hashes]
+            if not remaining_hashes:
+                break
+            if result.cancelled:
+                cancelled = True
+                break
+            if result.timeout:
+                timed_out = True
+                break
     except Exception as e:
-        logger.error(f"Phase 2 error: {e}")
+        logger.error(f"Phase 2 CPU rule engine error: {e}")
         return {
             "cracked": False,
             "error": str(e),
+            "attempts": 0,
+            "phase": 2,
+        }
+
+    if cracked_hashes:
+        password = cracked_hashes.get(normalized[0]) or next(iter(cracked_hashes.values()))
+        logger.info(f"Phase 2: Password cracked (CPU rules): {password}")
+        return {
+            "cracked": True,
+            "password": password,
+            "attempts": attempts,
             "phase": 2,
+            "method": "cpu_rule_based",
+            "cracked_hashes": cracked_hashes,
         }
+
+    logger.info(f"Phase 2: CPU rule engine tried {attempts} candidates, no match")
+    response = {
+        "cracked": False,
+        "attempts": attempts,
+        "phase": 2,
+    }
+    if timed_out:
+        response["timeout"] = True
+    if cancelled:
+        response["cancelled"] = True
+    return response
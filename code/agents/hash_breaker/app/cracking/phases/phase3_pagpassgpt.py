@@ -1,48 +1,102 @@
 """Phase 3: AI Generation with PagPassGPT.
 
 State-of-the-art AI-driven password generation using PagPassGPT model.
+Workers without a usable model (or jobs that ask for it) enumerate the
+compact PCFG + Markov model instead, which is CPU-cheap and never repeats
+a guess.
 """
 
 import logging
-from typing import Dict, Iterable, List
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-from app.ml import get_generator
-from app.cracking.hashcat_runner import run_hashcat_attack
+from app.config import get_settings
+from app.ml import check_model_available, get_generator
+from app.ml.markov_pcfg import MarkovPcfgModel, get_markov_model
+from app.ml.pagpassgpt_official.dcgen import load_patterns
+from app.cracking.checkpoint import JobCheckpoint
+from app.cracking.bloom import BloomFilter, get_wordlist_filter
+from app.cracking.hashcat_runner import CancelCallback, StatusCallback, run_hashcat_attack
+from app.cracking.shards import CandidateShards, get_candidate_shards
+from app.cracking.streaming import CandidateProducer
+from app.utils.metrics import candidate_drop_ratio, candidates_dropped_total
 
 logger = logging.getLogger(__name__)
 
 
 def ai_generation_attack(
-    target_hash: str,
+    target_hash: Union[str, Sequence[str]],
     hash_type_id: int,
     timeout: int,
-    num_passwords: int = 5000000
+    num_passwords: int = 5000000,
+    checkpoint: Optional[JobCheckpoint] = None,
+    on_status: Optional[StatusCallback] = None,
+    should_cancel: Optional[CancelCallback] = None,
+    should_pause: Optional[CancelCallback] = None,
+    generator: Optional[str] = None,
 ) -> Dict:
     """Execute AI-powered generation attack using PagPassGPT.
 
     Args:
-        target_hash: Target hash to crack
+        target_hash: Target hash to crack, or a batch of hashes of one type
         hash_type_id: Hashcat hash mode
         timeout: Time budget in seconds
         num_passwords: Number of passwords to generate
+        checkpoint: Job checkpoint; hashcat cannot restore a stdin session, so
+            the number of candidates already streamed is persisted instead and
+            a resumed job only generates the rest. Pre-generated shards are
+            resumed from that rank; since dedup drops happen after the shards,
+            this may repeat a few candidates but never skips one
+        on_status: Callback receiving hashcat's periodic status reports
+        should_cancel: Callback polled while candidates stream; True kills
+            hashcat, even while it is waiting on the generator
+        should_pause: Callback polled while candidates stream; True stops
+            the stream, which a later run resumes from the checkpoint offset
+        generator: ``"pagpassgpt"``, ``"markov"`` or ``"auto"`` (defaults to
+            ``phase3_generator``); the Markov/PCFG model does not replay the
+            PagPassGPT shards and resumes its own enumeration at the offset
 
     Returns:
         Result dict with cracked status
     """
-    logger.info(f"Phase 3: PagPassGPT AI Generation (timeout={timeout}s, count={num_passwords})")
+    offset = checkpoint.stream_offset("phase3") if checkpoint else 0
+    num_passwords = max(0, num_passwords - offset)
 
     try:
-        generator = get_generator()
-        candidate_iter = _iter_passwords(generator, num_passwords, batch_size=10000)
-
-        result = run_hashcat_attack(
-            target_hash=target_hash,
-            hash_type_id=hash_type_id,
-            attack_mode=0,
-            attack_args=[],
-            timeout=timeout,
-            stdin_iter=candidate_iter,
-        )
+        settings = get_settings()
+        markov = _markov_generator(generator or settings.phase3_generator)
+        method = "markov_pcfg" if markov is not None else "pagpassgpt"
+        logger.info(f"Phase 3: {method} generation (timeout={timeout}s, count={num_passwords}, offset={offset})")
+
+        if markov is not None:
+            workers = settings.markov_workers or (os.cpu_count() or 1)
+            batches = markov.iter_batches(num_passwords, skip=offset, workers=workers)
+        else:
+            shards = get_candidate_shards()
+            if shards is not None:
+                logger.info(f"Phase 3: Replaying {max(0, shards.total - offset)} pre-generated candidates")
+            batches = _iter_batches(num_passwords, batch_size=10000, shards=shards, offset=offset)
+        if settings.candidate_filter_enabled:
+            batches = _dedup_batches(batches, num_passwords, settings.candidate_filter_fp_rate)
+
+        with CandidateProducer(
+            batches, "AI Generation", settings.pagpassgpt_queue_batches, should_cancel=should_cancel
+        ) as producer:
+            candidate_iter = iter(producer)
+            if checkpoint:
+                candidate_iter = _track_offset(candidate_iter, checkpoint, "phase3", offset)
+
+            result = run_hashcat_attack(
+                target_hash=target_hash,
+                hash_type_id=hash_type_id,
+                attack_mode=0,
+                attack_args=[],
+                timeout=timeout,
+                stdin_iter=candidate_iter,
+                on_status=on_status,
+                should_cancel=should_cancel,
+                should_pause=should_pause,
+            )
 
         attempts = result.attempts if result.attempts is not None else num_passwords
 
@@ -52,8 +106,27 @@ def ai_generation_attack(
                 "cracked": True,
                 "password": result.password,
                 "phase": 3,
-                "method": "pagpassgpt",
+                "method": method,
+                "cracked_hashes": result.cracked_hashes,
+                "attempts": attempts,
+            }
+
+        if result.cancelled or producer.cancelled:
+            logger.info("Phase 3: Cancelled, hashcat stopped")
+            return {
+                "cracked": False,
+                "attempts": attempts,
+                "phase": 3,
+                "cancelled": True,
+            }
+
+        if result.preempted:
+            logger.info("Phase 3: Preempted, candidate stream stopped")
+            return {
+                "cracked": False,
                 "attempts": attempts,
+                "phase": 3,
+                "preempted": True,
             }
 
         if result.timeout:
@@ -81,19 +154,133 @@ def ai_generation_attack(
         }
 
 
-def _iter_passwords(
-    generator,
+def _markov_generator(choice: str) -> Optional[MarkovPcfgModel]:
+    """The Markov/PCFG model if it generates this run, None for PagPassGPT.
+
+    ``auto`` only checks PagPassGPT when a Markov/PCFG model is built, so
+    deployments without one keep loading the generator lazily.
+    """
+    if choice == "pagpassgpt":
+        return None
+    markov = get_markov_model()
+    if markov is None:
+        if choice == "markov":
+            logger.warning("Phase 3: Markov/PCFG model not built, using PagPassGPT")
+        return None
+    if choice == "auto" and check_model_available():
+        return None
+    return markov
+
+
+def _iter_batches(
     total: int,
     batch_size: int = 10000,
-) -> Iterable[str]:
+    shards: Optional[CandidateShards] = None,
+    offset: int = 0,
+) -> Iterable[List[str]]:
+    """Yield pre-generated candidates first, then generate live beyond them.
+
+    The model is only loaded once the shards are exhausted. Live generation
+    uses D&C-GEN when a pattern file is configured and falls back to plain
+    sampling for whatever budget D&C-GEN leaves unused.
+    """
     remaining = max(0, int(total))
 
+    if shards is not None:
+        for batch in shards.iter_batches(start=offset, limit=remaining, batch_size=batch_size):
+            yield batch
+            remaining -= len(batch)
+    if remaining <= 0:
+        return
+
+    generator = get_generator()
+    patterns = _dcgen_patterns()
+    if patterns:
+        settings = get_settings()
+        stream = generator.generate_dcgen(
+            patterns,
+            remaining,
+            threshold=settings.pagpassgpt_threshold,
+            workers=settings.pagpassgpt_dcgen_workers,
+        )
+        try:
+            for batch in stream:
+                yield batch[:remaining]
+                remaining -= len(batch)
+                if remaining <= 0:
+                    return
+        finally:
+            stream.close()
+
     while remaining > 0:
         count = min(batch_size, remaining)
         batch: List[str] = generator.generate(num_passwords=count)
         if not batch:
             break
-        for pwd in batch:
-            if pwd:
-                yield pwd
+        yield [pwd for pwd in batch if pwd]
         remaining -= len(batch)
+
+
+def _dcgen_patterns() -> List[Tuple[str, float]]:
+    patterns_file = get_settings().pagpassgpt_patterns_file
+    if patterns_file is None:
+        return []
+    try:
+        return load_patterns(patterns_file)
+    except OSError as e:
+        logger.warning(f"Phase 3: Cannot read D&C-GEN patterns, sampling instead: {e}")
+        return []
+
+
+def _dedup_batches(
+    batches: Iterable[List[str]],
+    capacity: int,
+    fp_rate: float,
+) -> Iterable[List[str]]:
+    """Drop candidates this job already tried or that phases 1/2 covered.
+
+    A per-job Bloom filter sized for the generation budget catches repeated
+    samples; the prebuilt wordlist filter catches plain wordlist words. A
+    false positive only skips a candidate, it never reports a wrong crack.
+    """
+    job_filter = BloomFilter.for_capacity(capacity, fp_rate)
+    wordlist_filter = get_wordlist_filter()
+    generated = duplicates = known = 0
+
+    try:
+        for batch in batches:
+            generated += len(batch)
+            unique = list(dict.fromkeys(pwd.encode("utf-8", errors="surrogateescape") for pwd in batch))
+            fresh = [c for c, seen in zip(unique, job_filter.contains_many(unique)) if not seen]
+            job_filter.add_many(fresh)
+            duplicates += len(batch) - len(fresh)
+
+            if wordlist_filter is not None:
+                in_wordlists = wordlist_filter.contains_many(fresh)
+                known += int(in_wordlists.sum())
+                fresh = [c for c, seen in zip(fresh, in_wordlists) if not seen]
+
+            yield [c.decode("utf-8", errors="surrogateescape") for c in fresh]
+    finally:
+        candidates_dropped_total.labels(phase="AI Generation", reason="duplicate").inc(duplicates)
+        candidates_dropped_total.labels(phase="AI Generation", reason="wordlist").inc(known)
+        if generated:
+            candidate_drop_ratio.labels(phase="AI Generation").set((duplicates + known) / generated)
+            logger.info(
+                f"Phase 3: Dropped {duplicates} duplicate and {known} wordlist candidates "
+                f"of {generated} generated"
+            )
+
+
+def _track_offset(
+    candidates: Iterable[str],
+    checkpoint: JobCheckpoint,
+    phase_key: str,
+    offset: int,
+    every: int = 100000,
+) -> Iterable[str]:
+    """Persist the stream offset every ``every`` candidates."""
+    for count, candidate in enumerate(candidates, start=1):
+        yield candidate
+        if count % every == 0:
+            checkpoint.record_stream_offset(phase_key, offset + count)
@@ -1,13 +1,44 @@
 """Phase 4: Limited Mask Attack.
 
 Brute-force simple password patterns with remaining time budget.
+
+With a PCFG pattern file (``MASK_PATTERNS_FILE``, or the D&C-GEN
+``PAGPASSGPT_PATTERNS_FILE``) the phase runs a mask queue derived from the
+pattern rates instead of ``COMMON_MASKS``: masks are ranked by probability
+per candidate, cut to what the measured guess rate covers in the budget and
+handed to a single hashcat run as an ``.hcmask`` file.
 """
 
 import logging
+import tempfile
 import time
-from typing import Dict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
-from app.cracking.hashcat_runner import run_hashcat_attack
+from app.config import get_settings
+from app.cracking.checkpoint import JobCheckpoint
+from app.cracking.cpu_engine import cpu_worker_count, estimate_rate, run_cpu_attack
+from app.cracking.hash_algorithms import get_digest_func
+from app.cracking.hashcat_runner import (
+    CancelCallback,
+    KeyspaceShard,
+    StatusCallback,
+    hashcat_keyspace,
+    normalize_hash,
+    run_hashcat_attack,
+)
+from app.cracking.masks import (
+    MAX_KEYSPACE,
+    PlannedMask,
+    expand_increment,
+    mask_keyspace,
+    pcfg_masks,
+    plan_masks,
+    split_mask_ranges,
+    write_hcmask,
+)
+from app.cracking.progress import recorded_guess_rate
+from app.ml.pagpassgpt_official.dcgen import load_patterns
 
 logger = logging.getLogger(__name__)
 
@@ -21,18 +52,99 @@ COMMON_MASKS = [
     "?a?a?a?a?a?a?a",        # 8 printable ASCII
 ]
 
+# Approximate share of leaked passwords matching each mask (incl. its
+# --increment prefixes); used to schedule masks by hits per candidate.
+MASK_PRIORS = {
+    "?l?l?l?l?l?l?l?l": 0.12,
+    "?u?l?l?l?l?l?l": 0.01,
+    "?l?l?l?l?l?l?d": 0.02,
+    "?l?l?l?l?l?l?l?d": 0.03,
+    "?a?a?a?a?a?a?a": 0.25,
+}
+
+
+def _ordered_masks():
+    """COMMON_MASKS ordered by estimated hit probability per candidate."""
+    return sorted(
+        COMMON_MASKS,
+        key=lambda mask: MASK_PRIORS.get(mask, 0.0) / mask_keyspace(mask),
+        reverse=True,
+    )
+
+
+# Checkpoint key of the PCFG mask queue
+_QUEUE_KEY = "phase4_queue"
+
+
+def _mask_key(mask: str) -> str:
+    """Checkpoint key of one mask, stable across mask reordering."""
+    return f"phase4_mask{COMMON_MASKS.index(mask)}"
+
+
+def _pcfg_mask_probabilities() -> List[Tuple[str, float]]:
+    """Masks and probabilities from the configured PCFG pattern file."""
+    settings = get_settings()
+    patterns_file = settings.mask_patterns_file or settings.pagpassgpt_patterns_file
+    if patterns_file is None:
+        return []
+    try:
+        return pcfg_masks(load_patterns(patterns_file))
+    except OSError as e:
+        logger.warning(f"Phase 4: Cannot read PCFG patterns, using common masks: {e}")
+        return []
+
+
+def plan_mask_queue(hash_type_id: int, timeout: float) -> List[PlannedMask]:
+    """PCFG masks ordered by hit probability per candidate, cut to the budget.
+
+    The budget is the last guess rate hashcat reported for this hash mode in
+    phase 4 times ``timeout``; before any rate is known the whole ranked
+    queue is planned and hashcat's timeout ends it.
+
+    Args:
+        hash_type_id: Hashcat hash mode
+        timeout: Time budget in seconds
+
+    Returns:
+        Planned masks in execution order (empty without a pattern file)
+    """
+    masks = _pcfg_mask_probabilities()
+    if not masks:
+        return []
+    rate = recorded_guess_rate(hash_type_id, "Mask Attack")
+    budget = int(rate * timeout) if rate > 0 else MAX_KEYSPACE
+    return plan_masks(masks, budget, increment=False)
+
 
 def mask_attack(
-    target_hash: str,
+    target_hash: Union[str, Sequence[str]],
     hash_type_id: int,
-    timeout: int
+    timeout: int,
+    checkpoint: Optional[JobCheckpoint] = None,
+    on_status: Optional[StatusCallback] = None,
+    should_cancel: Optional[CancelCallback] = None,
+    shard: Optional[KeyspaceShard] = None,
+    should_pause: Optional[CancelCallback] = None,
 ) -> Dict:
     """Execute limited mask attack.
 
+    For a batch of hashes the mask queue keeps running against the hashes
+    that are still uncracked until every hash is recovered or time runs out.
+
     Args:
-        target_hash: Target hash to crack
+        target_hash: Target hash to crack, or a batch of hashes of one type
         hash_type_id: Hashcat hash mode
         timeout: Time budget in seconds
+        checkpoint: Job checkpoint; each hashcat run of a mask (one per
+            increment prefix or queued mask when sharded) is its own
+            resumable session, and finished runs are skipped on resume
+        on_status: Callback receiving hashcat's periodic status reports
+        should_cancel: Callback polled while hashcat runs; True kills it and
+            stops the mask queue
+        shard: Slice of every mask keyspace to attack when the phase is
+            fanned out across workers (hashcat ``--skip``/``--limit``)
+        should_pause: Callback polled while hashcat runs; True interrupts
+            the current mask at a restore point and stops the mask queue
 
     Returns:
         Result dict with cracked status
@@ -49,52 +161,300 @@ def mask_attack(
         }
 
     start_time = time.time()
+    is_batch = not isinstance(target_hash, str)
+    targets = list(target_hash) if is_batch else [target_hash]
+    remaining_hashes = [normalize_hash(h, hash_type_id) for h in targets]
+    cracked_hashes: Dict[str, str] = {}
+    attempts = 0
+    reported = False
+    cancelled = False
+    preempted = False
+    queue = plan_mask_queue(hash_type_id, timeout)
+    if queue:
+        logger.info(f"Phase 4: PCFG mask queue of {len(queue)} masks, {sum(p.candidates for p in queue)} candidates")
+        masks = [_QUEUE_KEY]
+    else:
+        masks = _ordered_masks()
+    if checkpoint:
+        masks = [mask for mask in masks if not checkpoint.is_complete(_step_key(mask))]
+    queue_dir = tempfile.TemporaryDirectory(prefix="hcmask_") if queue and not checkpoint else None
 
-    for i, mask in enumerate(COMMON_MASKS):
-        remaining = timeout - (time.time() - start_time)
-        if remaining <= 0:
-            logger.debug("Phase 4: Time budget exhausted")
-            break
-
-        masks_left = len(COMMON_MASKS) - i
-        time_per_mask = max(1, int(remaining / masks_left))
-
-        logger.debug(f"Phase 4: Trying mask {i+1}/{len(COMMON_MASKS)}: {mask}")
-
-        try:
-            result = run_hashcat_attack(
-                target_hash=target_hash,
-                hash_type_id=hash_type_id,
-                attack_mode=3,
-                attack_args=[
-                    mask,
-                    "--increment",
-                    "--increment-min",
-                    "1",
-                    "--increment-max",
-                    "8",
-                ],
-                timeout=time_per_mask,
-            )
-
-            if result.cracked:
-                logger.info(f"Phase 4: Password cracked with mask '{mask}': {result.password}")
-                return {
-                    "cracked": True,
-                    "password": result.password,
-                    "attempts": 10000000,
-                    "phase": 4,
-                    "method": "mask_attack",
-                    "mask": mask,
-                }
-
-        except Exception as e:
-            logger.error(f"Phase 4 error with mask '{mask}': {e}")
-            continue
+    try:
+        for i, mask in enumerate(masks):
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                logger.debug("Phase 4: Time budget exhausted")
+                break
+
+            masks_left = len(masks) - i
+            time_per_mask = max(1, int(remaining / masks_left))
+            mask_start = time.time()
+            if mask == _QUEUE_KEY:
+                if checkpoint:
+                    # The unsharded queue is a single run, whose restore point refers to the file
+                    restoring = checkpoint.session(_run_key(_QUEUE_KEY, 0)).can_restore()
+                    runs = _queue_runs(
+                        queue, checkpoint.session(_QUEUE_KEY).work_dir / "masks.hcmask", hash_type_id, shard, restoring
+                    )
+                else:
+                    runs = _queue_runs(queue, Path(queue_dir.name) / "masks.hcmask", hash_type_id, shard)
+            else:
+                runs = _mask_runs(mask, hash_type_id, shard)
+
+            logger.debug(f"Phase 4: Trying mask {i+1}/{len(masks)}: {mask}")
+
+            # A sharded mask is several runs; each resumes and completes on its own
+            pending = [
+                (j, attack_args) for j, attack_args in enumerate(runs)
+                if not (checkpoint and checkpoint.is_complete(_run_key(mask, j)))
+            ]
+            for n, (j, attack_args) in enumerate(pending):
+                run_timeout = max(1, int((time_per_mask - (time.time() - mask_start)) / (len(pending) - n)))
+                try:
+                    result = run_hashcat_attack(
+                        target_hash=remaining_hashes if is_batch else target_hash,
+                        hash_type_id=hash_type_id,
+                        attack_mode=3,
+                        attack_args=attack_args,
+                        timeout=run_timeout,
+                        session=checkpoint.session(_run_key(mask, j)) if checkpoint else None,
+                        on_status=on_status,
+                        should_cancel=should_cancel,
+                        should_pause=should_pause,
+                    )
+                    if result.attempts is not None:
+                        attempts += result.attempts
+                        reported = True
+                    if checkpoint and result.exit_code in (0, 1):
+                        # Keyspace exhausted (or every hash cracked); aborted runs keep their restore point
+                        checkpoint.complete(_run_key(mask, j))
+
+                    if result.error_type == "no_device":
+                        logger.warning("Phase 4: Hashcat requires GPU/OpenCL, using CPU mask engine")
+                        cpu_timeout = max(1, int(timeout - (time.time() - start_time)))
+                        return _cpu_mask_attack(
+                            remaining_hashes, hash_type_id, cpu_timeout, should_cancel, shard, pcfg=bool(queue)
+                        )
+
+                    if result.cracked:
+                        logger.info(f"Phase 4: Password cracked with mask '{mask}': {result.password}")
+                        cracked_hashes.update(result.cracked_hashes)
+                        remaining_hashes = [h for h in remaining_hashes if h not in cracked_hashes]
+                        if remaining_hashes:
+                            continue
+                        return {
+                            "cracked": True,
+                            "password": result.password,
+                            "attempts": attempts if reported else 10000000,
+                            "phase": 4,
+                            "method": "mask_attack",
+                            "mask": mask,
+                            "cracked_hashes": cracked_hashes,
+                        }
+
+                    if result.cancelled:
+                        logger.info(f"Phase 4: Cancelled during mask '{mask}', hashcat stopped")
+                        cancelled = True
+                        break
+                    if result.preempted:
+                        logger.info(f"Phase 4: Preempted during mask '{mask}', hashcat session saved")
+                        preempted = True
+                        break
+
+                except Exception as e:
+                    logger.error(f"Phase 4 error with mask '{mask}': {e}")
+                    continue
+
+            if checkpoint and all(checkpoint.is_complete(_run_key(mask, j)) for j in range(len(runs))):
+                checkpoint.complete(_step_key(mask))
+            if cancelled or preempted:
+                break
+    finally:
+        # Early returns (CPU fallback, everything cracked) must not leak the queue file
+        if queue_dir is not None:
+            queue_dir.cleanup()
+
+    # Fall back to an estimate if no hashcat run lived long enough to report status
+    if not reported:
+        attempts = 10000000
+
+    if cracked_hashes:
+        logger.info(f"Phase 4: Cracked {len(cracked_hashes)} hashes, {len(remaining_hashes)} remaining")
+        response = {
+            "cracked": True,
+            "password": next(iter(cracked_hashes.values())),
+            "attempts": attempts,
+            "phase": 4,
+            "method": "mask_attack",
+            "cracked_hashes": cracked_hashes,
+        }
+        if cancelled:
+            response["cancelled"] = True
+        if preempted:
+            response["preempted"] = True
+        return response
+
+    if cancelled or preempted:
+        response = {
+            "cracked": False,
+            "attempts": attempts,
+            "phase": 4,
+        }
+        response["cancelled" if cancelled else "preempted"] = True
+        return response
 
     logger.info("Phase 4: No matches found with any mask")
     return {
         "cracked": False,
-        "attempts": 10000000,  # Approximate
+        "attempts": attempts,
         "phase": 4
     }
+
+
+def _step_key(mask: str) -> str:
+    return mask if mask == _QUEUE_KEY else _mask_key(mask)
+
+
+def _run_key(mask: str, run: int) -> str:
+    """Checkpoint key (and session) of one hashcat run of a mask."""
+    return f"{_step_key(mask)}_run{run}"
+
+
+def _queue_runs(
+    queue: Sequence[PlannedMask],
+    hcmask_file: Path,
+    hash_type_id: int,
+    shard: Optional[KeyspaceShard],
+    restoring: bool = False,
+) -> List[List[str]]:
+    """Hashcat arguments covering the PCFG mask queue, or this shard's slice of it.
+
+    Unsharded, the queue runs as one ``.hcmask`` file; a session being
+    restored keeps the file its restore point refers to.
+    ``--skip``/``--limit`` do not apply to mask files, so a shard slices
+    every queued mask as its own run.
+    """
+    if shard is None:
+        if not (restoring and hcmask_file.exists()):
+            write_hcmask(queue, hcmask_file)
+        return [[str(hcmask_file)]]
+
+    runs = []
+    for planned in queue:
+        keyspace = hashcat_keyspace(hash_type_id, 3, [planned.mask])
+        if keyspace is None:
+            logger.warning(f"Phase 4: Keyspace of '{planned.mask}' unknown, leaving it to shard 0")
+            if not shard.index:
+                runs.append([planned.mask])
+            continue
+        if shard.bounds(keyspace)[1]:
+            runs.append([planned.mask, *shard.hashcat_args(keyspace)])
+    return runs
+
+
+def _mask_runs(mask: str, hash_type_id: int, shard: Optional[KeyspaceShard]) -> List[List[str]]:
+    """Hashcat arguments covering one mask, or this shard's slice of it.
+
+    ``--skip``/``--limit`` cannot be combined with ``--increment``, so a
+    shard runs every increment prefix as its own mask and slices each one.
+    """
+    increment = [mask, "--increment", "--increment-min", "1", "--increment-max", "8"]
+    if shard is None:
+        return [increment]
+
+    runs = []
+    for prefix in expand_increment(mask):
+        keyspace = hashcat_keyspace(hash_type_id, 3, [prefix])
+        if keyspace is None:
+            # Without a keyspace shard 0 covers the whole mask
+            logger.warning(f"Phase 4: Keyspace of '{prefix}' unknown, leaving mask '{mask}' to shard 0")
+            return [] if shard.index else [increment]
+        if shard.bounds(keyspace)[1]:
+            runs.append([prefix, *shard.hashcat_args(keyspace)])
+    return runs
+
+
+def _cpu_mask_attack(
+    target_hashes: Sequence[str],
+    hash_type_id: int,
+    timeout: int,
+    should_cancel: Optional[CancelCallback] = None,
+    shard: Optional[KeyspaceShard] = None,
+    pcfg: bool = False,
+) -> Dict:
+    """CPU mask attack on the multi-core engine (hashcat fallback).
+
+    The mask plan is sized to what the engine can hash within the budget at
+    its measured rate, and each planned keyspace is split into index ranges
+    spread across the process pool.
+
+    Args:
+        target_hashes: Normalized target hashes
+        hash_type_id: Hashcat hash mode
+        timeout: Time budget in seconds
+        should_cancel: Cancellation callback polled by the engine
+        shard: Share of the planned mask ranges to attack
+        pcfg: Plan the PCFG pattern masks instead of ``COMMON_MASKS``
+
+    Returns:
+        Result dict
+    """
+    if get_digest_func(hash_type_id) is None:
+        logger.warning(f"Phase 4: CPU mask engine unsupported for hash type {hash_type_id}")
+        return {
+            "cracked": False,
+            "error": f"Unsupported hash type for CPU fallback: {hash_type_id}",
+            "attempts": 0,
+            "phase": 4,
+        }
+
+    budget = int(estimate_rate(hash_type_id) * timeout)
+    if pcfg:
+        plan = plan_masks(_pcfg_mask_probabilities(), budget, increment=False)
+    else:
+        plan = plan_masks([(mask, MASK_PRIORS.get(mask, 0.0)) for mask in COMMON_MASKS], budget)
+    units = cpu_worker_count() * get_settings().cpu_engine_chunks_per_worker
+    if shard is None:
+        sources = split_mask_ranges(plan, units)
+    else:
+        sources = shard.select(split_mask_ranges(plan, units * shard.count))
+    logger.info(f"Phase 4: CPU mask plan covers {len(plan)} masks, {sum(p.candidates for p in plan)} candidates")
+
+    try:
+        result = run_cpu_attack(
+            sources, target_hashes, hash_type_id, timeout, phase="Mask Attack", should_cancel=should_cancel
+        )
+    except Exception as e:
+        logger.error(f"Phase 4 CPU mask engine error: {e}")
+        return {
+            "cracked": False,
+            "error": str(e),
+            "attempts": 0,
+            "phase": 4,
+        }
+
+    if result.cracked_hashes:
+        password = result.cracked_hashes.get(target_hashes[0]) or next(iter(result.cracked_hashes.values()))
+        mask = result.hit_tags.get(target_hashes[0]) or next(iter(result.hit_tags.values()), None)
+        logger.info(f"Phase 4: Password cracked (CPU mask '{mask}'): {password}")
+        return {
+            "cracked": True,
+            "password": password,
+            "attempts": result.attempts,
+            "phase": 4,
+            "method": "cpu_mask_attack",
+            "mask": mask,
+            "cracked_hashes": result.cracked_hashes,
+        }
+
+    logger.info(f"Phase 4: CPU mask engine tried {result.attempts} candidates, no match")
+    response = {
+        "cracked": False,
+        "attempts": result.attempts,
+        "phase": 4,
+    }
+    if result.timeout:
+        response["timeout"] = True
+    if result.cancelled:
+        response["cancelled"] = True
+    return response
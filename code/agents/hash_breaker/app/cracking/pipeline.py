@@ -1,24 +1,51 @@
-"""Multi-phase cracking pipeline orchestrator."""
+"""Multi-phase cracking pipeline orchestrator.
+
+Job state lives in the ``job:{job_id}`` Redis hash. Every state change is a
+partial field write that is published, in the same round trip, as an event
+on ``job:{job_id}:events`` for the API's server-sent event stream.
+"""
 
 import logging
 import time
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 from app.config import get_settings
+from app.cracking.budgets import BUDGETED_PHASES, PhasePlan, get_phase_plan, record_phase_outcome
+from app.cracking.checkpoint import JobCheckpoint, clear_checkpoint
+from app.cracking.fanout import SHARDED_PHASES, KeyspaceFanout
+from app.cracking.hashcat_runner import normalize_hash
+from app.cracking.potfile import InflightRegistry, Potfile
+from app.cracking.progress import PhaseProgress
+from app.cracking.scheduler import DeviceLease, get_scheduler
 from app.cracking.phases import (
+    instant_lookup_attack,
     quick_dictionary_attack,
     rule_based_attack,
     ai_generation_attack,
     mask_attack
 )
-from app.models.enums import JobStatus
+from app.models.batch import BatchJobState
+from app.models.enums import JobPriority, JobStatus
 from app.models.schemas import JobState
 from app.utils.redis_client import get_redis
-from app.utils.metrics import MetricsContext, guesses_total, jobs_current, jobs_total, job_duration
+from app.utils.telemetry import worker_id
+from app.utils.metrics import MetricsContext, jobs_current, jobs_total, job_duration, queue_wait_seconds
 
 logger = logging.getLogger(__name__)
 
+# Seconds kept free before the actor time limit when bounding preemption pauses
+_TIME_LIMIT_MARGIN = 30
+
+# (phase number, metrics label, progress label, progress %, attack)
+PHASES = (
+    (0, "Instant Lookup", "Phase 0: Instant Digest Lookup", 5, instant_lookup_attack),
+    (1, "Quick Dictionary", "Phase 1: Quick Dictionary Attack", 15, quick_dictionary_attack),
+    (2, "Rule-Based", "Phase 2: Rule-Based Attack", 35, rule_based_attack),
+    (3, "AI Generation", "Phase 3: AI Generation (PagPassGPT)", 60, ai_generation_attack),
+    (4, "Mask Attack", "Phase 4: Limited Mask Attack", 80, mask_attack),
+)
+
 
 class CrackingPipeline:
     """Multi-phase password cracking pipeline."""
@@ -27,10 +54,17 @@ class CrackingPipeline:
         """Initialize cracking pipeline."""
         self.settings = get_settings()
         self.redis = get_redis()
+        self.potfile = Potfile()
+        self.inflight = InflightRegistry()
+        self.scheduler = get_scheduler()
 
     def execute(self, job_id: str, target_hash: str, hash_type_id: int, timeout: int) -> Dict:
         """Execute multi-phase cracking pipeline.
 
+        Progress is checkpointed per phase, so a retried message skips the
+        phases an earlier attempt finished and restores the hashcat session
+        of the phase it was interrupted in.
+
         Args:
             job_id: Unique job identifier
             target_hash: Target hash to crack
@@ -40,141 +74,398 @@ class CrackingPipeline:
         Returns:
             Final job state dict
         """
-        start_time = time.time()
-        total_attempts = 0
+        checkpoint = JobCheckpoint(job_id)
+        start_time = time.time() - checkpoint.elapsed
+        total_attempts = checkpoint.attempts
         running_started = False
 
-        current_state = self.redis.get(f"job:{job_id}") or {}
+        current_state = self.redis.get_fields(f"job:{job_id}")
         if current_state.get("status") == JobStatus.CANCELLED:
             logger.info(f"Job {job_id}: Cancelled before processing started")
             return self._cancelled(job_id, "Cancelled before processing", None, 0, 0.0)
 
         submitted_at = self._parse_datetime(current_state.get("submitted_at")) or datetime.utcnow()
-        started_at = datetime.utcnow()
+        started_at = self._parse_datetime(current_state.get("started_at")) if checkpoint.resumed else None
 
         running_state = {
             **current_state,
             "job_id": job_id,
             "status": JobStatus.RUNNING,
             "submitted_at": submitted_at,
-            "started_at": started_at,
+            "started_at": started_at or datetime.utcnow(),
             "hash_type_id": hash_type_id,
             "timeout_seconds": timeout,
             "progress": 0,
-            "time_elapsed": 0,
-            "time_remaining": max(0, int(timeout)),
+            "time_elapsed": checkpoint.elapsed,
+            "time_remaining": max(0, int(timeout - checkpoint.elapsed)),
         }
 
-        self.redis.set(
-            f"job:{job_id}",
-            JobState(**running_state).model_dump(mode="json"),
-            ex=self.settings.redis_ttl,
-        )
+        self._write_state(job_id, JobState(**running_state).model_dump(mode="json"), "status")
         jobs_current.labels(status="running").inc()
         running_started = True
-        logger.info(f"Job {job_id}: Starting pipeline (timeout={timeout}s)")
-
+        last_phase = None
         try:
-            # Phase 1: Quick Dictionary Attack
-            if self._is_cancelled(job_id):
-                return self._cancelled(job_id, "User requested cancellation", None, total_attempts, 0.0)
-
-            elapsed = time.time() - start_time
-            if elapsed < timeout:
-                phase_timeout = min(
-                    self.settings.get_phase_budget(1, timeout),
-                    timeout - elapsed,
+            lease = self._admit(job_id, current_state, submitted_at, checkpoint, timeout)
+            if checkpoint.resumed:
+                logger.info(
+                    f"Job {job_id}: Resuming pipeline from checkpoint "
+                    f"({checkpoint.elapsed:.1f}s elapsed, phases done: {checkpoint.state['completed_phases']})"
                 )
-                self._update_progress(job_id, 15, "Phase 1: Quick Dictionary Attack", 1, elapsed, timeout)
+            else:
+                logger.info(f"Job {job_id}: Starting pipeline (timeout={timeout}s)")
+
+            plan = get_phase_plan(hash_type_id, timeout)
+            phases = self._planned_phases(plan)
 
-                with MetricsContext(job_id, phase="Quick Dictionary"):
-                    result = quick_dictionary_attack(target_hash, hash_type_id, phase_timeout)
+            for index, (phase_num, metrics_label, phase_label, progress, attack) in enumerate(phases):
+                phase_key = f"phase{phase_num}"
+                if phase_num == 0 and not self.settings.digest_index_enabled:
+                    continue
+                if checkpoint.is_complete(phase_key):
+                    continue
+
+                elapsed = time.time() - start_time
+                if self._is_cancelled(job_id):
+                    return self._cancelled(job_id, "User requested cancellation", last_phase, total_attempts, elapsed)
+                if elapsed >= timeout:
+                    break
+
+                phase_timeout = self._phase_timeout(plan, phase_num, timeout, elapsed)
+                self._update_progress(job_id, progress, phase_label, phase_num, elapsed, timeout)
+                checkpoint.start(phase_key)
+                last_phase = phase_num
+
+                reporter = self._phase_progress(job_id, phases, index, hash_type_id)
+                phase_started = time.time()
+                with MetricsContext(job_id, phase=metrics_label):
+                    result, paused = self._run_phase(
+                        job_id, phase_num, attack, target_hash, hash_type_id, phase_timeout, checkpoint, reporter, lease
+                    )
+                start_time += paused
                 attempts = int(result.get("attempts", 0) or 0)
                 total_attempts += attempts
-                guesses_total.labels(phase="Quick Dictionary").inc(attempts)
+                reporter.finish(attempts)
+                if not result.get("cancelled"):
+                    self._record_outcome(
+                        hash_type_id, phase_num, 1, int(bool(result.get("cracked"))),
+                        time.time() - phase_started - paused, attempts, phase_timeout,
+                    )
 
                 if result.get("cracked"):
                     elapsed = time.time() - start_time
-                    return self._success(job_id, result["password"], 1, total_attempts, elapsed)
+                    if self.settings.potfile_enabled:
+                        cracked = result.get("cracked_hashes") or {target_hash: result["password"]}
+                        self.potfile.record(cracked, hash_type_id, phase_num, job_id)
+                    return self._success(job_id, result["password"], phase_num, total_attempts, elapsed)
+                if result.get("cancelled"):
+                    elapsed = time.time() - start_time
+                    return self._cancelled(job_id, "User requested cancellation", phase_num, total_attempts, elapsed)
+                checkpoint.complete(phase_key, attempts)
 
-            # Phase 2: Rule-Based Attack
-            if self._is_cancelled(job_id):
-                elapsed = time.time() - start_time
-                return self._cancelled(job_id, "User requested cancellation", None, total_attempts, elapsed)
+            # All phases failed
+            elapsed = time.time() - start_time
+            logger.info(f"Job {job_id}: Password not found after all phases")
+            return self._failure(job_id, "Password not found after all phases", last_phase, total_attempts, elapsed)
 
+        except Exception as e:
+            logger.error(f"Job {job_id}: Pipeline error - {e}")
             elapsed = time.time() - start_time
-            if elapsed < timeout:
-                phase_timeout = min(
-                    self.settings.get_phase_budget(2, timeout),
-                    timeout - elapsed,
-                )
-                self._update_progress(job_id, 35, "Phase 2: Rule-Based Attack", 2, elapsed, timeout)
+            return self._failure(job_id, f"Internal error: {str(e)}", None, total_attempts, elapsed)
+        finally:
+            if running_started:
+                jobs_current.labels(status="running").dec()
+            self.scheduler.release(job_id)
+            self.inflight.release(target_hash, hash_type_id, job_id)
 
-                with MetricsContext(job_id, phase="Rule-Based"):
-                    result = rule_based_attack(target_hash, hash_type_id, phase_timeout)
-                attempts = int(result.get("attempts", 0) or 0)
-                total_attempts += attempts
-                guesses_total.labels(phase="Rule-Based").inc(attempts)
+    def execute_batch(
+        self,
+        job_id: str,
+        target_hashes: List[str],
+        hash_type_id: int,
+        timeout: int,
+    ) -> Dict:
+        """Execute the multi-phase pipeline against a batch of hashes.
 
-                if result.get("cracked"):
-                    elapsed = time.time() - start_time
-                    return self._success(job_id, result["password"], 2, total_attempts, elapsed)
+        Every phase runs once against all still-uncracked hashes, so hashcat
+        startup and wordlist scans are paid once per batch. Per-hash results
+        are written to the ``job:{job_id}:results`` Redis hash as they are
+        recovered, which also lets a retried message skip hashes that an
+        earlier attempt already cracked.
 
-            # Phase 3: PagPassGPT AI Generation
-            if self._is_cancelled(job_id):
-                elapsed = time.time() - start_time
-                return self._cancelled(job_id, "User requested cancellation", None, total_attempts, elapsed)
+        Args:
+            job_id: Unique job identifier
+            target_hashes: Hashes to crack (all of ``hash_type_id``)
+            hash_type_id: Hashcat hash mode
+            timeout: Total timeout in seconds for the whole batch
 
-            elapsed = time.time() - start_time
-            if elapsed < timeout:
-                phase_timeout = min(
-                    self.settings.get_phase_budget(3, timeout),
-                    timeout - elapsed,
-                )
-                self._update_progress(job_id, 60, "Phase 3: AI Generation (PagPassGPT)", 3, elapsed, timeout)
+        Returns:
+            Final batch job state dict
+        """
+        checkpoint = JobCheckpoint(job_id)
+        start_time = time.time() - checkpoint.elapsed
+        total_attempts = checkpoint.attempts
+        running_started = False
+        results_key = f"job:{job_id}:results"
 
-                with MetricsContext(job_id, phase="AI Generation"):
-                    result = ai_generation_attack(target_hash, hash_type_id, phase_timeout)
-                attempts = int(result.get("attempts", 0) or 0)
-                total_attempts += attempts
-                guesses_total.labels(phase="AI Generation").inc(attempts)
+        current_state = self.redis.get_fields(f"job:{job_id}")
+        if current_state.get("status") == JobStatus.CANCELLED:
+            logger.info(f"Job {job_id}: Cancelled before processing started")
+            return self._batch_finished(job_id, JobStatus.CANCELLED, "Cancelled before processing", 0, 0.0)
+
+        pending: Dict[str, str] = {}
+        for target in target_hashes:
+            normalized = normalize_hash(target, hash_type_id)
+            if normalized:
+                pending.setdefault(normalized, target.strip())
+        total_hashes = len(pending)
+
+        for cracked_hash in self.redis.get_fields(results_key):
+            pending.pop(cracked_hash, None)
+
+        if self.settings.potfile_enabled and pending:
+            known = {
+                cracked_hash: {"hash": pending.pop(cracked_hash), "password": entry["password"], "phase": entry.get("phase")}
+                for cracked_hash, entry in self.potfile.lookup_many(list(pending), hash_type_id).items()
+            }
+            if known:
+                self.redis.set_fields(results_key, known, ex=self.settings.redis_ttl)
+                logger.info(f"Job {job_id}: {len(known)} hashes answered from the potfile")
 
-                if result.get("cracked"):
-                    elapsed = time.time() - start_time
-                    return self._success(job_id, result["password"], 3, total_attempts, elapsed)
+        running_state = {
+            **current_state,
+            "job_id": job_id,
+            "status": JobStatus.RUNNING,
+            "submitted_at": self._parse_datetime(current_state.get("submitted_at")) or datetime.utcnow(),
+            "started_at": datetime.utcnow(),
+            "hash_type_id": hash_type_id,
+            "timeout_seconds": timeout,
+            "progress": 0,
+            "time_elapsed": checkpoint.elapsed,
+            "time_remaining": max(0, int(timeout - checkpoint.elapsed)),
+            "total_hashes": total_hashes,
+            "cracked_count": total_hashes - len(pending),
+        }
+        self._write_state(job_id, BatchJobState(**running_state).model_dump(mode="json"), "status")
+        jobs_current.labels(status="running").inc()
+        running_started = True
+        try:
+            lease = self._admit(job_id, current_state, running_state["submitted_at"], checkpoint, timeout)
+            logger.info(f"Job {job_id}: Starting batch pipeline ({len(pending)}/{total_hashes} hashes, timeout={timeout}s)")
 
-            # Phase 4: Limited Mask Attack
-            if self._is_cancelled(job_id):
-                elapsed = time.time() - start_time
-                return self._cancelled(job_id, "User requested cancellation", None, total_attempts, elapsed)
+            plan = get_phase_plan(hash_type_id, timeout)
+            phases = self._planned_phases(plan)
 
-            elapsed = time.time() - start_time
-            if elapsed < timeout:
-                phase_timeout = timeout - elapsed
-                self._update_progress(job_id, 80, "Phase 4: Limited Mask Attack", 4, elapsed, timeout)
+            for index, (phase_num, metrics_label, phase_label, progress, attack) in enumerate(phases):
+                phase_key = f"phase{phase_num}"
+                if not pending:
+                    break
+                if phase_num == 0 and not self.settings.digest_index_enabled:
+                    continue
+                if checkpoint.is_complete(phase_key):
+                    continue
 
-                with MetricsContext(job_id, phase="Mask Attack"):
-                    result = mask_attack(target_hash, hash_type_id, phase_timeout)
+                elapsed = time.time() - start_time
+                if self._is_cancelled(job_id):
+                    return self._batch_finished(
+                        job_id, JobStatus.CANCELLED, "User requested cancellation", total_attempts, elapsed
+                    )
+                if elapsed >= timeout:
+                    break
+
+                phase_timeout = self._phase_timeout(plan, phase_num, timeout, elapsed)
+                self._update_progress(job_id, progress, phase_label, phase_num, elapsed, timeout)
+                checkpoint.start(phase_key)
+
+                reporter = self._phase_progress(job_id, phases, index, hash_type_id)
+                phase_started = time.time()
+                attacked = len(pending)
+                with MetricsContext(job_id, phase=metrics_label):
+                    result, paused = self._run_phase(
+                        job_id, phase_num, attack, list(pending), hash_type_id, phase_timeout, checkpoint, reporter, lease
+                    )
+                start_time += paused
                 attempts = int(result.get("attempts", 0) or 0)
                 total_attempts += attempts
-                guesses_total.labels(phase="Mask Attack").inc(attempts)
-
-                if result.get("cracked"):
+                reporter.finish(attempts)
+
+                found = {
+                    cracked_hash: {"hash": pending.pop(cracked_hash), "password": password, "phase": phase_num}
+                    for cracked_hash, password in (result.get("cracked_hashes") or {}).items()
+                    if cracked_hash in pending
+                }
+                if found:
+                    self.redis.set_fields(results_key, found, ex=self.settings.redis_ttl)
+                    if self.settings.potfile_enabled:
+                        self.potfile.record(
+                            {h: entry["password"] for h, entry in found.items()}, hash_type_id, phase_num, job_id
+                        )
+                    self._write_state(job_id, {"cracked_count": total_hashes - len(pending)}, "results")
+                    logger.info(f"Job {job_id}: Phase {phase_num} cracked {len(found)} hashes, {len(pending)} remaining")
+                if not result.get("cancelled"):
+                    self._record_outcome(
+                        hash_type_id, phase_num, attacked, len(found),
+                        time.time() - phase_started - paused, attempts, phase_timeout,
+                    )
+                if result.get("cancelled"):
                     elapsed = time.time() - start_time
-                    return self._success(job_id, result["password"], 4, total_attempts, elapsed)
+                    return self._batch_finished(
+                        job_id, JobStatus.CANCELLED, "User requested cancellation", total_attempts, elapsed
+                    )
+                checkpoint.complete(phase_key, attempts)
 
-            # All phases failed
             elapsed = time.time() - start_time
-            logger.info(f"Job {job_id}: Password not found after all phases")
-            return self._failure(job_id, "Password not found after all phases", 4, total_attempts, elapsed)
+            cracked_count = total_hashes - len(pending)
+            reason = f"Cracked {cracked_count}/{total_hashes} hashes"
+            status = JobStatus.SUCCESS if cracked_count else JobStatus.FAILED
+            return self._batch_finished(job_id, status, reason, total_attempts, elapsed)
 
         except Exception as e:
-            logger.error(f"Job {job_id}: Pipeline error - {e}")
+            logger.error(f"Job {job_id}: Batch pipeline error - {e}")
             elapsed = time.time() - start_time
-            return self._failure(job_id, f"Internal error: {str(e)}", None, total_attempts, elapsed)
+            return self._batch_finished(job_id, JobStatus.FAILED, f"Internal error: {str(e)}", total_attempts, elapsed)
         finally:
             if running_started:
                 jobs_current.labels(status="running").dec()
+            self.scheduler.release(job_id)
+
+    def _admit(
+        self,
+        job_id: str,
+        current_state: Dict,
+        submitted_at: datetime,
+        checkpoint: JobCheckpoint,
+        timeout: int,
+    ) -> DeviceLease:
+        """Register the job with the device scheduler and record its queue wait.
+
+        Preemption pauses extend the job's budget, so they may only use the
+        slack between what is left of the budget and the actor time limit.
+        The job also records the worker process running it, so the API can
+        tell a running job from one whose worker died.
+        """
+        self._write_state(job_id, {"worker": worker_id()}, "status")
+        priority = current_state.get("priority") or JobPriority.NORMAL
+        if not checkpoint.resumed:
+            label = str(getattr(priority, "value", priority))
+            queue_wait_seconds.labels(priority=label).observe(
+                max(0.0, (datetime.utcnow() - submitted_at).total_seconds())
+            )
+        max_pause = self.settings.worker_timeout - _TIME_LIMIT_MARGIN - max(0.0, timeout - checkpoint.elapsed)
+        return self.scheduler.admit(job_id, priority, max_pause=max(0.0, max_pause))
+
+    def _run_phase(
+        self,
+        job_id: str,
+        phase_num: int,
+        attack,
+        target_hash,
+        hash_type_id: int,
+        phase_timeout: float,
+        checkpoint: JobCheckpoint,
+        reporter: PhaseProgress,
+        lease: DeviceLease,
+    ) -> Tuple[Dict, float]:
+        """Run a phase, yielding the device to higher-priority jobs when asked.
+
+        A preempted phase waits for the device and then runs again with the
+        rest of its budget, restoring the interrupted hashcat session.
+        Attempts are summed over the runs.
+
+        Returns:
+            (phase result, seconds spent waiting for the device)
+        """
+        paused = 0.0
+        attempts = 0
+        remaining = phase_timeout
+        while True:
+            started = time.time()
+            result = self._run_attack(
+                job_id, phase_num, attack, target_hash, hash_type_id, remaining, checkpoint, reporter, lease
+            )
+            attempts += int(result.get("attempts", 0) or 0)
+            remaining -= time.time() - started
+            if not result.get("preempted") or result.get("cracked") or remaining < 1:
+                break
+            paused += lease.wait_turn(lambda: self._is_cancelled(job_id))
+            if self._is_cancelled(job_id):
+                result["cancelled"] = True
+                break
+        result["attempts"] = attempts
+        return result, paused
+
+    def _run_attack(
+        self,
+        job_id: str,
+        phase_num: int,
+        attack,
+        target_hash,
+        hash_type_id: int,
+        phase_timeout: float,
+        checkpoint: JobCheckpoint,
+        reporter: PhaseProgress,
+        lease: DeviceLease,
+    ) -> Dict:
+        """Run one phase, fanned out across the worker pool when it is worth it.
+
+        A fanned-out phase handles checkpoints and preemption per shard, so it
+        never returns a preempted result.
+        """
+        shards = self.settings.keyspace_shards
+        if shards > 1 and phase_num in SHARDED_PHASES and phase_timeout >= self.settings.keyspace_shard_min_timeout:
+            targets = [target_hash] if isinstance(target_hash, str) else target_hash
+            return KeyspaceFanout(job_id, phase_num, shards).run(
+                targets, hash_type_id, phase_timeout, on_status=reporter, checkpoint=checkpoint, lease=lease
+            )
+        options = {}
+        if phase_num == 3:
+            # Candidate generator requested by the job (None = configured default)
+            options["generator"] = self.redis.get_field(f"job:{job_id}", "generator")
+        return attack(
+            target_hash,
+            hash_type_id,
+            phase_timeout,
+            checkpoint=checkpoint,
+            on_status=reporter,
+            should_cancel=lambda: self._is_cancelled(job_id),
+            should_pause=lease.should_yield if lease.preemptible else None,
+            **options,
+        )
+
+    def _planned_phases(self, plan: PhasePlan) -> List[Tuple]:
+        """PHASES entries in plan order; the n-th phase run takes the n-th progress slot."""
+        by_num = {phase[0]: phase for phase in PHASES}
+        return [
+            (*by_num[phase_num][:3], PHASES[position][3], by_num[phase_num][4])
+            for position, phase_num in enumerate(plan.order)
+        ]
+
+    def _phase_timeout(self, plan: PhasePlan, phase_num: int, timeout: int, elapsed: float) -> float:
+        """Time budget of a phase; the last planned phase gets all remaining time."""
+        if phase_num == plan.order[-1]:
+            return timeout - elapsed
+        return min(plan.budget(phase_num, timeout), timeout - elapsed)
+
+    def _phase_progress(self, job_id: str, phases: List[Tuple], index: int, hash_type_id: int) -> PhaseProgress:
+        """Live progress tracker spanning a phase's share of the progress bar."""
+        progress_end = phases[index + 1][3] if index + 1 < len(phases) else 100
+        return PhaseProgress(job_id, phases[index][1], hash_type_id, phases[index][3], progress_end)
+
+    def _record_outcome(
+        self,
+        hash_type_id: int,
+        phase_num: int,
+        hashes: int,
+        cracks: int,
+        seconds: float,
+        attempts: int,
+        phase_timeout: float,
+    ) -> None:
+        """Feed a finished phase into the statistics adaptive budgets are planned from."""
+        if phase_num not in BUDGETED_PHASES or hashes <= 0:
+            return
+        # A phase that gave up well before its budget without cracking everything ran out of candidates
+        exhausted = cracks < hashes and seconds < phase_timeout * 0.9
+        record_phase_outcome(hash_type_id, phase_num, hashes, cracks, seconds, attempts, exhausted)
 
     def _update_progress(
         self,
@@ -201,7 +492,9 @@ class CrackingPipeline:
             "time_remaining": max(0, int(timeout - elapsed)),
         }
 
-        self.redis.update(f"job:{job_id}", updates)
+        self._write_state(job_id, updates, "phase")
+        # Live hashcat progress of the previous phase no longer applies
+        self.redis.delete(f"job:{job_id}:progress")
         logger.debug(f"Job {job_id}: Progress {progress}% - {phase}")
 
     def _parse_datetime(self, value: Optional[str]) -> Optional[datetime]:
@@ -215,8 +508,23 @@ class CrackingPipeline:
         return None
 
     def _is_cancelled(self, job_id: str) -> bool:
-        state = self.redis.get(f"job:{job_id}") or {}
-        return state.get("status") == JobStatus.CANCELLED
+        return self.redis.get_field(f"job:{job_id}", "status") == JobStatus.CANCELLED
+
+    def _write_state(self, job_id: str, fields: Dict, event: str) -> None:
+        """Write changed job state fields and publish them as an event.
+
+        Args:
+            job_id: Job identifier
+            fields: Changed fields (JSON-serialisable)
+            event: Event name (status, phase, results)
+        """
+        self.redis.set_fields(
+            f"job:{job_id}",
+            fields,
+            ex=self.settings.redis_ttl,
+            channel=f"job:{job_id}:events",
+            event=event,
+        )
 
     def _success(
         self,
@@ -239,10 +547,9 @@ class CrackingPipeline:
             Final job state dict
         """
         # Get current job state and update it
-        current_state = self.redis.get(f"job:{job_id}") or {}
+        current_state = self.redis.get_fields(f"job:{job_id}")
 
-        result_state = {
-            **current_state,
+        result_fields = {
             "job_id": job_id,
             "status": JobStatus.SUCCESS,
             "result": password,
@@ -253,14 +560,15 @@ class CrackingPipeline:
             "progress": 100,
         }
 
-        self.redis.set(f"job:{job_id}", result_state, ex=self.settings.redis_ttl)
+        self._write_state(job_id, result_fields, "status")
+        clear_checkpoint(job_id)
 
         jobs_total.labels(status="success").inc()
         job_duration.labels(status="success").observe(elapsed)
 
         logger.info(f"Job {job_id}: SUCCESS - Password '{password}' cracked in phase {phase} ({elapsed:.2f}s)")
 
-        return result_state
+        return {**current_state, **result_fields}
 
     def _failure(
         self,
@@ -283,10 +591,9 @@ class CrackingPipeline:
             Final job state dict
         """
         # Get current job state and update it
-        current_state = self.redis.get(f"job:{job_id}") or {}
+        current_state = self.redis.get_fields(f"job:{job_id}")
 
-        result_state = {
-            **current_state,
+        result_fields = {
             "job_id": job_id,
             "status": JobStatus.FAILED,
             "reason": reason,
@@ -297,14 +604,15 @@ class CrackingPipeline:
             "progress": 100,
         }
 
-        self.redis.set(f"job:{job_id}", result_state, ex=self.settings.redis_ttl)
+        self._write_state(job_id, result_fields, "status")
+        clear_checkpoint(job_id)
 
         jobs_total.labels(status="failed").inc()
         job_duration.labels(status="failed").observe(elapsed)
 
         logger.info(f"Job {job_id}: FAILED - {reason} after {elapsed:.2f}s")
 
-        return result_state
+        return {**current_state, **result_fields}
 
     def _cancelled(
         self,
@@ -314,10 +622,9 @@ class CrackingPipeline:
         attempts: int,
         elapsed: float,
     ) -> Dict:
-        current_state = self.redis.get(f"job:{job_id}") or {}
+        current_state = self.redis.get_fields(f"job:{job_id}")
 
-        result_state = {
-            **current_state,
+        result_fields = {
             "job_id": job_id,
             "status": JobStatus.CANCELLED,
             "reason": reason,
@@ -328,14 +635,79 @@ class CrackingPipeline:
             "progress": 100,
         }
 
-        self.redis.set(f"job:{job_id}", result_state, ex=self.settings.redis_ttl)
+        self._write_state(job_id, result_fields, "status")
+        clear_checkpoint(job_id)
 
         jobs_total.labels(status="cancelled").inc()
         job_duration.labels(status="cancelled").observe(elapsed)
 
         logger.info(f"Job {job_id}: CANCELLED - {reason} after {elapsed:.2f}s")
 
-        return result_state
+        return {**current_state, **result_fields}
+
+    def _batch_finished(
+        self,
+        job_id: str,
+        status: JobStatus,
+        reason: str,
+        attempts: int,
+        elapsed: float,
+    ) -> Dict:
+        """Record the terminal state of a batch job.
+
+        Args:
+            job_id: Job identifier
+            status: Final job status
+            reason: Human readable summary
+            attempts: Total attempts across phases
+            elapsed: Elapsed time
+
+        Returns:
+            Final job state dict
+        """
+        current_state = self.redis.get_fields(f"job:{job_id}")
+
+        result_fields = {
+            "job_id": job_id,
+            "status": status,
+            "reason": reason,
+            "attempts": attempts,
+            "time_elapsed": elapsed,
+            "time_remaining": 0,
+            "progress": 100,
+        }
+
+        self._write_state(job_id, result_fields, "status")
+        clear_checkpoint(job_id)
+
+        status_label = JobStatus(status).value
+        jobs_total.labels(status=status_label).inc()
+        job_duration.labels(status=status_label).observe(elapsed)
+
+        logger.info(f"Job {job_id}: {status_label.upper()} - {reason} after {elapsed:.2f}s")
+
+        return {**current_state, **result_fields}
+
+
+def run_batch_cracking_pipeline(
+    job_id: str,
+    target_hashes: List[str],
+    hash_type_id: int,
+    timeout: int,
+) -> Dict:
+    """Run batch cracking pipeline (convenience function for Dramatiq).
+
+    Args:
+        job_id: Job identifier
+        target_hashes: Hashes to crack
+        hash_type_id: Hash mode
+        timeout: Timeout in seconds for the whole batch
+
+    Returns:
+        Final batch job state
+    """
+    pipeline = CrackingPipeline()
+    return pipeline.execute_batch(job_id, target_hashes, hash_type_id, timeout)
 
 
 def run_cracking_pipeline(job_id: str, target_hash: str, hash_type_id: int, timeout: int) -> Dict:
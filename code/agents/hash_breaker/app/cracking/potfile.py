@@ -0,0 +1,169 @@
+"""Cluster-wide potfile and single-flight registry for submitted hashes.
+
+Two Redis structures keep identical hashes from running the pipeline twice:
+
+    potfile:{hash_type_id}            hash of normalized hash -> cracked entry,
+                                      kept without expiry (cluster potfile)
+    inflight:{hash_type_id}:{hash}    id of the job currently cracking a hash
+
+A submission of an already cracked hash is answered from the potfile; one
+of a hash that is still being cracked attaches to the running job. The
+owning job counts its attached submitters in the ``attached`` field of its
+``job:{job_id}`` hash, so a cancellation only stops the job once nobody
+else is waiting for it.
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from app.config import get_settings
+from app.cracking.hashcat_runner import normalize_hash
+from app.utils.metrics import duplicate_hit_ratio, submissions_total
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class Potfile:
+    """Persistent store of every hash the cluster has cracked."""
+
+    def __init__(self):
+        """Initialize the potfile."""
+        self.redis = get_redis()
+
+    def lookup(self, target_hash: str, hash_type_id: int) -> Optional[Dict]:
+        """Find a cracked entry for one hash.
+
+        Args:
+            target_hash: Hash as submitted
+            hash_type_id: Hashcat hash mode
+
+        Returns:
+            Entry with ``password``, ``phase``, ``job_id`` and ``cracked_at``, or None
+        """
+        return self.lookup_many([target_hash], hash_type_id).get(normalize_hash(target_hash, hash_type_id))
+
+    def lookup_many(self, target_hashes: Iterable[str], hash_type_id: int) -> Dict[str, Dict]:
+        """Find cracked entries for several hashes of one type.
+
+        Args:
+            target_hashes: Hashes as submitted
+            hash_type_id: Hashcat hash mode
+
+        Returns:
+            Normalized hash to entry mapping for the hashes found
+        """
+        normalized = list(dict.fromkeys(normalize_hash(h, hash_type_id) for h in target_hashes))
+        return self.redis.get_fields_of(self._key(hash_type_id), [h for h in normalized if h])
+
+    def record(self, cracked_hashes: Dict[str, str], hash_type_id: int, phase: int, job_id: str) -> None:
+        """Store newly cracked hashes.
+
+        Args:
+            cracked_hashes: Hash to password mapping
+            hash_type_id: Hashcat hash mode
+            phase: Phase that cracked them
+            job_id: Job that cracked them
+        """
+        cracked_at = datetime.utcnow().isoformat()
+        entries = {
+            normalize_hash(cracked_hash, hash_type_id): {
+                "password": password,
+                "phase": phase,
+                "job_id": job_id,
+                "cracked_at": cracked_at,
+            }
+            for cracked_hash, password in cracked_hashes.items()
+        }
+        self.redis.set_fields(self._key(hash_type_id), entries, ex=0)
+
+    def _key(self, hash_type_id: int) -> str:
+        return f"potfile:{hash_type_id}"
+
+
+class InflightRegistry:
+    """Single-flight registry mapping a hash to the job cracking it."""
+
+    def __init__(self):
+        """Initialize the registry."""
+        self.redis = get_redis()
+        self.settings = get_settings()
+
+    def claim(self, target_hash: str, hash_type_id: int, job_id: str) -> Optional[str]:
+        """Register ``job_id`` as the job cracking a hash unless one already is.
+
+        Args:
+            target_hash: Hash as submitted
+            hash_type_id: Hashcat hash mode
+            job_id: Job that would crack it
+
+        Returns:
+            Owning job id (``job_id`` if the claim succeeded), or None if
+            Redis is unavailable
+        """
+        return self.redis.claim(self._key(target_hash, hash_type_id), job_id, ex=self.settings.redis_ttl)
+
+    def replace(self, target_hash: str, hash_type_id: int, stale_job_id: str, job_id: str) -> bool:
+        """Take over the claim of a job that is no longer running.
+
+        Args:
+            target_hash: Hash as submitted
+            hash_type_id: Hashcat hash mode
+            stale_job_id: Job currently registered
+            job_id: Job taking over
+
+        Returns:
+            True if ``job_id`` now owns the hash
+        """
+        key = self._key(target_hash, hash_type_id)
+        self.redis.release(key, stale_job_id)
+        return self.redis.claim(key, job_id, ex=self.settings.redis_ttl) == job_id
+
+    def release(self, target_hash: str, hash_type_id: int, job_id: str) -> None:
+        """Drop the claim of a finished job.
+
+        Args:
+            target_hash: Hash as submitted
+            hash_type_id: Hashcat hash mode
+            job_id: Job that claimed the hash
+        """
+        self.redis.release(self._key(target_hash, hash_type_id), job_id)
+
+    def attach(self, job_id: str) -> None:
+        """Count one more submitter sharing a running job."""
+        self.redis.increment_field(f"job:{job_id}", "attached", 1)
+
+    def detach(self, job_id: str) -> bool:
+        """Drop one submitter of a job that is being cancelled.
+
+        Args:
+            job_id: Job the cancelling submitter shares
+
+        Returns:
+            True if other submitters still wait for the job, so it must keep
+            running
+        """
+        left = self.redis.increment_field(f"job:{job_id}", "attached", -1)
+        return left is not None and left >= 0
+
+    def _key(self, target_hash: str, hash_type_id: int) -> str:
+        return f"inflight:{hash_type_id}:{normalize_hash(target_hash, hash_type_id)}"
+
+
+_outcomes = {"new": 0, "attached": 0, "potfile": 0}
+_outcomes_lock = threading.Lock()
+
+
+def record_submission(outcome: str) -> None:
+    """Count a single-hash submission outcome and update the duplicate hit ratio.
+
+    Args:
+        outcome: ``new``, ``attached`` or ``potfile``
+    """
+    submissions_total.labels(outcome=outcome).inc()
+    with _outcomes_lock:
+        _outcomes[outcome] += 1
+        total = sum(_outcomes.values())
+        duplicate_hit_ratio.set((total - _outcomes["new"]) / total)
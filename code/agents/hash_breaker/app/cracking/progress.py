@@ -0,0 +1,125 @@
+"""Live job progress from hashcat status reports.
+
+A ``PhaseProgress`` is handed to a phase as the ``on_status`` callback of
+its hashcat runs. It turns status reports into guess counts and speed for
+Prometheus and, at most every ``progress_update_interval`` seconds, writes
+real keyspace coverage, speed and ETA to the ``job:{job_id}:progress``
+Redis hash, which the status endpoint merges into the job state, and
+publishes the same fields as a ``progress`` event on ``job:{job_id}:events``.
+"""
+
+import logging
+import threading
+import time
+
+from app.config import get_settings
+from app.cracking.hashcat_runner import HashcatStatus
+from app.utils.metrics import guesses_total, hashcat_guess_rate
+from app.utils.redis_client import get_redis
+from app.utils.telemetry import observe
+
+logger = logging.getLogger(__name__)
+
+GUESS_RATE_KEY = "phase_stats:guesses_per_second"
+
+
+class PhaseProgress:
+    """Status callback tracking one phase of a job."""
+
+    def __init__(
+        self,
+        job_id: str,
+        phase: str,
+        hash_type_id: int,
+        progress_start: int,
+        progress_end: int,
+    ):
+        """Initialize the tracker.
+
+        Args:
+            job_id: Job identifier
+            phase: Metrics label of the phase
+            hash_type_id: Hashcat hash mode (speed statistics are per mode)
+            progress_start: Job progress % when the phase starts
+            progress_end: Job progress % when the phase's keyspace is exhausted
+        """
+        self.settings = get_settings()
+        self.redis = get_redis()
+        self.key = f"job:{job_id}:progress"
+        self.channel = f"job:{job_id}:events"
+        self.phase = phase
+        self.hash_type_id = hash_type_id
+        self.progress_start = progress_start
+        self.progress_end = progress_end
+        self.counted = 0
+        self.last_speed = 0.0
+        self._last_done = 0
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, status: HashcatStatus) -> None:
+        """Record one hashcat status report."""
+        with self._lock:
+            # Progress restarts from zero when a phase launches another hashcat run
+            delta = status.progress_done - self._last_done
+            if delta < 0:
+                delta = status.progress_done
+            self._last_done = status.progress_done
+            if delta > 0:
+                self.counted += delta
+                guesses_total.labels(phase=self.phase).inc(delta)
+
+            if status.speed > 0:
+                self.last_speed = status.speed
+                hashcat_guess_rate.labels(phase=self.phase).set(status.speed)
+
+            now = time.time()
+            if now - self._last_write < self.settings.progress_update_interval:
+                return
+            self._last_write = now
+
+        span = self.progress_end - self.progress_start
+        self.redis.set_fields(
+            self.key,
+            {
+                "progress": int(self.progress_start + span * status.fraction),
+                "keyspace_done": status.progress_done,
+                "keyspace_total": status.progress_total,
+                "guesses_per_second": status.speed,
+                "phase_eta_seconds": status.eta,
+                "recovered_hashes": status.recovered,
+            },
+            channel=self.channel,
+            event="progress",
+        )
+
+    def finish(self, attempts: int) -> None:
+        """Account for the phase's final attempt count and measured speed.
+
+        Args:
+            attempts: Attempts reported by the phase
+        """
+        remainder = max(0, int(attempts) - self.counted)
+        if remainder:
+            guesses_total.labels(phase=self.phase).inc(remainder)
+            self.counted += remainder
+        if self.last_speed > 0:
+            observe("phase_guesses_per_second", self.last_speed, self.phase)
+            self.redis.set_fields(
+                GUESS_RATE_KEY,
+                {f"{self.hash_type_id}:{self.phase}": self.last_speed},
+            )
+
+
+def recorded_guess_rate(hash_type_id: int, phase: str) -> float:
+    """Last hashcat speed measured for a hash mode in a phase (0 if never measured).
+
+    Args:
+        hash_type_id: Hashcat hash mode
+        phase: Metrics label of the phase
+    """
+    value = get_redis().get_field(GUESS_RATE_KEY, f"{hash_type_id}:{phase}")
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,547 @@
+"""Pure-Python implementation of hashcat rules.
+
+Parses hashcat rule files (``best64.rule`` and friends) into compiled
+``bytes -> Optional[bytes]`` transformation functions so CPU-only workers can
+run the rule-based phase on the multi-core CPU engine. A compiled rule
+returns None when one of its rejection functions rejects the candidate.
+
+Memory functions (``M``, ``4``, ``6``, ``X``, ``Q``) are not supported; rules
+using them are dropped when a rule file is loaded for the CPU engine.
+
+Phase 2 runs in stages over the frequency-ordered wordlist and the rules
+ranked by measured hits per candidate: the top words through the top rules
+first, then both widen. Each stage runs as word x rule blocks (``RuleStage``)
+covering what the earlier stages left out. Statistics per rule file live in
+Redis:
+
+    rule_stats:{file}:hits         rule -> hashes it cracked
+    rule_stats:{file}:candidates   rule -> candidates it produced
+    rule_stats:{file}:stages       ``{block}|{runs,candidates,cracks,ms,exhausted}``
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from app.cracking.cpu_engine import WordlistRange
+from app.cracking.wordlist_store import BucketRange
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+RuleFunc = Callable[[bytes], Optional[bytes]]
+
+
+class RuleParseError(ValueError):
+    """Raised when a rule uses unknown or unsupported functions."""
+
+
+def _pos(char: str) -> int:
+    if "0" <= char <= "9":
+        return ord(char) - ord("0")
+    if "A" <= char <= "Z":
+        return ord(char) - ord("A") + 10
+    raise RuleParseError(f"Invalid position {char!r}")
+
+
+def _toggle(byte: int) -> int:
+    if 65 <= byte <= 90 or 97 <= byte <= 122:
+        return byte ^ 0x20
+    return byte
+
+
+def _title(word: bytes, separator: int) -> bytes:
+    out = bytearray(word.lower())
+    upper_next = True
+    for i, byte in enumerate(out):
+        if upper_next and 97 <= byte <= 122:
+            out[i] = byte - 32
+        upper_next = byte == separator
+    return bytes(out)
+
+
+def _at(word: bytes, n: int, op: Callable[[int], int]) -> bytes:
+    if n >= len(word):
+        return word
+    return word[:n] + bytes([op(word[n]) & 0xFF]) + word[n + 1:]
+
+
+def _toggle_after(word: bytes, n: int, char: int) -> bytes:
+    seen = -1
+    for i, byte in enumerate(word):
+        if byte == char:
+            seen += 1
+            if seen == n:
+                return _at(word, i + 1, _toggle)
+    return word
+
+
+def _swap(word: bytes, a: int, b: int) -> bytes:
+    if a >= len(word) or b >= len(word):
+        return word
+    chars = bytearray(word)
+    chars[a], chars[b] = chars[b], chars[a]
+    return bytes(chars)
+
+
+# function char -> (argument spec, builder). Spec letters: N = position, X = character.
+_FUNCTIONS: Dict[str, Tuple[str, Callable[..., RuleFunc]]] = {
+    ":": ("", lambda: lambda w: w),
+    "l": ("", lambda: bytes.lower),
+    "u": ("", lambda: bytes.upper),
+    "c": ("", lambda: bytes.capitalize),
+    "C": ("", lambda: lambda w: w[:1].lower() + w[1:].upper()),
+    "t": ("", lambda: bytes.swapcase),
+    "T": ("N", lambda n: lambda w: _at(w, n, _toggle)),
+    "r": ("", lambda: lambda w: w[::-1]),
+    "d": ("", lambda: lambda w: w + w),
+    "p": ("N", lambda n: lambda w: w * (n + 1)),
+    "f": ("", lambda: lambda w: w + w[::-1]),
+    "{": ("", lambda: lambda w: w[1:] + w[:1]),
+    "}": ("", lambda: lambda w: w[-1:] + w[:-1]),
+    "$": ("X", lambda x: lambda w: w + x),
+    "^": ("X", lambda x: lambda w: x + w),
+    "[": ("", lambda: lambda w: w[1:]),
+    "]": ("", lambda: lambda w: w[:-1]),
+    "D": ("N", lambda n: lambda w: w[:n] + w[n + 1:]),
+    "x": ("NN", lambda n, m: lambda w: w[n:n + m] if n < len(w) else w),
+    "O": ("NN", lambda n, m: lambda w: w[:n] + w[n + m:] if n < len(w) else w),
+    "i": ("NX", lambda n, x: lambda w: w[:n] + x + w[n:] if n <= len(w) else w),
+    "o": ("NX", lambda n, x: lambda w: w[:n] + x + w[n + 1:] if n < len(w) else w),
+    "'": ("N", lambda n: lambda w: w[:n]),
+    "s": ("XX", lambda x, y: lambda w: w.replace(x, y)),
+    "@": ("X", lambda x: lambda w: w.replace(x, b"")),
+    "z": ("N", lambda n: lambda w: w[:1] * n + w),
+    "Z": ("N", lambda n: lambda w: w + w[-1:] * n),
+    "q": ("", lambda: lambda w: bytes(b for byte in w for b in (byte, byte))),
+    "k": ("", lambda: lambda w: _swap(w, 0, 1)),
+    "K": ("", lambda: lambda w: _swap(w, len(w) - 1, len(w) - 2) if len(w) > 1 else w),
+    "*": ("NN", lambda n, m: lambda w: _swap(w, n, m)),
+    "L": ("N", lambda n: lambda w: _at(w, n, lambda b: b << 1)),
+    "R": ("N", lambda n: lambda w: _at(w, n, lambda b: b >> 1)),
+    "+": ("N", lambda n: lambda w: _at(w, n, lambda b: b + 1)),
+    "-": ("N", lambda n: lambda w: _at(w, n, lambda b: b - 1)),
+    ".": ("N", lambda n: lambda w: w[:n] + w[n + 1:n + 2] + w[n + 1:] if n + 1 < len(w) else w),
+    ",": ("N", lambda n: lambda w: w[:n] + w[n - 1:n] + w[n + 1:] if 0 < n < len(w) else w),
+    "y": ("N", lambda n: lambda w: w[:n] + w if n <= len(w) else w),
+    "Y": ("N", lambda n: lambda w: w + w[len(w) - n:] if 0 < n <= len(w) else w),
+    "E": ("", lambda: lambda w: _title(w, 0x20)),
+    "e": ("X", lambda x: lambda w: _title(w, x[0])),
+    "3": ("NX", lambda n, x: lambda w: _toggle_after(w, n, x[0])),
+    # Rejection functions
+    "<": ("N", lambda n: lambda w: w if len(w) < n else None),
+    ">": ("N", lambda n: lambda w: w if len(w) > n else None),
+    "_": ("N", lambda n: lambda w: w if len(w) == n else None),
+    "!": ("X", lambda x: lambda w: None if x in w else w),
+    "/": ("X", lambda x: lambda w: w if x in w else None),
+    "(": ("X", lambda x: lambda w: w if w[:1] == x else None),
+    ")": ("X", lambda x: lambda w: w if w[-1:] == x else None),
+    "=": ("NX", lambda n, x: lambda w: w if w[n:n + 1] == x else None),
+    "%": ("NX", lambda n, x: lambda w: w if w.count(x) >= n else None),
+}
+
+_UNSUPPORTED = set("M46XQ")
+
+
+def parse_rule(rule: str) -> List[RuleFunc]:
+    """Parse one hashcat rule line into its transformation functions.
+
+    Args:
+        rule: Rule text, e.g. ``"c $1 $2"``
+
+    Returns:
+        List of functions applied left to right
+
+    Raises:
+        RuleParseError: If the rule is malformed or uses unsupported functions
+    """
+    funcs: List[RuleFunc] = []
+    i = 0
+    while i < len(rule):
+        name = rule[i]
+        i += 1
+        if name in (" ", "\t"):
+            continue
+        if name in _UNSUPPORTED:
+            raise RuleParseError(f"Unsupported rule function {name!r}")
+        if name not in _FUNCTIONS:
+            raise RuleParseError(f"Unknown rule function {name!r}")
+
+        spec, builder = _FUNCTIONS[name]
+        if i + len(spec) > len(rule):
+            raise RuleParseError(f"Missing arguments for {name!r}")
+        args = []
+        for kind in spec:
+            char = rule[i]
+            i += 1
+            args.append(_pos(char) if kind == "N" else char.encode("latin-1"))
+        funcs.append(builder(*args))
+    return funcs
+
+
+@lru_cache(maxsize=4096)
+def compile_rule(rule: str) -> RuleFunc:
+    """Compile a rule into a single candidate transformation.
+
+    Args:
+        rule: Rule text
+
+    Returns:
+        Function mapping a word to its mutation, or None when rejected
+    """
+    funcs = parse_rule(rule)
+    if len(funcs) == 1:
+        return funcs[0]
+
+    def apply(word: bytes) -> Optional[bytes]:
+        for func in funcs:
+            word = func(word)
+            if word is None:
+                return None
+        return word
+
+    return apply
+
+
+def read_rule_lines(rules_file: Path) -> List[str]:
+    """Read the distinct rules of a hashcat rule file, in file order.
+
+    Comments and blank lines are skipped; unsupported rules are kept, since
+    hashcat runs them.
+
+    Args:
+        rules_file: Path to the rule file
+
+    Returns:
+        Rule strings
+    """
+    rules: List[str] = []
+    seen = set()
+    with open(rules_file, "r", encoding="latin-1") as handle:
+        for line in handle:
+            rule = line.rstrip("\r\n")
+            if not rule.strip() or rule.lstrip().startswith("#") or rule in seen:
+                continue
+            seen.add(rule)
+            rules.append(rule)
+    return rules
+
+
+def load_rules(rules_file: Path) -> List[str]:
+    """Load the supported rules of a hashcat rule file, in file order.
+
+    Comments, blank lines, duplicates and rules using unsupported functions
+    are skipped.
+
+    Args:
+        rules_file: Path to the rule file
+
+    Returns:
+        Rule strings
+    """
+    rules: List[str] = []
+    skipped = 0
+    for rule in read_rule_lines(rules_file):
+        try:
+            compile_rule(rule)
+        except RuleParseError:
+            skipped += 1
+            continue
+        rules.append(rule)
+    if skipped:
+        logger.info(f"Rules: skipped {skipped} unsupported rules in {rules_file}")
+    return rules
+
+
+# A rule without statistics is ranked as if it had cracked one hash in this
+# many candidates; measured yields replace the prior as candidates accumulate
+_PRIOR_CANDIDATES = 1_000_000
+
+
+def rule_yield(hits: int, candidates: int) -> float:
+    """Smoothed hits per candidate of a rule."""
+    return (hits + 1) / (candidates + _PRIOR_CANDIDATES)
+
+
+def rank_rules(
+    rules: Sequence[str],
+    hits: Dict[str, int],
+    candidates: Optional[Dict[str, int]] = None,
+) -> List[str]:
+    """Order rules by measured hits per candidate, keeping file order for ties.
+
+    Without candidate counts rules are ordered by hit count alone.
+    """
+    order = {rule: i for i, rule in enumerate(rules)}
+    if candidates is None:
+        return sorted(rules, key=lambda rule: (-int(hits.get(rule, 0)), order[rule]))
+    return sorted(
+        rules,
+        key=lambda rule: (-rule_yield(int(hits.get(rule, 0)), int(candidates.get(rule, 0))), order[rule]),
+    )
+
+
+def ranked_rules(rules_file: Path, supported_only: bool = False) -> List[str]:
+    """Rules of a rule file ordered by their recorded yield.
+
+    Args:
+        rules_file: Path to the rule file
+        supported_only: Drop rules the CPU rule engine cannot run
+
+    Returns:
+        Rule strings, highest yield first
+    """
+    rules = load_rules(rules_file) if supported_only else read_rule_lines(rules_file)
+    return rank_rules(rules, get_rule_hits(rules_file), get_rule_candidates(rules_file))
+
+
+def write_rule_file(rules: Sequence[str], rules_file: Path) -> Path:
+    """Write rules, in order, as a hashcat rule file."""
+    rules_file = Path(rules_file)
+    rules_file.parent.mkdir(parents=True, exist_ok=True)
+    rules_file.write_text("".join(f"{rule}\n" for rule in rules), encoding="latin-1")
+    return rules_file
+
+
+def _hits_key(rules_file: Path) -> str:
+    return f"rule_stats:{Path(rules_file).name}:hits"
+
+
+def _candidates_key(rules_file: Path) -> str:
+    return f"rule_stats:{Path(rules_file).name}:candidates"
+
+
+def _stages_key(rules_file: Path) -> str:
+    return f"rule_stats:{Path(rules_file).name}:stages"
+
+
+def get_rule_hits(rules_file: Path) -> Dict[str, int]:
+    """Historical crack count per rule of a rule file."""
+    return get_redis().get_counters(_hits_key(rules_file))
+
+
+def get_rule_candidates(rules_file: Path) -> Dict[str, int]:
+    """Candidates each rule of a rule file has produced so far."""
+    return get_redis().get_counters(_candidates_key(rules_file))
+
+
+def record_rule_hits(rules_file: Path, cracking_rules: Sequence[str]) -> None:
+    """Credit the rules that produced cracked passwords."""
+    if cracking_rules:
+        get_redis().increment_fields(_hits_key(rules_file), Counter(cracking_rules))
+
+
+@dataclass(frozen=True)
+class RuleStage:
+    """A block of a phase 2 stage: word ranks ``[start, end)`` of the
+    frequency-ordered wordlist through ranked rules ``[rule_start, rule_end)``.
+
+    ``label`` names the unsharded block (``"0-10000x0-16"``,
+    ``"1000000-x0-64"``) and keys the block's statistics and checkpoint step.
+    """
+
+    label: str
+    start: int
+    end: Optional[int]
+    rule_start: int = 0
+    rule_end: Optional[int] = None
+
+    def hashcat_args(self) -> List[str]:
+        """``--skip``/``--limit`` arguments restricting hashcat to the word slice."""
+        args = ["--skip", str(self.start)] if self.start else []
+        if self.end is not None:
+            args += ["--limit", str(self.end - self.start)]
+        return args
+
+    def select_rules(self, rules: Sequence[str]) -> List[str]:
+        """This block's slice of the ranked rules."""
+        return list(rules[self.rule_start:self.rule_end])
+
+
+def stage_bounds(cutoffs: Sequence[int]) -> List[Tuple[int, Optional[int]]]:
+    """Word rank ranges of the stages cut at ``cutoffs``; the last one is open-ended."""
+    edges = [0, *sorted({int(c) for c in cutoffs if int(c) > 0})]
+    return [(start, end) for start, end in zip(edges, edges[1:])] + [(edges[-1], None)]
+
+
+def stage_label(start: int, end: Optional[int]) -> str:
+    """Label of the stage over word ranks ``[start, end)``."""
+    return f"{start}-{end if end is not None else ''}"
+
+
+def block_label(words: Tuple[int, Optional[int]], rules: Tuple[int, Optional[int]]) -> str:
+    """Label of the block of word ranks ``words`` through rule ranks ``rules``."""
+    return f"{stage_label(*words)}x{stage_label(*rules)}"
+
+
+def block_sort_key(label: str) -> Tuple[int, int]:
+    """Sort key of a block label: word start, then rule start."""
+    words, _, rules = label.partition("x")
+    return int(words.split("-")[0]), int(rules.split("-")[0]) if rules else 0
+
+
+def stage_blocks(
+    word_cutoffs: Sequence[int], rule_cutoffs: Sequence[int]
+) -> List[Tuple[Tuple[int, Optional[int]], Tuple[int, Optional[int]]]]:
+    """Word x rule rank blocks of the stages, in execution order.
+
+    Stage ``i`` runs the top ``word_cutoffs[i]`` words through the top
+    ``rule_cutoffs[i]`` rules (the last stage everything), minus what the
+    earlier stages ran: the new rules on every word so far, and the new words
+    through the earlier rules. Together the blocks cover every word with
+    every rule exactly once.
+    """
+    words = [end for _, end in stage_bounds(word_cutoffs)]
+    rules = [end for _, end in stage_bounds(rule_cutoffs)]
+    depth = max(len(words), len(rules))
+    words += [None] * (depth - len(words))
+    rules += [None] * (depth - len(rules))
+
+    blocks = []
+    prev_words: Optional[int] = 0
+    prev_rules: Optional[int] = 0
+    for word_end, rule_end in zip(words, rules):
+        if _wider(rule_end, prev_rules):
+            blocks.append(((0, word_end), (prev_rules, rule_end)))
+        if prev_rules != 0 and _wider(word_end, prev_words):
+            blocks.append(((prev_words, word_end), (0, prev_rules)))
+        prev_words, prev_rules = word_end, rule_end
+    return blocks
+
+
+def _wider(end: Optional[int], prev_end: Optional[int]) -> bool:
+    if prev_end is None:
+        return False
+    return end is None or end > prev_end
+
+
+def plan_rule_stages(
+    words: int,
+    rules: int,
+    word_cutoffs: Sequence[int],
+    rule_cutoffs: Sequence[int],
+    bounds: Optional[Tuple[int, int]] = None,
+) -> List[RuleStage]:
+    """Blocks covering a wordlist of ``words`` words and ``rules`` ranked rules.
+
+    Args:
+        words: Words in the wordlist (hashcat keyspace of a rule attack)
+        rules: Rules in the ranked rule list
+        word_cutoffs: Word ranks at which a new stage starts
+        rule_cutoffs: Rule ranks at which a new stage starts
+        bounds: ``(skip, limit)`` of a keyspace shard to restrict the blocks to
+
+    Returns:
+        Non-empty blocks in execution order
+    """
+    low, high = (bounds[0], bounds[0] + bounds[1]) if bounds is not None else (0, words)
+    stages = []
+    for (start, end), (rule_start, rule_end) in stage_blocks(word_cutoffs, rule_cutoffs):
+        first = max(start, low)
+        last = min(end if end is not None else words, high)
+        if last <= first or rule_start >= rules:
+            continue
+        stages.append(
+            RuleStage(
+                block_label((start, end), (rule_start, rule_end)),
+                first,
+                last if last < words or bounds else None,
+                rule_start,
+                rule_end if rule_end is not None and rule_end < rules else None,
+            )
+        )
+    return stages
+
+
+def record_rule_stage(
+    rules_file: Path,
+    stage: str,
+    rules: Sequence[str],
+    attempts: int,
+    cracks: int,
+    seconds: float,
+    cracking_rules: Sequence[str],
+    exhausted: bool,
+    words: Optional[int] = None,
+) -> None:
+    """Add a finished block run to the statistics of a rule file.
+
+    Every rule of the block ran against the words of the slice the run got
+    through, so each rule is credited that many candidates: ``words`` for a
+    block that finished its slice, otherwise the attempts divided among the
+    block's rules. Each rule that cracked a hash gets one hit.
+
+    Args:
+        rules_file: Path to the rule file
+        stage: Block label
+        rules: Rules the block ran
+        attempts: Candidates the block tried
+        cracks: Hashes the block cracked
+        seconds: Run time of the block
+        cracking_rules: Rule that produced each cracked password
+        exhausted: Whether the block finished its slice
+        words: Words in the block's slice, if known
+    """
+    redis = get_redis()
+    if exhausted and words:
+        per_rule = int(words)
+    else:
+        per_rule = int(attempts) // len(rules) if rules else 0
+    if per_rule:
+        redis.increment_fields(_candidates_key(rules_file), {rule: per_rule for rule in rules})
+    record_rule_hits(rules_file, cracking_rules)
+    redis.increment_fields(
+        _stages_key(rules_file),
+        {
+            f"{stage}|runs": 1,
+            f"{stage}|candidates": int(attempts),
+            f"{stage}|cracks": int(cracks),
+            f"{stage}|ms": int(seconds * 1000),
+            f"{stage}|exhausted": int(exhausted),
+        },
+    )
+
+
+def load_stage_stats(rules_file: Path) -> Dict[str, Dict[str, int]]:
+    """Recorded statistics per block label of a rule file."""
+    stats: Dict[str, Dict[str, int]] = {}
+    for field_name, value in get_redis().get_counters(_stages_key(rules_file)).items():
+        label, _, name = field_name.rpartition("|")
+        stats.setdefault(label, {})[name] = value
+    return stats
+
+
+@dataclass(frozen=True)
+class RuleWordlistRange:
+    """A wordlist range (byte range or store bucket) expanded through a list of rules.
+
+    Rules are compiled inside the pool worker. Within each block, a mutation
+    already produced by an earlier (higher ranked) rule is not hashed again,
+    which removes the bulk of duplicates (e.g. ``:`` and ``l`` on a lowercase
+    word). Every candidate is tagged with the rule that produced it.
+    """
+
+    words: Union[WordlistRange, BucketRange]
+    rules: Tuple[str, ...]
+
+    def iter_batches(self, block_bytes: int) -> Iterator[Tuple[List[bytes], List[str]]]:
+        """Yield ``(candidates, rule tags)`` for roughly ``block_bytes`` worth of candidates."""
+        compiled = [(rule, compile_rule(rule)) for rule in self.rules]
+        word_block = max(1024, block_bytes // max(1, len(self.rules) // 8))
+        for words, _ in self.words.iter_batches(word_block):
+            seen = set()
+            candidates: List[bytes] = []
+            tags: List[str] = []
+            for rule, func in compiled:
+                for word in words:
+                    candidate = func(word)
+                    if candidate and candidate not in seen:
+                        seen.add(candidate)
+                        candidates.append(candidate)
+                        tags.append(rule)
+            yield candidates, tags
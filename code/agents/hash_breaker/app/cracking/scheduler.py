@@ -0,0 +1,221 @@
+"""Priority preemption of the hashcat device across worker processes.
+
+Every worker process of a device group (``settings.device_group``, by
+default the host name) runs jobs on the same GPUs. Running jobs and keyspace
+shards register their priority in Redis:
+
+    device:{group}:jobs    lease id -> priority and last heartbeat
+
+While a high priority job runs anywhere in the group, low priority jobs
+yield: their hashcat is interrupted with SIGINT (so the session writes its
+restore point), they wait until no high priority job is left, and then the
+interrupted phase is run again, which restores the session (or, for streamed
+phases, resumes from the checkpoint offset). Time spent waiting does not
+count against the job's budget, so it is bounded by the slack between the
+budget and the actor ``time_limit``; a job that used up its slack stops
+yielding and runs alongside the high priority job.
+
+Entries are refreshed by a heartbeat thread, so the leases of a process that
+died drop out of the group after a few missed heartbeats.
+"""
+
+import logging
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.config import get_settings
+from app.models.enums import JobPriority
+from app.utils.metrics import preempted_seconds, preemptions_total
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Priorities that take the device from running jobs, and those that give it up
+PREEMPTING = (JobPriority.HIGH,)
+PREEMPTIBLE = (JobPriority.LOW,)
+
+_WAIT_POLL_INTERVAL = 1.0
+_HEARTBEAT_INTERVAL = 5.0
+# Leases without a heartbeat for this long belong to a dead process
+_STALE_AFTER = _HEARTBEAT_INTERVAL * 3
+
+
+class DeviceScheduler:
+    """Registers the leases of this worker process in its device group."""
+
+    def __init__(self):
+        """Initialize the scheduler."""
+        self.settings = get_settings()
+        self.key = f"device:{self.settings.device_group or socket.gethostname()}:jobs"
+        self._cond = threading.Condition()
+        self._running: Dict[str, str] = {}
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @property
+    def redis(self):
+        # Resolved per call: the scheduler outlives swaps of the client (benchmark runs)
+        return get_redis()
+
+    def admit(self, lease_id: str, priority: str, max_pause: Optional[float] = None) -> "DeviceLease":
+        """Register a job (or keyspace shard) for the duration of its run.
+
+        Args:
+            lease_id: Job identifier, or a shard's own id
+            priority: Job priority (``high``, ``normal`` or ``low``)
+            max_pause: Total time the lease may wait for the device; None
+                for no limit
+
+        Returns:
+            Lease used by the job to check whether it has to yield
+        """
+        with self._cond:
+            self._running[lease_id] = priority
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name="device-heartbeat", daemon=True)
+                self._heartbeat.start()
+        self._register({lease_id: priority})
+        if priority in PREEMPTING and self.preempting():
+            logger.info(f"Job {lease_id}: High priority job started, low priority jobs on this device will yield")
+        return DeviceLease(self, lease_id, priority, max_pause)
+
+    def release(self, lease_id: str) -> None:
+        """Unregister a finished job and wake the jobs waiting for the device."""
+        with self._cond:
+            self._running.pop(lease_id, None)
+            self._cond.notify_all()
+        self.redis.delete_fields(self.key, lease_id)
+
+    def preempting(self) -> bool:
+        """Whether a job that takes the device is running in the device group."""
+        if not self.settings.preemption_enabled:
+            return False
+        with self._cond:
+            if any(priority in PREEMPTING for priority in self._running.values()):
+                return True
+        cutoff = time.time() - _STALE_AFTER
+        return any(
+            isinstance(entry, dict) and entry.get("priority") in PREEMPTING and entry.get("seen", 0) >= cutoff
+            for entry in self.redis.get_fields(self.key).values()
+        )
+
+    def wait_until_free(
+        self,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        limit: Optional[float] = None,
+    ) -> float:
+        """Block until no preempting job is running, the job is cancelled or ``limit`` passes.
+
+        Returns:
+            Seconds waited
+        """
+        started = time.time()
+        while self.preempting():
+            if should_cancel is not None and should_cancel():
+                break
+            if limit is not None and time.time() - started >= limit:
+                break
+            with self._cond:
+                self._cond.wait(timeout=_WAIT_POLL_INTERVAL)
+        return time.time() - started
+
+    def _register(self, leases: Dict[str, str]) -> None:
+        now = time.time()
+        self.redis.set_fields(
+            self.key,
+            {lease_id: {"priority": priority, "seen": now} for lease_id, priority in leases.items()},
+            ex=0,
+        )
+
+    def _beat(self) -> None:
+        while True:
+            time.sleep(_HEARTBEAT_INTERVAL)
+            with self._cond:
+                leases = dict(self._running)
+            try:
+                self._register(leases)
+                self._prune()
+            except Exception as e:
+                logger.warning(f"Device scheduler heartbeat failed: {e}")
+
+    def _prune(self) -> None:
+        cutoff = time.time() - _STALE_AFTER
+        stale = [
+            lease_id
+            for lease_id, entry in self.redis.get_fields(self.key).items()
+            if not isinstance(entry, dict) or entry.get("seen", 0) < cutoff
+        ]
+        self.redis.delete_fields(self.key, *stale)
+
+
+class DeviceLease:
+    """A job's view of the scheduler."""
+
+    def __init__(self, scheduler: DeviceScheduler, job_id: str, priority: str, max_pause: Optional[float] = None):
+        """Initialize the lease.
+
+        Args:
+            scheduler: Worker scheduler
+            job_id: Lease id (job or shard)
+            priority: Job priority
+            max_pause: Total time the lease may wait for the device
+        """
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.priority = priority
+        self.pause_left = max_pause
+
+    @property
+    def preemptible(self) -> bool:
+        return self.priority in PREEMPTIBLE
+
+    def should_yield(self) -> bool:
+        """Polled by running phases: True once the job has to give up the device."""
+        if self.pause_left is not None and self.pause_left <= 0:
+            return False
+        return self.preemptible and self.scheduler.preempting()
+
+    def wait_turn(self, should_cancel: Optional[Callable[[], bool]] = None, limit: Optional[float] = None) -> float:
+        """Wait for the device after a phase was preempted.
+
+        Args:
+            should_cancel: Stops the wait early when the job is cancelled
+            limit: Longest this wait may take, on top of the lease's own
+                pause allowance
+
+        Returns:
+            Seconds the job was paused
+        """
+        label = str(getattr(self.priority, "value", self.priority))
+        preemptions_total.labels(priority=label).inc()
+        if self.pause_left is not None:
+            limit = self.pause_left if limit is None else min(limit, self.pause_left)
+        logger.info(f"Job {self.job_id}: Preempted, waiting for higher priority jobs to finish")
+        waited = self.scheduler.wait_until_free(should_cancel, max(0.0, limit) if limit is not None else None)
+        preempted_seconds.labels(priority=label).observe(waited)
+        if self.pause_left is not None:
+            self.pause_left -= waited
+            if self.pause_left <= 0:
+                logger.warning(
+                    f"Job {self.job_id}: Used up its pause allowance, running alongside higher priority jobs"
+                )
+        logger.info(f"Job {self.job_id}: Resuming after {waited:.1f}s")
+        return waited
+
+
+_scheduler: Optional[DeviceScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> DeviceScheduler:
+    """Get the scheduler of this worker process.
+
+    Returns:
+        DeviceScheduler: Process-wide scheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = DeviceScheduler()
+        return _scheduler
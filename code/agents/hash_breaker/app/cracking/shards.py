@@ -0,0 +1,197 @@
+"""Offline pre-generated PagPassGPT candidate shards.
+
+Sampling the model is the expensive part of phase 3 and yields essentially
+the same guess list on every job, so candidates are generated once, ordered
+by estimated probability and stored as gzip shards in
+``settings.candidate_shards_dir``:
+
+    shard-00000.txt.gz   newline separated candidates, most likely first
+    ...
+    index.json           format version, generator info, per-shard counts
+
+Probability is estimated from how often the model sampled a candidate.
+With PCFG patterns, D&C-GEN is used instead and its output order (most
+frequent patterns and most probable prefixes first) is kept. Phase 3 replays the shards at disk speed and
+only samples live beyond the precomputed depth; because the order is fixed,
+a resumed job can skip exactly the candidates it already tried.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SHARDS_FORMAT_VERSION = 1
+INDEX_NAME = "index.json"
+_GENERATE_BATCH = 10000
+
+
+def build_candidate_shards(
+    generator,
+    total: int,
+    shards_dir: Path,
+    shard_size: int,
+    patterns: Optional[Sequence[Tuple[str, float]]] = None,
+    sample_factor: float = 2.0,
+    workers: int = 1,
+) -> dict:
+    """Generate candidates offline and write probability-ordered shards.
+
+    Args:
+        generator: PagPassGPT generator exposing ``generate(pattern=, num_passwords=)``
+        total: Number of distinct candidates to store
+        shards_dir: Output directory (existing shards are replaced)
+        shard_size: Candidates per shard
+        patterns: Optional ``(pattern, rate)`` pairs; generates with D&C-GEN
+        sample_factor: Samples drawn per stored candidate when sampling; more
+            samples give better frequency estimates
+        workers: D&C-GEN worker processes
+
+    Returns:
+        The written index
+    """
+    shards_dir = Path(shards_dir)
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    started = time.time()
+
+    counts: Counter = Counter()
+    if patterns:
+        threshold = get_settings().pagpassgpt_threshold
+        for batch in generator.generate_dcgen(patterns, total, threshold=threshold, workers=workers):
+            counts.update(pwd for pwd in batch if pwd and "\n" not in pwd)
+        logger.info(f"Candidate shards: D&C-GEN over {len(patterns)} patterns, {len(counts)} distinct")
+    else:
+        samples = 0
+        budget = int(total * sample_factor)
+        while samples < budget:
+            batch = generator.generate(num_passwords=min(_GENERATE_BATCH, budget - samples))
+            if not batch:
+                break
+            counts.update(pwd for pwd in batch if pwd and "\n" not in pwd)
+            samples += len(batch)
+        logger.info(f"Candidate shards: sampled {samples}, {len(counts)} distinct")
+
+    # Counter.most_common keeps first-seen order among equal counts
+    ordered = [pwd for pwd, _ in counts.most_common(total)]
+    for old in shards_dir.glob("shard-*.txt.gz"):
+        old.unlink()
+
+    shards = []
+    for number, start in enumerate(range(0, len(ordered), max(1, shard_size))):
+        chunk = ordered[start:start + shard_size]
+        name = f"shard-{number:05d}.txt.gz"
+        with gzip.open(shards_dir / name, "wb", compresslevel=6) as out:
+            out.write("".join(f"{pwd}\n" for pwd in chunk).encode("utf-8", errors="surrogateescape"))
+        shards.append({"file": name, "start": start, "candidates": len(chunk)})
+
+    index = {
+        "format_version": SHARDS_FORMAT_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "generator": "pagpassgpt" if getattr(generator, "use_official", False) else "fallback",
+        "method": "dcgen" if patterns else "sampling",
+        "patterns": len(patterns) if patterns else 0,
+        "total": len(ordered),
+        "shards": shards,
+    }
+    index_tmp = shards_dir / f"{INDEX_NAME}.tmp"
+    index_tmp.write_text(json.dumps(index, indent=2), encoding="utf-8")
+    os.replace(index_tmp, shards_dir / INDEX_NAME)
+    logger.info(f"Candidate shards: wrote {len(ordered)} candidates in {len(shards)} shards ({time.time() - started:.1f}s)")
+    return index
+
+
+class CandidateShards:
+    """Read access to a directory of candidate shards."""
+
+    def __init__(self, shards_dir: Path):
+        """Open shards written by ``build_candidate_shards``.
+
+        Args:
+            shards_dir: Directory containing ``index.json``
+
+        Raises:
+            FileNotFoundError: If the index is missing
+            ValueError: If the shards were written with another format version
+        """
+        self.shards_dir = Path(shards_dir)
+        self.index = json.loads((self.shards_dir / INDEX_NAME).read_text(encoding="utf-8"))
+        if self.index.get("format_version") != SHARDS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported candidate shard format: {self.index.get('format_version')}")
+
+    @property
+    def total(self) -> int:
+        """Number of precomputed candidates."""
+        return int(self.index.get("total", 0))
+
+    def iter_batches(self, start: int = 0, limit: Optional[int] = None, batch_size: int = 10000) -> Iterator[List[str]]:
+        """Stream candidates in probability order.
+
+        Args:
+            start: Rank of the first candidate (shards before it are not opened)
+            limit: Maximum number of candidates to yield
+            batch_size: Candidates per yielded batch
+
+        Yields:
+            Candidate batches
+        """
+        remaining = self.total - start if limit is None else min(limit, self.total - start)
+        for shard in self.index.get("shards", []):
+            if remaining <= 0:
+                return
+            shard_end = shard["start"] + shard["candidates"]
+            if shard_end <= start:
+                continue
+            skip = max(0, start - shard["start"])
+            with gzip.open(self.shards_dir / shard["file"], "rb") as handle:
+                batch: List[str] = []
+                for position, line in enumerate(handle):
+                    if position < skip:
+                        continue
+                    batch.append(line.rstrip(b"\n").decode("utf-8", errors="surrogateescape"))
+                    if len(batch) >= min(batch_size, remaining):
+                        remaining -= len(batch)
+                        yield batch
+                        batch = []
+                        if remaining <= 0:
+                            return
+                if batch:
+                    remaining -= len(batch)
+                    yield batch
+
+
+# Global shards instance
+_candidate_shards: Optional[CandidateShards] = None
+_candidate_shards_checked = False
+
+
+def get_candidate_shards() -> Optional[CandidateShards]:
+    """Get the process-wide candidate shards, or None if none were built.
+
+    Returns:
+        CandidateShards instance or None
+    """
+    global _candidate_shards, _candidate_shards_checked
+
+    if not _candidate_shards_checked:
+        _candidate_shards_checked = True
+        shards_dir = get_settings().candidate_shards_dir
+        if not (shards_dir / INDEX_NAME).exists():
+            logger.info(f"Candidate shards not found at {shards_dir}, phase 3 samples live only")
+            return None
+        try:
+            _candidate_shards = CandidateShards(shards_dir)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Failed to open candidate shards: {exc}")
+            _candidate_shards = None
+
+    return _candidate_shards
@@ -0,0 +1,140 @@
+"""Pipelined candidate production for stdin-fed hashcat attacks.
+
+A ``CandidateProducer`` runs a batch source (e.g. PagPassGPT generation) on
+a dedicated thread and hands batches to the hashcat writer through a
+bounded queue, so generation and hashing overlap. A full queue blocks the
+producer (backpressure), an empty one stalls the writer; both waits are
+exported as metrics, which tells whether hashcat or the model is the
+bottleneck.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from app.utils.metrics import candidate_queue_depth, candidate_stall_seconds
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_POLL_INTERVAL = 0.1
+_CANCEL_POLL_INTERVAL = 0.5
+
+
+class CandidateProducer:
+    """Background producer of candidate batches behind a bounded queue.
+
+    Use as a context manager; iterating yields individual candidates and
+    leaving the context stops the producer thread.
+    """
+
+    def __init__(
+        self,
+        batches: Iterable[List[str]],
+        phase: str,
+        max_batches: int = 8,
+        should_cancel: Optional[Callable[[], bool]] = None,
+    ):
+        """Initialize the producer.
+
+        Args:
+            batches: Source of candidate batches, consumed on the producer thread
+            phase: Metrics label of the calling phase
+            max_batches: Queue capacity in batches
+            should_cancel: Polled while the consumer waits on an empty queue;
+                True ends the iteration so a slow source cannot delay cancellation
+        """
+        self.phase = phase
+        self.produced = 0
+        self.cancelled = False
+        self.producer_stall = 0.0
+        self.consumer_stall = 0.0
+        self.error: Optional[BaseException] = None
+        self._batches = batches
+        self._should_cancel = should_cancel
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_batches))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"candidates-{phase}", daemon=True)
+
+    def __enter__(self) -> "CandidateProducer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the producer thread and log where time was lost."""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        candidate_queue_depth.labels(phase=self.phase).set(0)
+        logger.info(
+            f"Candidate producer ({self.phase}): {self.produced} candidates, "
+            f"producer stalled {self.producer_stall:.2f}s, consumer stalled {self.consumer_stall:.2f}s"
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            try:
+                batch = self._queue.get_nowait()
+            except queue.Empty:
+                waited = time.time()
+                batch = self._get_blocking()
+                stall = time.time() - waited
+                self.consumer_stall += stall
+                candidate_stall_seconds.labels(phase=self.phase, side="consumer").inc(stall)
+            candidate_queue_depth.labels(phase=self.phase).set(self._queue.qsize())
+            if batch is _DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield from batch
+
+    def _get_blocking(self):
+        last_check = time.time()
+        while True:
+            try:
+                return self._queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if not self._thread.is_alive():
+                    return _DONE
+            if self._should_cancel is not None and time.time() - last_check >= _CANCEL_POLL_INTERVAL:
+                last_check = time.time()
+                if self._should_cancel():
+                    self.cancelled = True
+                    return _DONE
+
+    def _run(self) -> None:
+        try:
+            for batch in self._batches:
+                if not batch:
+                    continue
+                if not self._put(batch):
+                    return
+                self.produced += len(batch)
+        except Exception as exc:
+            logger.error(f"Candidate producer ({self.phase}) failed: {exc}")
+            self.error = exc
+        finally:
+            # Close generator sources on this thread so their cleanup runs now
+            close = getattr(self._batches, "close", None)
+            if close is not None:
+                close()
+        self._put(_DONE)
+
+    def _put(self, item) -> bool:
+        started = time.time()
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                break
+            except queue.Full:
+                continue
+        stall = time.time() - started
+        if stall > 0.001:
+            self.producer_stall += stall
+            candidate_stall_seconds.labels(phase=self.phase, side="producer").inc(stall)
+        candidate_queue_depth.labels(phase=self.phase).set(self._queue.qsize())
+        return not self._stop.is_set()
@@ -0,0 +1,339 @@
+"""Preprocessed wordlist store for the dictionary phases.
+
+``build_wordlist_store`` deduplicates each source wordlist, orders it by how
+often a word occurs in the source (first occurrence breaks ties, so an
+already ranked list keeps its order) and splits it by length and charset
+class. Layout of ``settings.wordlist_store_dir``:
+
+    manifest.json                     format version, sources, buckets per list
+    {list}/all.txt                    every distinct word, most frequent first
+    {list}/len{N}_{class}.txt         words of N bytes and one charset class,
+                                      in frequency order
+    {list}/slices/len{a}-{b}.txt      length slice of all.txt, cut on first use
+
+The charset class names the character groups a word uses, e.g. ``l``
+(lowercase only) or ``ld`` (lowercase and digits); ``o`` marks bytes outside
+printable ASCII. Every bucket holds fixed-width records (``N`` bytes plus a
+newline), so word ``i`` starts at byte ``i * (N + 1)``: hashcat reads the
+files as ordinary wordlists, and CPU engine work units slice them by record
+index without scanning for line breaks.
+
+Phases resolve their wordlist through ``resolve_wordlist`` and
+``wordlist_sources`` (in ``cpu_engine``), which honour the configured length
+policy and fall back to the raw file when the store is missing or stale.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+from app.utils.fingerprints import source_fingerprints
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+ALL_NAME = "all.txt"
+
+_CLASS_ORDER = "ludso"
+_SPECIALS = frozenset(b" !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~")
+
+
+def charset_class(word: bytes) -> str:
+    """Character groups used by a word, e.g. ``"ld"`` for ``b"abc123"``."""
+    groups = set()
+    for byte in word:
+        if 97 <= byte <= 122:
+            groups.add("l")
+        elif 65 <= byte <= 90:
+            groups.add("u")
+        elif 48 <= byte <= 57:
+            groups.add("d")
+        elif byte in _SPECIALS:
+            groups.add("s")
+        else:
+            groups.add("o")
+    return "".join(c for c in _CLASS_ORDER if c in groups)
+
+
+@dataclass(frozen=True)
+class BucketRange:
+    """A record range ``[start, end)`` of a fixed-width bucket file."""
+
+    path: str
+    width: int
+    start: int
+    end: int
+
+    def iter_batches(self, block_bytes: int) -> Iterator[Tuple[List[bytes], None]]:
+        """Yield the words of the range in blocks of roughly ``block_bytes``."""
+        if self.end <= self.start:
+            return
+        record = self.width + 1
+        per_block = max(1, block_bytes // record)
+        with open(self.path, "rb") as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for block_start in range(self.start, self.end, per_block):
+                    block_end = min(self.end, block_start + per_block)
+                    flat = mm[block_start * record:block_end * record]
+                    yield [flat[i:i + self.width] for i in range(0, len(flat), record)], None
+
+
+class WordlistStore:
+    """Read access to a store built by ``build_wordlist_store``."""
+
+    def __init__(self, store_dir: Path):
+        """Open a store.
+
+        Args:
+            store_dir: Directory containing the manifest
+
+        Raises:
+            FileNotFoundError: If the manifest is missing
+            ValueError: If the store was built with another format version
+        """
+        self.store_dir = Path(store_dir)
+        self.manifest = json.loads((self.store_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        if self.manifest.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported wordlist store format: {self.manifest.get('format_version')}")
+
+    def stale_lists(self) -> List[str]:
+        """Lists whose source wordlist changed since the store was built."""
+        return [
+            name for name, entry in self.manifest["lists"].items()
+            if source_fingerprints([Path(entry["source"]["path"])]) != [entry["source"]]
+        ]
+
+    def entry(self, wordlist: Path) -> Optional[Dict]:
+        """Manifest entry of a source wordlist, or None if it is missing or stale."""
+        entry = self.manifest["lists"].get(Path(wordlist).name)
+        if entry is None or Path(entry["source"]["path"]).resolve() != Path(wordlist).resolve():
+            return None
+        # Paths are compared resolved above; a relative build path must not look stale
+        current = source_fingerprints([Path(wordlist)])[0]
+        if (current["size"], current["mtime"]) != (entry["source"]["size"], entry["source"]["mtime"]):
+            return None
+        return entry
+
+    def wordlist(self, wordlist: Path, min_length: int = 0, max_length: int = 0) -> Optional[Path]:
+        """Deduplicated, frequency-ordered file for hashcat, cut to a length range.
+
+        Args:
+            wordlist: Source wordlist the store was built from
+            min_length: Shortest word length in bytes (0 = no limit)
+            max_length: Longest word length in bytes (0 = no limit)
+
+        Returns:
+            Path of the file, or None if the wordlist is not in the store
+        """
+        entry = self.entry(wordlist)
+        if entry is None:
+            return None
+        list_dir = self.store_dir / entry["dir"]
+        lengths = [b["length"] for b in entry["buckets"]]
+        if not lengths or (min_length <= min(lengths) and (not max_length or max_length >= max(lengths))):
+            return list_dir / ALL_NAME
+
+        slice_file = list_dir / "slices" / f"len{min_length}-{max_length or 'max'}.txt"
+        if not slice_file.exists():
+            slice_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = slice_file.with_name(f"{slice_file.name}.{os.getpid()}.tmp")
+            with open(list_dir / ALL_NAME, "rb") as src, open(tmp, "wb") as dst:
+                for line in src:
+                    if _in_range(len(line) - 1, min_length, max_length):
+                        dst.write(line)
+            os.replace(tmp, slice_file)
+            logger.info(f"Wordlist store: cut {slice_file.relative_to(self.store_dir)}")
+        return slice_file
+
+    def ranges(
+        self,
+        wordlist: Path,
+        chunks: int,
+        min_length: int = 0,
+        max_length: int = 0,
+    ) -> Optional[List[BucketRange]]:
+        """Split the buckets of a length range into about ``chunks`` work units.
+
+        Buckets holding the most frequent words come first.
+
+        Returns:
+            Bucket ranges, or None if the wordlist is not in the store
+        """
+        entry = self.entry(wordlist)
+        if entry is None:
+            return None
+        buckets = [b for b in entry["buckets"] if _in_range(b["length"], min_length, max_length)]
+        total = sum(b["words"] for b in buckets)
+        if not total:
+            return []
+        size = max(1, -(-total // max(1, chunks)))
+        ranges = []
+        for bucket in sorted(buckets, key=lambda b: b["first_rank"]):
+            path = str(self.store_dir / entry["dir"] / bucket["file"])
+            for start in range(0, bucket["words"], size):
+                ranges.append(BucketRange(path, bucket["length"], start, min(bucket["words"], start + size)))
+        return ranges
+
+
+def _in_range(length: int, min_length: int, max_length: int) -> bool:
+    return length >= min_length and (not max_length or length <= max_length)
+
+
+def build_wordlist_store(wordlists: Sequence[Path], store_dir: Path) -> dict:
+    """Preprocess wordlists into the store.
+
+    Args:
+        wordlists: Source wordlists (missing files are skipped)
+        store_dir: Output directory (lists already in it are replaced)
+
+    Returns:
+        The written manifest
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    sources = [Path(w) for w in wordlists if Path(w).is_file()]
+    if not sources:
+        raise FileNotFoundError("No wordlists found to build the wordlist store from")
+
+    manifest_path = store_dir / MANIFEST_NAME
+    lists: Dict[str, dict] = {}
+    if manifest_path.exists():
+        try:
+            previous = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if previous.get("format_version") == STORE_FORMAT_VERSION:
+                lists = previous["lists"]
+        except (OSError, ValueError, KeyError):
+            lists = {}
+
+    for source in sources:
+        lists[source.name] = _build_list(source, store_dir)
+
+    manifest = {
+        "format_version": STORE_FORMAT_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "lists": lists,
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def _build_list(source: Path, store_dir: Path) -> dict:
+    started = time.time()
+    counts: Counter = Counter()
+    lines = 0
+    with source.open("rb") as handle:
+        for line in handle:
+            word = line.rstrip(b"\r\n")
+            if word:
+                counts[word] += 1
+                lines += 1
+
+    # Counter keeps first-occurrence order, and the sort is stable
+    ranked = sorted(counts, key=counts.__getitem__, reverse=True)
+    del counts
+
+    list_dir = store_dir / source.stem
+    tmp_dir = store_dir / f".{source.stem}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    buckets: Dict[Tuple[int, str], dict] = {}
+    members: Dict[Tuple[int, str], List[bytes]] = {}
+    with open(tmp_dir / ALL_NAME, "wb") as all_handle:
+        for rank, word in enumerate(ranked):
+            all_handle.write(word + b"\n")
+            key = (len(word), charset_class(word))
+            if key not in buckets:
+                buckets[key] = {
+                    "file": f"len{key[0]}_{key[1]}.txt",
+                    "length": key[0],
+                    "charset": key[1],
+                    "words": 0,
+                    "first_rank": rank,
+                }
+                members[key] = []
+            members[key].append(word)
+
+    # One bucket at a time: a large list has more buckets than open file handles allow
+    for key, words in members.items():
+        with open(tmp_dir / buckets[key]["file"], "wb") as bucket_handle:
+            bucket_handle.write(b"\n".join(words) + b"\n")
+        buckets[key]["words"] = len(words)
+    del members
+
+    shutil.rmtree(list_dir, ignore_errors=True)
+    os.replace(tmp_dir, list_dir)
+    logger.info(
+        f"Wordlist store: {source.name}: {len(ranked)} distinct of {lines} words "
+        f"in {len(buckets)} buckets ({time.time() - started:.1f}s)"
+    )
+    return {
+        "source": source_fingerprints([source])[0],
+        "dir": list_dir.name,
+        "words": len(ranked),
+        "duplicates": lines - len(ranked),
+        "buckets": sorted(buckets.values(), key=lambda b: (b["length"], b["charset"])),
+    }
+
+
+# Global store instance
+_wordlist_store: Optional[WordlistStore] = None
+_wordlist_store_checked = False
+
+
+def get_wordlist_store() -> Optional[WordlistStore]:
+    """Get the process-wide wordlist store, or None if it has not been built.
+
+    Returns:
+        WordlistStore instance or None
+    """
+    global _wordlist_store, _wordlist_store_checked
+
+    if not _wordlist_store_checked:
+        _wordlist_store_checked = True
+        store_dir = get_settings().wordlist_store_dir
+        if not (store_dir / MANIFEST_NAME).exists():
+            logger.info(f"Wordlist store not found at {store_dir}, phases read the raw wordlists")
+            return None
+        try:
+            _wordlist_store = WordlistStore(store_dir)
+            stale = _wordlist_store.stale_lists()
+            if stale:
+                logger.warning(
+                    f"Wordlist store is older than {', '.join(stale)}; the raw files are used until "
+                    "build-wordlist-store is run again"
+                )
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning(f"Failed to open wordlist store: {exc}")
+            _wordlist_store = None
+
+    return _wordlist_store
+
+
+def resolve_wordlist(wordlist: Path) -> Path:
+    """Wordlist file hashcat should read for ``wordlist``.
+
+    The store's deduplicated, frequency-ordered copy (cut to the configured
+    length policy) when available, otherwise the raw file.
+    """
+    store = get_wordlist_store()
+    if store is None:
+        return Path(wordlist)
+    settings = get_settings()
+    try:
+        resolved = store.wordlist(wordlist, settings.wordlist_min_length, settings.wordlist_max_length)
+    except OSError as exc:
+        logger.warning(f"Wordlist store: cannot read {Path(wordlist).name}, using the raw file: {exc}")
+        return Path(wordlist)
+    return resolved or Path(wordlist)
@@ -3,14 +3,24 @@
 FastAPI application exposing REST endpoints for hash auditing.
 """
 
+import json
 import logging
 import uuid
 from datetime import datetime
 from fastapi import FastAPI, HTTPException, status
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import get_settings
+from app.cracking.hashcat_runner import normalize_hash
+from app.cracking.potfile import InflightRegistry, Potfile, record_submission
+from app.models.batch import (
+    BatchHashAuditRequest,
+    BatchJobResultsResponse,
+    BatchJobState,
+    BatchJobSubmissionResponse,
+    HashResult,
+)
 from app.models.enums import ErrorCode, JobPriority, JobStatus
 from app.models.schemas import (
     HashAuditRequest,
@@ -22,9 +32,14 @@ from app.models.schemas import (
     JobState,
 )
 from app.utils.logging import setup_logging
-from app.utils.metrics import generate_metrics, get_content_type
-from app.utils.redis_client import get_redis
+from app.utils.metrics import generate_metrics, get_content_type, registry
+from app.utils.redis_client import get_async_redis, get_redis
+from app.utils.telemetry import TelemetryCollector, histogram_summary, live_workers, refresh_telemetry
 from app.workers.cracking_worker import (
+    broker,
+    process_batch_job,
+    process_batch_job_high,
+    process_batch_job_low,
     process_cracking_job,
     process_cracking_job_high,
     process_cracking_job_low,
@@ -57,15 +72,41 @@ app.add_middleware(
 
 # Initialize Redis
 redis = get_redis()
+potfile = Potfile()
+inflight = InflightRegistry()
+
+# Single-flight: a duplicate only attaches to an owner of at least its priority
+_PRIORITY_RANK = {JobPriority.LOW: 0, JobPriority.NORMAL: 1, JobPriority.HIGH: 2}
+
+# Latency histograms reported by the workers through Redis
+registry.register(TelemetryCollector())
 
 
 @app.get("/v1/health", response_model=HealthResponse, tags=["General"])
 async def health_check():
     """Health check endpoint for load balancers and monitoring.
 
+    Worker occupancy comes from the heartbeats of the worker processes and
+    queue depths from RabbitMQ (sampled at most every
+    ``telemetry_sample_interval`` seconds); ``workers.latency`` summarizes
+    the hashcat and phase histograms also exported on ``/v1/metrics``.
+
     Returns:
         Health status with dependency checks
     """
+    telemetry = refresh_telemetry(broker)
+    workers = telemetry["workers"]
+    queues = telemetry["queues"]
+
+    total = sum(entry.get("threads", 0) for entry in workers.values())
+    active = sum(entry.get("active", 0) for entry in workers.values())
+    queue = {"provider": "rabbitmq", "depth": None}
+    if queues is not None:
+        queue["depth"] = sum(counts["ready"] for counts in queues.values())
+        queue.update({f"{priority}_priority": counts["ready"] for priority, counts in queues.items()})
+        queue["delayed"] = sum(counts["delayed"] for counts in queues.values())
+        queue["dead_lettered"] = sum(counts["dead_lettered"] for counts in queues.values())
+
     return HealthResponse(
         status="healthy",
         version=settings.app_version,
@@ -73,17 +114,20 @@ async def health_check():
         dependencies={
             "redis": {
                 "status": "healthy" if redis.ping() else "unhealthy"
+            },
+            "rabbitmq": {
+                "status": "healthy" if queues is not None else "unhealthy"
             }
         },
         workers={
-            "total": settings.worker_concurrency,
-            "active": 0,
-            "idle": settings.worker_concurrency
+            "total": total,
+            "active": active,
+            "idle": max(0, total - active),
+            "processes": len(workers),
+            "per_worker": {worker: entry.get("active", 0) for worker, entry in workers.items()},
+            "latency": histogram_summary(),
         },
-        queue={
-            "provider": "rabbitmq",
-            "depth": None
-        }
+        queue=queue
     )
 
 
@@ -102,6 +146,10 @@ async def submit_audit_job(request: HashAuditRequest):
     3. PagPassGPT AI Generation (35% time)
     4. Limited Mask Attack (30% time)
 
+    A hash the cluster already cracked is answered from the potfile with a
+    job that is immediately successful; a hash another job is still
+    cracking returns that job's id instead of starting a new pipeline.
+
     Args:
         request: Job submission request
 
@@ -126,6 +174,10 @@ async def submit_audit_job(request: HashAuditRequest):
     # Generate job ID
     job_id = str(uuid.uuid4())
 
+    cracked = potfile.lookup(request.hash, request.hash_type_id) if settings.potfile_enabled else None
+    if cracked is not None:
+        return _submit_from_potfile(job_id, request, cracked)
+
     # Create initial job state
     job_state = JobState(
         job_id=job_id,
@@ -138,7 +190,7 @@ async def submit_audit_job(request: HashAuditRequest):
     )
 
     # Store in Redis (use JSON mode for datetime serialization)
-    if not redis.set(f"job:{job_id}", job_state.model_dump(mode='json')):
+    if not redis.set_fields(f"job:{job_id}", job_state.model_dump(mode='json')):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail={
@@ -149,6 +201,27 @@ async def submit_audit_job(request: HashAuditRequest):
             }
         )
 
+    # Single-flight: attach to a job already cracking this hash. The new
+    # job is stored first so a concurrent duplicate never sees a claim
+    # without state and mistakes it for a stale one.
+    if settings.singleflight_enabled:
+        owner = inflight.claim(request.hash, request.hash_type_id, job_id)
+        if owner is not None and owner != job_id:
+            owner_state = redis.get_fields_of(f"job:{owner}", ["status", "priority", "timeout_seconds", "worker"])
+            owner_status = owner_state.get("status")
+            if _can_attach(owner_state, request):
+                redis.delete(f"job:{job_id}")
+                inflight.attach(owner)
+                record_submission("attached")
+                logger.info(f"Job {owner}: Duplicate submission attached (hash_type={request.hash_type_id})")
+                return JobSubmissionResponse(job_id=owner, status=owner_status)
+            if owner_status in (JobStatus.PENDING, JobStatus.RUNNING):
+                logger.info(
+                    f"Job {job_id}: Not attaching to job {owner} "
+                    f"(status={owner_status}, dead, lower priority or shorter timeout)"
+                )
+            inflight.replace(request.hash, request.hash_type_id, owner, job_id)
+
     # Send to Dramatiq queue (select based on priority)
     if request.priority == JobPriority.HIGH:
         process_cracking_job_high.send(job_id, request.hash, request.hash_type_id, request.timeout_seconds)
@@ -157,6 +230,7 @@ async def submit_audit_job(request: HashAuditRequest):
     else:
         process_cracking_job.send(job_id, request.hash, request.hash_type_id, request.timeout_seconds)
 
+    record_submission("new")
     logger.info(f"Job {job_id}: Submitted (hash_type={request.hash_type_id}, timeout={request.timeout_seconds}s)")
 
     return JobSubmissionResponse(
@@ -165,6 +239,181 @@ async def submit_audit_job(request: HashAuditRequest):
     )
 
 
+def _can_attach(owner_state: dict, request: HashAuditRequest) -> bool:
+    """Whether a duplicate submission may be served by the owning job.
+
+    The owner must still be queued or running on a live worker process (per
+    the telemetry heartbeat table), and must not have a lower priority or a
+    shorter timeout than the new submission, which would otherwise wait
+    behind it or get less search than it asked for.
+    """
+    owner_status = owner_state.get("status")
+    if owner_status not in (JobStatus.PENDING, JobStatus.RUNNING):
+        return False
+    owner_priority = owner_state.get("priority") or JobPriority.NORMAL
+    if _PRIORITY_RANK.get(owner_priority, 1) < _PRIORITY_RANK.get(request.priority, 1):
+        return False
+    if int(owner_state.get("timeout_seconds") or 0) < request.timeout_seconds:
+        return False
+    worker = owner_state.get("worker")
+    if owner_status == JobStatus.RUNNING and worker and settings.telemetry_enabled:
+        return worker in live_workers()
+    return True
+
+
+def _submit_from_potfile(job_id: str, request: HashAuditRequest, cracked: dict) -> JobSubmissionResponse:
+    """Create an already successful job for a hash found in the potfile."""
+    job_state = JobState(
+        job_id=job_id,
+        status=JobStatus.SUCCESS,
+        submitted_at=datetime.utcnow(),
+        hash_type_id=request.hash_type_id,
+        timeout_seconds=request.timeout_seconds,
+        priority=request.priority,
+        progress=100,
+    )
+    fields = {
+        **job_state.model_dump(mode='json'),
+        "result": cracked["password"],
+        "cracked_in_phase": cracked.get("phase"),
+        "attempts": 0,
+        "time_elapsed": 0.0,
+        "time_remaining": 0,
+    }
+    if not redis.set_fields(f"job:{job_id}", fields):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": {
+                    "code": ErrorCode.INTERNAL_ERROR,
+                    "message": "Failed to create job"
+                }
+            }
+        )
+
+    record_submission("potfile")
+    logger.info(f"Job {job_id}: Answered from potfile (cracked by job {cracked.get('job_id')})")
+    return JobSubmissionResponse(job_id=job_id, status=JobStatus.SUCCESS)
+
+
+@app.post(
+    "/v1/audit-hashes",
+    response_model=BatchJobSubmissionResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Cracking"]
+)
+async def submit_batch_audit_job(request: BatchHashAuditRequest):
+    """Submit a batch of hashes of one type as a single cracking job.
+
+    All hashes share one pipeline run: every phase cracks against the whole
+    set, so hashcat startup and wordlist scans are paid once per batch.
+    Per-hash outcomes are available from ``/v1/jobs/{job_id}/results``.
+
+    Args:
+        request: Batch job submission request
+
+    Returns:
+        Batch job submission response with job_id
+
+    Raises:
+        HTTPException: If the job cannot be stored
+    """
+    job_id = str(uuid.uuid4())
+    target_hashes = list(dict.fromkeys(request.hashes))
+
+    job_state = BatchJobState(
+        job_id=job_id,
+        status=JobStatus.PENDING,
+        submitted_at=datetime.utcnow(),
+        hash_type_id=request.hash_type_id,
+        timeout_seconds=request.timeout_seconds,
+        priority=request.priority,
+        generator=request.generator,
+        total_hashes=len(target_hashes),
+    )
+
+    stored = redis.set_fields(f"job:{job_id}", job_state.model_dump(mode='json'))
+    if not stored or not redis.set(f"job:{job_id}:hashes", {"hashes": target_hashes}):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": {
+                    "code": ErrorCode.INTERNAL_ERROR,
+                    "message": "Failed to create job"
+                }
+            }
+        )
+
+    if request.priority == JobPriority.HIGH:
+        process_batch_job_high.send(job_id, target_hashes, request.hash_type_id, request.timeout_seconds)
+    elif request.priority == JobPriority.LOW:
+        process_batch_job_low.send(job_id, target_hashes, request.hash_type_id, request.timeout_seconds)
+    else:
+        process_batch_job.send(job_id, target_hashes, request.hash_type_id, request.timeout_seconds)
+
+    logger.info(
+        f"Job {job_id}: Batch submitted ({len(target_hashes)} hashes, "
+        f"hash_type={request.hash_type_id}, timeout={request.timeout_seconds}s)"
+    )
+
+    return BatchJobSubmissionResponse(
+        job_id=job_id,
+        status=JobStatus.PENDING,
+        total_hashes=len(target_hashes),
+    )
+
+
+@app.get("/v1/jobs/{job_id}/results", response_model=BatchJobResultsResponse, tags=["Cracking"])
+async def get_batch_results(job_id: str):
+    """Return per-hash results of a batch job.
+
+    Results are available while the job is still running; hashes cracked so
+    far are reported as cracked, the rest as pending/uncracked.
+
+    Args:
+        job_id: Unique job identifier
+
+    Returns:
+        Per-hash results
+
+    Raises:
+        HTTPException: If job not found or not a batch job
+    """
+    job_state = redis.get_fields(f"job:{job_id}")
+    submitted = redis.get(f"job:{job_id}:hashes")
+
+    if not job_state or not job_state.get("batch") or submitted is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": ErrorCode.JOB_NOT_FOUND,
+                    "message": f"Batch job {job_id} not found"
+                }
+            }
+        )
+
+    cracked = redis.get_fields(f"job:{job_id}:results")
+    hash_type_id = job_state.get("hash_type_id")
+    results = []
+    for target in submitted.get("hashes", []):
+        entry = cracked.get(normalize_hash(target, hash_type_id))
+        results.append(HashResult(
+            hash=target,
+            cracked=entry is not None,
+            password=entry.get("password") if entry else None,
+            cracked_in_phase=entry.get("phase") if entry else None,
+        ))
+
+    return BatchJobResultsResponse(
+        job_id=job_id,
+        status=job_state.get("status"),
+        total_hashes=len(results),
+        cracked_count=sum(1 for r in results if r.cracked),
+        results=results,
+    )
+
+
 @app.get("/v1/status/{job_id}", response_model=JobStatusResponse, tags=["Cracking"])
 async def get_job_status(job_id: str):
     """Query the status of a submitted job.
@@ -178,9 +427,9 @@ async def get_job_status(job_id: str):
     Raises:
         HTTPException: If job not found
     """
-    job_state = redis.get(f"job:{job_id}")
+    job_state = redis.get_fields(f"job:{job_id}")
 
-    if job_state is None:
+    if not job_state:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
@@ -211,6 +460,8 @@ async def get_job_status(job_id: str):
 
     # Calculate time remaining if running
     if job_state.get("status") == JobStatus.RUNNING:
+        # Keyspace coverage, speed and ETA reported by the running hashcat process
+        job_state.update(redis.get_fields(f"job:{job_id}:progress"))
         started_at = job_state.get("started_at")
         timeout = job_state.get("timeout_seconds") or settings.default_timeout
         if started_at:
@@ -221,6 +472,73 @@ async def get_job_status(job_id: str):
     return JobStatusResponse(**job_state)
 
 
+@app.get("/v1/jobs/{job_id}/events", tags=["Cracking"])
+async def stream_job_events(job_id: str):
+    """Stream job progress as server-sent events.
+
+    The first event (``state``) carries the full current state; after that
+    only changes published by the worker are sent (``status``, ``phase``,
+    ``progress``, ``results``). The stream ends after the job reaches a
+    terminal status.
+
+    Args:
+        job_id: Unique job identifier
+
+    Returns:
+        ``text/event-stream`` response
+
+    Raises:
+        HTTPException: If job not found
+    """
+    if not redis.exists(f"job:{job_id}"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": {
+                    "code": ErrorCode.JOB_NOT_FOUND,
+                    "message": f"Job {job_id} not found"
+                }
+            }
+        )
+
+    terminal = (JobStatus.SUCCESS, JobStatus.FAILED, JobStatus.CANCELLED)
+
+    async def event_stream():
+        pubsub = get_async_redis().pubsub()
+        # Subscribe before reading the snapshot so no change falls in between
+        await pubsub.subscribe(f"job:{job_id}:events")
+        try:
+            job_state = redis.get_fields(f"job:{job_id}")
+            if job_state.get("status") == JobStatus.RUNNING:
+                job_state.update(redis.get_fields(f"job:{job_id}:progress"))
+            yield _sse_message("state", job_state)
+            if job_state.get("status") in terminal:
+                return
+
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=15.0)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event = json.loads(message["data"])
+                yield _sse_message(event["event"], event["data"])
+                if event["event"] == "status" and event["data"].get("status") in terminal:
+                    return
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
 @app.post("/v1/jobs/{job_id}/cancel", response_model=JobCancelResponse, tags=["Cracking"])
 async def cancel_job(job_id: str):
     """Cancel a running or pending job.
@@ -234,9 +552,9 @@ async def cancel_job(job_id: str):
     Raises:
         HTTPException: If job not found or already completed
     """
-    job_state = redis.get(f"job:{job_id}")
+    job_state = redis.get_fields(f"job:{job_id}")
 
-    if job_state is None:
+    if not job_state:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={
@@ -260,12 +578,22 @@ async def cancel_job(job_id: str):
             }
         )
 
+    # A job shared by attached duplicate submissions keeps running for the others
+    if inflight.detach(job_id):
+        logger.info(f"Job {job_id}: One submitter cancelled, still shared by other submitters")
+        return JobCancelResponse(
+            job_id=job_id,
+            status=current_status,
+            message="Cancellation recorded; the job keeps running for other submitters of the same hash",
+            cancelled_at=datetime.utcnow()
+        )
+
     # Update status to cancelled
     updates = {
         "status": JobStatus.CANCELLED,
         "reason": "User requested cancellation"
     }
-    redis.update(f"job:{job_id}", updates)
+    redis.set_fields(f"job:{job_id}", updates, channel=f"job:{job_id}:events", event="status")
 
     logger.info(f"Job {job_id}: Cancelled by user")
 
@@ -284,6 +612,7 @@ async def metrics():
     Returns:
         Metrics in Prometheus text format
     """
+    refresh_telemetry(broker)
     metrics_data = generate_metrics()
     return PlainTextResponse(
         content=metrics_data,
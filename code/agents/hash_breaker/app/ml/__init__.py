@@ -4,11 +4,23 @@
 from app.ml.pagpassgpt_official.wrapper import (
     PagPassGPTGenerator,
     get_generator,
+    warmup_generator,
     check_model_available
 )
 
+# Compact PCFG + Markov generator (CPU-cheap phase 3 alternative)
+from app.ml.markov_pcfg import (
+    MarkovPcfgModel,
+    build_markov_model,
+    get_markov_model
+)
+
 __all__ = [
     "PagPassGPTGenerator",
     "get_generator",
-    "check_model_available"
+    "warmup_generator",
+    "check_model_available",
+    "MarkovPcfgModel",
+    "build_markov_model",
+    "get_markov_model"
 ]
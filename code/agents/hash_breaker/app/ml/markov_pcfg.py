@@ -0,0 +1,481 @@
+"""
+Compact PCFG + Markov password model, a CPU-cheap alternative for phase 3
+
+Trained offline from the wordlists (``python -m app.cli build-markov-model``)
+and enumerated in descending probability order instead of sampled, so it
+never repeats a guess and costs a fraction of a transformer forward pass:
+
+- Base structures (``L6 N2``, the D&C-GEN pattern format) with their rates.
+- Digit (``N``) and special (``S``) segments: the most frequent observed
+  strings of every length.
+- Letter (``L``) segments: observed strings, plus strings of an order-2
+  character Markov chain carrying the probability mass of unseen words
+  (the Good-Turing share of words seen once), in lower, Capitalized and
+  UPPER case at their learned shares.
+
+Probabilities are discretised into levels (``-ln p / LEVEL_STEP``, as in
+OMEN). Enumeration walks the total level of structure and terminals upward;
+at every level each structure emits the cartesian products of the terminal
+ranges whose levels add up, vectorised with numpy over fixed-width terminal
+arrays. The work units of a level are independent, so they can be
+materialised across processes.
+
+Layout of ``settings.markov_model_dir``:
+
+    manifest.json          format version, sources, structures with rates and levels
+    patterns.txt           structure<TAB>rate (usable as a D&C-GEN / phase 4 pattern file)
+    {segment}.npy          terminals of one segment (e.g. ``L6``), one uint8 row each
+    {segment}.levels.npy   level of every terminal, ascending
+"""
+
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.utils.fingerprints import source_fingerprints
+
+logger = logging.getLogger(__name__)
+
+MODEL_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+PATTERNS_NAME = "patterns.txt"
+
+# Width of a probability level in nats; terminals beyond MAX_LEVEL are dropped
+LEVEL_STEP = 0.5
+MAX_LEVEL = 255
+
+# Candidates materialised per work unit
+UNIT_SIZE = 65536
+
+# Additive smoothing of the Markov chain counts
+_MARKOV_ALPHA = 0.1
+_CASE_FORMS = ("lower", "capitalized", "upper")
+
+_SEGMENT_RE = re.compile(rb"[A-Za-z]+|[0-9]+|[^A-Za-z0-9]+")
+
+# Work unit: (structure index, terminal level per segment, first, last flat index)
+Unit = Tuple[int, Tuple[int, ...], int, int]
+
+
+def _level(probability: float) -> int:
+    return int(-math.log(probability) / LEVEL_STEP) if probability > 0 else MAX_LEVEL + 1
+
+
+def _segment_key(segment: bytes) -> str:
+    first = segment[:1]
+    cls = "L" if first.isalpha() else "N" if first.isdigit() else "S"
+    return f"{cls}{len(segment)}"
+
+
+def _case_form(segment: bytes) -> Optional[str]:
+    if segment.islower():
+        return "lower"
+    if segment.isupper():
+        return "upper" if len(segment) > 1 else "capitalized"
+    if segment[:1].isupper() and segment[1:].islower():
+        return "capitalized"
+    return None
+
+
+def _apply_case(word: bytes, form: str) -> bytes:
+    if form == "upper":
+        return word.upper()
+    if form == "capitalized":
+        return word.capitalize()
+    return word
+
+
+@dataclass(frozen=True)
+class Structure:
+    """A base structure and its level."""
+
+    pattern: str
+    rate: float
+    level: int
+    segments: Tuple[str, ...]
+
+
+class MarkovPcfgModel:
+    """Read access to a model built by ``build_markov_model``."""
+
+    def __init__(self, model_dir: Path):
+        """Open a model.
+
+        Args:
+            model_dir: Directory containing the manifest
+
+        Raises:
+            FileNotFoundError: If the manifest or a terminal file is missing
+            ValueError: If the model was built with another format version
+        """
+        self.model_dir = Path(model_dir)
+        self.manifest = json.loads((self.model_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        if self.manifest.get("format_version") != MODEL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported Markov/PCFG model format: {self.manifest.get('format_version')}")
+
+        self.terminals: Dict[str, np.ndarray] = {}
+        # segment -> (distinct levels ascending, first index of each level, end index of each level)
+        self.level_ranges: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        for key in self.manifest["segments"]:
+            self.terminals[key] = np.load(self.model_dir / f"{key}.npy", mmap_mode="r")
+            levels = np.load(self.model_dir / f"{key}.levels.npy")
+            distinct, starts = np.unique(levels, return_index=True)
+            ends = np.append(starts[1:], len(levels))
+            self.level_ranges[key] = (distinct.astype(np.int64), starts, ends)
+
+        self.structures = [
+            Structure(pattern, rate, level, tuple(pattern.split()))
+            for pattern, rate, level in self.manifest["structures"]
+            if all(key in self.level_ranges for key in pattern.split())
+        ]
+
+    def stale(self) -> bool:
+        """Whether a source wordlist changed since the model was built."""
+        sources = self.manifest["sources"]
+        return source_fingerprints([Path(s["path"]) for s in sources]) != sources
+
+    def iter_units(self) -> Iterator[Tuple[Unit, int]]:
+        """Work units in ascending total level, with their candidate counts."""
+        bounds = []
+        for structure in self.structures:
+            lows = [int(self.level_ranges[key][0][0]) for key in structure.segments]
+            highs = [int(self.level_ranges[key][0][-1]) for key in structure.segments]
+            bounds.append((structure.level + sum(lows), structure.level + sum(highs)))
+        if not bounds:
+            return
+
+        for total in range(min(low for low, _ in bounds), max(high for _, high in bounds) + 1):
+            for index, structure in enumerate(self.structures):
+                if not bounds[index][0] <= total <= bounds[index][1]:
+                    continue
+                for levels in self._compositions(structure.segments, total - structure.level):
+                    size = 1
+                    for key, level in zip(structure.segments, levels):
+                        distinct, starts, ends = self.level_ranges[key]
+                        position = int(np.searchsorted(distinct, level))
+                        size *= int(ends[position] - starts[position])
+                    for first in range(0, size, UNIT_SIZE):
+                        yield (index, levels, first, min(size, first + UNIT_SIZE)), min(size, first + UNIT_SIZE) - first
+
+    def _compositions(self, segments: Sequence[str], target: int) -> Iterator[Tuple[int, ...]]:
+        """Terminal levels per segment that add up to ``target``."""
+        distinct = [self.level_ranges[key][0] for key in segments]
+        rest_low = [sum(int(d[0]) for d in distinct[i:]) for i in range(len(distinct))] + [0]
+        rest_high = [sum(int(d[-1]) for d in distinct[i:]) for i in range(len(distinct))] + [0]
+
+        def walk(i: int, remaining: int, chosen: Tuple[int, ...]) -> Iterator[Tuple[int, ...]]:
+            if i == len(distinct) - 1:
+                position = int(np.searchsorted(distinct[i], remaining))
+                if position < len(distinct[i]) and distinct[i][position] == remaining:
+                    yield chosen + (remaining,)
+                return
+            for level in distinct[i]:
+                rest = remaining - int(level)
+                if rest < rest_low[i + 1]:
+                    break
+                if rest <= rest_high[i + 1]:
+                    yield from walk(i + 1, rest, chosen + (int(level),))
+
+        if rest_low[0] <= target <= rest_high[0]:
+            yield from walk(0, target, ())
+
+    def materialize(self, unit: Unit) -> List[str]:
+        """Candidates of one work unit."""
+        index, levels, first, last = unit
+        segments = self.structures[index].segments
+        starts = []
+        dims = []
+        for key, level in zip(segments, levels):
+            distinct, level_starts, level_ends = self.level_ranges[key]
+            position = int(np.searchsorted(distinct, level))
+            starts.append(int(level_starts[position]))
+            dims.append(int(level_ends[position] - level_starts[position]))
+
+        offsets = np.unravel_index(np.arange(first, last, dtype=np.int64), dims)
+        rows = np.concatenate(
+            [self.terminals[key][start + offset] for key, start, offset in zip(segments, starts, offsets)], axis=1
+        )
+        width = rows.shape[1]
+        return [word.decode("ascii") for word in np.ascontiguousarray(rows).view(f"S{width}").ravel().tolist()]
+
+    def iter_batches(self, limit: int, skip: int = 0, workers: int = 1) -> Iterator[List[str]]:
+        """Stream candidates in descending probability order.
+
+        Args:
+            limit: Candidates to produce
+            skip: Leading candidates to leave out (resuming a stream)
+            workers: Processes materialising work units; 1 runs inline
+
+        Yields:
+            Candidate batches of up to ``UNIT_SIZE``
+        """
+        remaining = max(0, int(limit))
+        units = self._skipped_units(max(0, int(skip)))
+        if workers <= 1:
+            for unit in units:
+                if remaining <= 0:
+                    return
+                batch = self.materialize(unit)[:remaining]
+                remaining -= len(batch)
+                yield batch
+            return
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(str(self.model_dir),)
+        ) as pool:
+            pending = deque()
+            try:
+                for unit in units:
+                    pending.append(pool.submit(_materialize, unit))
+                    if len(pending) < workers * 2:
+                        continue
+                    batch = pending.popleft().result()[:remaining]
+                    remaining -= len(batch)
+                    yield batch
+                    if remaining <= 0:
+                        return
+                while pending and remaining > 0:
+                    batch = pending.popleft().result()[:remaining]
+                    remaining -= len(batch)
+                    yield batch
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _skipped_units(self, skip: int) -> Iterator[Unit]:
+        for unit, size in self.iter_units():
+            if skip >= size:
+                skip -= size
+                continue
+            if skip:
+                index, levels, first, last = unit
+                unit = (index, levels, first + skip, last)
+                skip = 0
+            yield unit
+
+
+_worker_model: Optional[MarkovPcfgModel] = None
+
+
+def _init_worker(model_dir: str) -> None:
+    global _worker_model
+    _worker_model = MarkovPcfgModel(Path(model_dir))
+
+
+def _materialize(unit: Unit) -> List[str]:
+    return _worker_model.materialize(unit)
+
+
+def build_markov_model(
+    wordlists: Sequence[Path],
+    model_dir: Path,
+    max_words: int = 0,
+    terminals: int = 20000,
+    structures: int = 5000,
+    max_length: int = 16,
+) -> dict:
+    """Train the model from wordlists.
+
+    Every line is one observation, so a raw leak with repeats weighs words
+    by frequency; printable ASCII words of 4 to ``max_length`` bytes are used.
+
+    Args:
+        wordlists: Training wordlists (missing files are skipped)
+        model_dir: Output directory (replaced)
+        max_words: Words read per wordlist (0 = all)
+        terminals: Terminals kept per segment
+        structures: Most frequent base structures kept
+        max_length: Longest password length learned
+
+    Returns:
+        The written manifest
+    """
+    started = time.time()
+    sources = [Path(w) for w in wordlists if Path(w).is_file()]
+    if not sources:
+        raise FileNotFoundError("No wordlists found to train the Markov/PCFG model from")
+
+    structure_counts: Counter = Counter()
+    segment_counts: Dict[str, Counter] = {}
+    case_counts: Counter = Counter()
+    words = 0
+    for source in sources:
+        with source.open("rb") as handle:
+            for count, line in enumerate(handle):
+                if max_words and count >= max_words:
+                    break
+                word = line.rstrip(b"\r\n")
+                if not 4 <= len(word) <= max_length or not all(32 <= byte <= 126 for byte in word):
+                    continue
+                segments = _SEGMENT_RE.findall(word)
+                keys = [_segment_key(segment) for segment in segments]
+                structure_counts[" ".join(keys)] += 1
+                for key, segment in zip(keys, segments):
+                    segment_counts.setdefault(key, Counter())[segment] += 1
+                    if key[0] == "L":
+                        case_counts[_case_form(segment)] += 1
+                words += 1
+    if not words:
+        raise ValueError("No usable training words in the wordlists")
+
+    case_total = sum(case_counts[form] for form in _CASE_FORMS) or 1
+    case_shares = {form: case_counts[form] / case_total for form in _CASE_FORMS}
+    chain = _train_chain(segment_counts)
+
+    kept = [(pattern, count / words) for pattern, count in structure_counts.most_common(structures)]
+    needed = {key for pattern, _ in kept for key in pattern.split()}
+
+    model_dir = Path(model_dir)
+    tmp_dir = model_dir.with_name(f".{model_dir.name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    segments_info = {}
+    for key in sorted(needed):
+        table, unseen = _terminal_table(key, segment_counts[key], chain, case_shares, terminals)
+        if not table:
+            continue
+        table.sort(key=lambda item: -item[1])
+        chars = np.frombuffer(b"".join(word for word, _ in table), dtype=np.uint8).reshape(len(table), int(key[1:]))
+        levels = np.array([min(_level(p), MAX_LEVEL) for _, p in table], dtype=np.uint8)
+        np.save(tmp_dir / f"{key}.npy", chars)
+        np.save(tmp_dir / f"{key}.levels.npy", levels)
+        segments_info[key] = {"terminals": len(table), "observed": len(segment_counts[key]), "unseen_mass": unseen}
+
+    manifest = {
+        "format_version": MODEL_FORMAT_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sources": source_fingerprints(sources),
+        "words": words,
+        "level_step": LEVEL_STEP,
+        "case_shares": case_shares,
+        "structures": [
+            [pattern, rate, _level(rate)] for pattern, rate in kept
+            if all(key in segments_info for key in pattern.split())
+        ],
+        "segments": segments_info,
+    }
+    (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    (tmp_dir / PATTERNS_NAME).write_text(
+        "".join(f"{pattern}\t{rate:.8g}\n" for pattern, rate, _ in manifest["structures"]), encoding="utf-8"
+    )
+
+    shutil.rmtree(model_dir, ignore_errors=True)
+    os.replace(tmp_dir, model_dir)
+    logger.info(
+        f"Markov/PCFG model: {words} words, {len(manifest['structures'])} structures, "
+        f"{len(segments_info)} segments ({time.time() - started:.1f}s)"
+    )
+    return manifest
+
+
+def _train_chain(segment_counts: Dict[str, Counter]) -> np.ndarray:
+    """Order-2 log-probabilities of the next lowercase letter, indexed ``[prev2, prev1, next]``.
+
+    Index 0 of a context is the start of the segment, letters are 1..26.
+    """
+    counts = np.zeros((27, 27, 26), dtype=np.float64)
+    for key, segments in segment_counts.items():
+        if key[0] != "L":
+            continue
+        for segment, count in segments.items():
+            prev2 = prev1 = 0
+            for byte in segment.lower():
+                letter = byte - 97
+                counts[prev2, prev1, letter] += count
+                prev2, prev1 = prev1, letter + 1
+    smoothed = counts + _MARKOV_ALPHA
+    return np.log(smoothed / smoothed.sum(axis=2, keepdims=True))
+
+
+def _terminal_table(
+    key: str,
+    observed: Counter,
+    chain: np.ndarray,
+    case_shares: Dict[str, float],
+    limit: int,
+) -> Tuple[List[Tuple[bytes, float]], float]:
+    """Most probable terminals of a segment and the mass left to unseen strings."""
+    total = sum(observed.values())
+    if key[0] != "L":
+        return [(segment, count / total) for segment, count in observed.most_common(limit)], 0.0
+
+    # Good-Turing: words seen once estimate the share of words never seen
+    singletons = sum(1 for count in observed.values() if count == 1)
+    unseen = min(0.5, max(singletons / total, 1 / total))
+    table = [(segment, (1 - unseen) * count / total) for segment, count in observed.most_common(limit)]
+    seen = set(observed)
+    for word, log_p in _markov_top(chain, int(key[1:]), limit):
+        for form in _CASE_FORMS:
+            cased = _apply_case(word, form)
+            if case_shares[form] > 0 and cased not in seen:
+                seen.add(cased)
+                table.append((cased, unseen * math.exp(log_p) * case_shares[form]))
+    table.sort(key=lambda item: -item[1])
+    return table[:limit], unseen
+
+
+def _markov_top(chain: np.ndarray, length: int, limit: int) -> Iterator[Tuple[bytes, float]]:
+    """The most probable lowercase strings of ``length`` letters, best first.
+
+    Beam search keeping the ``limit`` best prefixes of every length, so a
+    string is only missed if one of its prefixes ranked below that.
+    """
+    letters = np.arange(26)
+    codes = np.zeros((1, 0), dtype=np.uint8)
+    log_p = np.zeros(1)
+    prev2 = prev1 = np.zeros(1, dtype=np.int64)
+    for _ in range(length):
+        scores = (log_p[:, None] + chain[prev2, prev1]).ravel()
+        keep = np.argsort(-scores, kind="stable")[:limit]
+        parent, letter = np.divmod(keep, 26)
+        codes = np.concatenate([codes[parent], letters[letter][:, None].astype(np.uint8)], axis=1)
+        log_p = scores[keep]
+        prev2, prev1 = prev1[parent], letter + 1
+    words = (codes + ord("a")).astype(np.uint8)
+    for row, value in zip(words, log_p):
+        yield row.tobytes(), float(value)
+
+
+# Global model instance
+_markov_model: Optional[MarkovPcfgModel] = None
+_markov_model_checked = False
+
+
+def get_markov_model() -> Optional[MarkovPcfgModel]:
+    """Get the process-wide Markov/PCFG model, or None if it has not been built.
+
+    Returns:
+        MarkovPcfgModel instance or None
+    """
+    global _markov_model, _markov_model_checked
+
+    if not _markov_model_checked:
+        _markov_model_checked = True
+        model_dir = get_settings().markov_model_dir
+        if not (model_dir / MANIFEST_NAME).exists():
+            logger.info(f"Markov/PCFG model not found at {model_dir}")
+            return None
+        try:
+            _markov_model = MarkovPcfgModel(model_dir)
+            if _markov_model.stale():
+                logger.warning("Markov/PCFG model is older than its wordlists; run build-markov-model again")
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning(f"Failed to open Markov/PCFG model: {exc}")
+            _markov_model = None
+
+    return _markov_model
@@ -0,0 +1,304 @@
+"""
+D&C-GEN (divide-and-conquer generation) for the service
+
+Service-side port of DC-GEN.py. The guess budget is split over PCFG patterns
+by their rate; a pattern whose budget exceeds the threshold is split again
+by the model's next-character probabilities (restricted to the character
+class the pattern requires), until every subtask is small enough to be
+sampled directly. Subtasks therefore cover disjoint prefixes, which keeps
+the output largely free of the duplicates plain sampling produces at scale.
+
+Unlike the standalone script, the model is loaded once per process, output
+is streamed in batches instead of written to files, and patterns are pulled
+from a shared task queue by worker processes.
+"""
+
+import logging
+import multiprocessing
+import queue
+from pathlib import Path
+from typing import Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# L has 52 different letters, N has 10 different numbers and S has 32
+BRUTE_DICT = {'L': 52, 'N': 10, 'S': 32}
+
+# Token id span of each character class, adhering to vocab.json
+TYPE_ID_DICT = {
+    'L': (51, 103),
+    'N': (41, 51),
+    'S': (103, 135),
+}
+
+# Patterns expected to yield fewer guesses than this are dropped
+MIN_PATTERN_GUESSES = 100
+
+# Sequences sampled per model.generate call
+SAMPLE_BATCH = 1000
+
+
+def load_patterns(pattern_file: Path, min_rate: float = 0.0) -> List[Tuple[str, float]]:
+    """
+    Read a D&C-GEN pattern rate file
+
+    Args:
+        pattern_file: File with one ``pattern<TAB>rate`` per line, e.g. "L4 N2\\t0.0123"
+        min_rate: Patterns below this rate are dropped
+
+    Returns:
+        (pattern, rate) pairs, most frequent first
+    """
+    patterns = []
+    with open(pattern_file, "r", encoding="utf-8") as handle:
+        for line in handle:
+            parts = line.rstrip("\r\n").split("\t")
+            if len(parts) != 2 or not parts[0].strip():
+                continue
+            try:
+                rate = float(parts[1])
+            except ValueError:
+                continue
+            if rate > 0 and rate >= min_rate:
+                patterns.append((parts[0].strip(), rate))
+    return sorted(patterns, key=lambda item: -item[1])
+
+
+def prepare_tasks(patterns: Sequence[Tuple[str, float]], num_passwords: int) -> List[Tuple[str, int]]:
+    """
+    Split a guess budget over patterns by rate
+
+    Args:
+        patterns: (pattern, rate) pairs
+        num_passwords: Total guess budget
+
+    Returns:
+        (pattern, guesses) tasks, largest first
+    """
+    threshold_rate = MIN_PATTERN_GUESSES / max(1, num_passwords)
+    kept = [(pattern, rate) for pattern, rate in patterns if rate >= threshold_rate]
+    total_rate = sum(rate for _, rate in kept)
+    if not total_rate:
+        return []
+    tasks = [(pattern, int(rate / total_rate * num_passwords)) for pattern, rate in kept]
+    return sorted((task for task in tasks if task[1] > 0), key=lambda task: -task[1])
+
+
+def pattern_types(pcfg_pattern: str) -> List[str]:
+    """Expand a pattern like "L4 N2" into per-position classes ['L', 'L', 'L', 'L', 'N', 'N']."""
+    types = []
+    for segment in pcfg_pattern.split(' '):
+        types.extend(segment[:1] * int(segment[1:]))
+    return types
+
+
+class DCGenSplitter:
+    """
+    Runs D&C-GEN subtasks for one pattern at a time on a loaded model
+    """
+
+    def __init__(self, model, tokenizer, device: str, threshold: int, sample_batch: int = SAMPLE_BATCH):
+        """
+        Initialize splitter
+
+        Args:
+            model: Loaded GPT2LMHeadModel
+            tokenizer: PagPassGPT CharTokenizer
+            device: Torch device of the model
+            threshold: Subtasks up to this many guesses are sampled directly
+            sample_batch: Sequences per model.generate call
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.threshold = max(1, int(threshold))
+        self.sample_batch = max(1, int(sample_batch))
+        self.generated = 0
+
+    def run(self, pcfg_pattern: str, gen_num: int) -> Iterator[List[str]]:
+        """
+        Generate up to gen_num passwords of one pattern, most probable prefixes first
+
+        Args:
+            pcfg_pattern: Space separated pattern, e.g. "L4 N2"
+            gen_num: Guess budget of the pattern
+
+        Yields:
+            Password batches; ``generated`` holds the running count
+        """
+        import torch
+
+        types = pattern_types(pcfg_pattern)
+        prefix_length = len(pcfg_pattern.split(' ')) + 2  # 2: bos + sep
+        max_gen_num = 1
+        for char_type in types:
+            max_gen_num *= BRUTE_DICT[char_type]
+
+        input_ids = self.tokenizer.encode_forgen(pcfg_pattern)
+        input_ids = torch.concat([input_ids, torch.tensor([self.tokenizer.sep_token_id])]).view(1, -1)
+
+        self.generated = 0
+        tasks = [(input_ids, min(gen_num, max_gen_num))]
+        pending: List[str] = []
+        more_gen_num = 0
+        while tasks:
+            input_ids, gen_num = tasks.pop()
+            position = input_ids.shape[1] - prefix_length
+            if position == len(types):
+                pending.append(self._decode(input_ids[0]))
+                more_gen_num = gen_num - 1
+            else:
+                gen_num = gen_num + more_gen_num
+                if gen_num <= self.threshold:
+                    new_passwords = self._sample(input_ids, gen_num, len(types) - position)
+                    pending.extend(new_passwords)
+                    more_gen_num = gen_num - len(new_passwords)
+                else:
+                    # Push ascending so the most probable branch is popped first
+                    for next_id, next_num in reversed(self._split(input_ids, gen_num, types[position])):
+                        tasks.append((torch.cat([input_ids, next_id.view(1, 1)], dim=1), next_num))
+                    more_gen_num = 0
+
+            if len(pending) >= self.sample_batch:
+                self.generated += len(pending)
+                yield pending
+                pending = []
+
+        if pending:
+            self.generated += len(pending)
+            yield pending
+
+    def _split(self, input_ids, gen_num: int, char_type: str) -> List[tuple]:
+        """Divide gen_num over the next characters of the required class, most probable first."""
+        import torch
+
+        with torch.no_grad():
+            logits = self.model(input_ids=input_ids.to(self.device)).logits[0, -1, :]
+        low, high = TYPE_ID_DICT[char_type]
+        probs = torch.softmax(logits[low:high], dim=-1).cpu()
+        order = torch.argsort(probs, descending=True)
+        probs = probs[order]
+
+        # Characters that would get less than one guess are dropped and
+        # their share is redistributed over the rest
+        keep = int((probs * gen_num >= 1).sum())
+        if keep == 0:
+            keep = 1
+        probs = probs[:keep] / probs[:keep].sum()
+        return [
+            (order[i] + low, int(probs[i] * gen_num))
+            for i in range(keep)
+            if int(probs[i] * gen_num) > 0
+        ]
+
+    def _sample(self, input_ids, gen_num: int, remaining_length: int) -> List[str]:
+        """Sample a subtask directly; duplicates within it are removed."""
+        import torch
+
+        passwords = set()
+        for start in range(0, gen_num, self.sample_batch):
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    input_ids.to(self.device),
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    max_new_tokens=remaining_length + 1,
+                    do_sample=True,
+                    num_return_sequences=min(self.sample_batch, gen_num - start),
+                )
+            passwords.update(self._decode(output) for output in outputs)
+        passwords.discard("")
+        return list(passwords)
+
+    def _decode(self, ids) -> str:
+        decoded = self.tokenizer.decode(ids).split(' ', 1)
+        return decoded[1].strip() if len(decoded) == 2 else ""
+
+
+def iter_dcgen_processes(
+    model_path: Path,
+    tasks: Sequence[Tuple[str, int]],
+    threshold: int,
+    devices: Sequence[str],
+) -> Iterator[List[str]]:
+    """
+    Run D&C-GEN tasks on one worker process per device entry
+
+    Workers pull (pattern, guesses) tasks from a shared queue, so large and
+    small patterns balance out, and stream password batches back. Closing
+    the iterator terminates the workers.
+
+    Args:
+        model_path: Path to trained PagPassGPT model
+        tasks: (pattern, guesses) tasks, largest first
+        threshold: Direct sampling threshold
+        devices: Torch device per worker, e.g. ["cuda:0", "cuda:1"]
+
+    Yields:
+        Password batches in completion order
+    """
+    context = multiprocessing.get_context("spawn")
+    task_queue = context.Queue()
+    result_queue = context.Queue(maxsize=4 * len(devices))
+    for task in tasks:
+        task_queue.put(task)
+    for _ in devices:
+        task_queue.put(None)
+
+    workers = [
+        context.Process(
+            target=_dcgen_worker,
+            args=(str(model_path), device, threshold, task_queue, result_queue),
+            daemon=True,
+        )
+        for device in devices
+    ]
+    for worker in workers:
+        worker.start()
+
+    running = len(workers)
+    try:
+        while running:
+            try:
+                batch = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    logger.warning("D&C-GEN workers exited without finishing")
+                    break
+                continue
+            if batch is None:
+                running -= 1
+                continue
+            yield batch
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join(timeout=5)
+
+
+def _dcgen_worker(model_path: str, device: str, threshold: int, task_queue, result_queue) -> None:
+    """Worker process: load the model once, then drain the task queue."""
+    from app.ml.pagpassgpt_official.wrapper import PagPassGPTGenerator
+
+    try:
+        generator = PagPassGPTGenerator(model_path, device=device, backend="torch")
+        if not generator.use_official:
+            logger.error(f"D&C-GEN worker on {device}: model unavailable")
+            return
+        splitter = DCGenSplitter(generator.model, generator.tokenizer, generator.device, threshold)
+
+        more_gen_num = 0
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            pcfg_pattern, gen_num = task
+            gen_num += more_gen_num
+            for batch in splitter.run(pcfg_pattern, gen_num):
+                result_queue.put(batch)
+            more_gen_num = max(0, gen_num - splitter.generated)
+    except Exception as e:
+        logger.error(f"D&C-GEN worker on {device} failed: {e}")
+    finally:
+        result_queue.put(None)
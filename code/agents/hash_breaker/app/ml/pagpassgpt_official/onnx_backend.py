@@ -0,0 +1,294 @@
+"""
+ONNX Runtime backend for PagPassGPT
+
+GPU-less workers spend most of phase 3 inside transformers' generic
+``model.generate``. This module exports the GPT-2 decoder to ONNX with an
+explicit KV cache, quantizes the weights to int8 (dynamic quantization),
+and samples with a batched decode loop in numpy:
+
+- the shared prompt (BOS, pattern, SEP) is run once and its cache is
+  broadcast over the batch
+- every step feeds one token per sequence and reuses the returned cache
+- generated tokens go into a preallocated (batch, max_new_tokens) buffer;
+  finished sequences are padded instead of being removed, so shapes stay
+  fixed for the whole batch
+
+Export layout (``<model_path>/onnx``):
+
+    model.onnx         fp32 export
+    model.int8.onnx    dynamically quantized weights
+    export.json        layer/head sizes needed to build the empty cache
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_DIR_NAME = "onnx"
+FP32_MODEL_NAME = "model.onnx"
+INT8_MODEL_NAME = "model.int8.onnx"
+EXPORT_INFO_NAME = "export.json"
+
+
+def onnx_model_file(model_path: Path) -> Path:
+    """Path of the quantized model exported for a PagPassGPT checkpoint."""
+    return Path(model_path) / ONNX_DIR_NAME / INT8_MODEL_NAME
+
+
+def onnx_available(model_path: Path) -> bool:
+    """Check if onnxruntime is installed and the model has been exported."""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return onnx_model_file(model_path).exists()
+
+
+def export_onnx(model_path: Path, output_dir: Optional[Path] = None, quantize: bool = True) -> Path:
+    """
+    Export a PagPassGPT checkpoint to ONNX and quantize it to int8
+
+    Args:
+        model_path: Path to trained PagPassGPT model
+        output_dir: Export directory (defaults to <model_path>/onnx)
+        quantize: Write the int8 model next to the fp32 export
+
+    Returns:
+        Path of the model the runtime should load
+    """
+    import torch
+    from transformers import GPT2LMHeadModel
+
+    model_path = Path(model_path)
+    output_dir = Path(output_dir or model_path / ONNX_DIR_NAME)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    model = GPT2LMHeadModel.from_pretrained(str(model_path))
+    model.eval()
+    config = model.config
+    n_layer = config.n_layer
+    n_head = config.n_head
+    head_dim = config.n_embd // config.n_head
+
+    class _CachedDecoder(torch.nn.Module):
+        """Flattens the cache so it can be exported as plain inputs/outputs."""
+
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, position_ids, *past):
+            past_key_values = tuple((past[2 * i], past[2 * i + 1]) for i in range(n_layer))
+            output = self.inner(
+                input_ids=input_ids,
+                position_ids=position_ids,
+                past_key_values=past_key_values,
+                use_cache=True,
+                return_dict=True,
+            )
+            present = [tensor for layer in output.past_key_values for tensor in layer]
+            return (output.logits[:, -1, :], *present)
+
+    past_names = [f"past.{i}.{kind}" for i in range(n_layer) for kind in ("key", "value")]
+    present_names = [f"present.{i}.{kind}" for i in range(n_layer) for kind in ("key", "value")]
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "position_ids": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch"},
+    }
+    dynamic_axes.update({name: {0: "batch", 2: "past_sequence"} for name in past_names})
+    dynamic_axes.update({name: {0: "batch", 2: "total_sequence"} for name in present_names})
+
+    dummy_ids = torch.zeros((2, 1), dtype=torch.long)
+    dummy_positions = torch.ones((2, 1), dtype=torch.long)
+    dummy_past = [torch.zeros((2, n_head, 1, head_dim)) for _ in past_names]
+
+    fp32_file = output_dir / FP32_MODEL_NAME
+    with torch.no_grad():
+        torch.onnx.export(
+            _CachedDecoder(model),
+            (dummy_ids, dummy_positions, *dummy_past),
+            str(fp32_file),
+            input_names=["input_ids", "position_ids", *past_names],
+            output_names=["logits", *present_names],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    logger.info(f"Exported PagPassGPT to {fp32_file}")
+
+    (output_dir / EXPORT_INFO_NAME).write_text(
+        json.dumps(
+            {
+                "n_layer": n_layer,
+                "n_head": n_head,
+                "head_dim": head_dim,
+                "vocab_size": config.vocab_size,
+                "n_positions": config.n_positions,
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+
+    if not quantize:
+        return fp32_file
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_file = output_dir / INT8_MODEL_NAME
+    quantize_dynamic(str(fp32_file), str(int8_file), weight_type=QuantType.QInt8)
+    logger.info(
+        f"Quantized PagPassGPT to {int8_file} "
+        f"({fp32_file.stat().st_size / 2 ** 20:.1f} -> {int8_file.stat().st_size / 2 ** 20:.1f} MiB)"
+    )
+    return int8_file
+
+
+class OnnxPagPassGPT:
+    """
+    Batched sampler over an exported PagPassGPT decoder
+    """
+
+    def __init__(self, model_file: Path, num_threads: int = 0, seed: Optional[int] = None):
+        """
+        Load an exported model
+
+        Args:
+            model_file: ONNX model written by export_onnx
+            num_threads: Intra-op threads (0 = onnxruntime default, one per core)
+            seed: Sampling seed
+        """
+        import onnxruntime as ort
+
+        model_file = Path(model_file)
+        info = json.loads((model_file.parent / EXPORT_INFO_NAME).read_text(encoding="utf-8"))
+        self.n_layer = info["n_layer"]
+        self.n_head = info["n_head"]
+        self.head_dim = info["head_dim"]
+        self.n_positions = info.get("n_positions", 32)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self.past_names = [f"past.{i}.{kind}" for i in range(self.n_layer) for kind in ("key", "value")]
+        self.rng = np.random.default_rng(seed if seed is not None else int.from_bytes(os.urandom(8), "little"))
+
+    def sample(
+        self,
+        prompt_ids: Sequence[int],
+        num_sequences: int,
+        max_new_tokens: int,
+        stop_ids: Sequence[int],
+        pad_id: int,
+        top_k: int = 50,
+        top_p: float = 0.95,
+        temperature: float = 0.8,
+        batch_size: int = 1000,
+    ) -> List[np.ndarray]:
+        """
+        Sample continuations of a prompt
+
+        Args:
+            prompt_ids: Prompt token ids (BOS, pattern, SEP)
+            num_sequences: Number of continuations
+            max_new_tokens: Decode steps per continuation
+            stop_ids: Tokens that end a sequence
+            pad_id: Token written after a sequence ended
+            top_k: Sample among the k most likely tokens
+            top_p: Nucleus threshold applied within the top k
+            temperature: Softmax temperature
+            batch_size: Sequences decoded together
+
+        Returns:
+            One (batch, max_new_tokens) token array per batch
+        """
+        max_new_tokens = min(max_new_tokens, self.n_positions - len(prompt_ids))
+        batches = []
+        for start in range(0, num_sequences, batch_size):
+            batches.append(
+                self._sample_batch(
+                    prompt_ids,
+                    min(batch_size, num_sequences - start),
+                    max_new_tokens,
+                    np.asarray(stop_ids, dtype=np.int64),
+                    pad_id,
+                    top_k,
+                    top_p,
+                    temperature,
+                )
+            )
+        return batches
+
+    def _run_prompt(self, prompt_ids: Sequence[int]):
+        empty = np.zeros((1, self.n_head, 0, self.head_dim), dtype=np.float32)
+        feed = {
+            "input_ids": np.asarray([prompt_ids], dtype=np.int64),
+            "position_ids": np.arange(len(prompt_ids), dtype=np.int64)[None, :],
+        }
+        feed.update({name: empty for name in self.past_names})
+        logits, *present = self.session.run(None, feed)
+        return logits, present
+
+    def _sample_batch(
+        self,
+        prompt_ids: Sequence[int],
+        batch: int,
+        max_new_tokens: int,
+        stop_ids: np.ndarray,
+        pad_id: int,
+        top_k: int,
+        top_p: float,
+        temperature: float,
+    ) -> np.ndarray:
+        # The prompt is identical for every sequence: run it once, then
+        # broadcast its cache over the batch
+        logits, present = self._run_prompt(prompt_ids)
+        logits = np.repeat(logits, batch, axis=0)
+        past = [np.repeat(tensor, batch, axis=0) for tensor in present]
+
+        tokens = np.full((batch, max_new_tokens), pad_id, dtype=np.int64)
+        finished = np.zeros(batch, dtype=bool)
+        positions = np.full((batch, 1), len(prompt_ids), dtype=np.int64)
+
+        for step in range(max_new_tokens):
+            next_ids = self._sample_logits(logits, top_k, top_p, temperature)
+            next_ids[finished] = pad_id
+            tokens[:, step] = next_ids
+            finished |= np.isin(next_ids, stop_ids)
+            if finished.all() or step == max_new_tokens - 1:
+                break
+
+            feed = {"input_ids": next_ids[:, None], "position_ids": positions}
+            feed.update(zip(self.past_names, past))
+            logits, *past = self.session.run(None, feed)
+            positions += 1
+
+        return tokens
+
+    def _sample_logits(self, logits: np.ndarray, top_k: int, top_p: float, temperature: float) -> np.ndarray:
+        top_k = min(top_k, logits.shape[1])
+        candidates = np.argpartition(-logits, top_k - 1, axis=1)[:, :top_k]
+        scores = np.take_along_axis(logits, candidates, axis=1) / max(temperature, 1e-5)
+
+        order = np.argsort(-scores, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        probs = np.exp(scores - scores[:, :1])
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        # Nucleus: keep the smallest prefix whose mass reaches top_p
+        cumulative = np.cumsum(probs, axis=1)
+        probs[(cumulative - probs) >= top_p] = 0.0
+        cumulative = np.cumsum(probs, axis=1)
+
+        draws = self.rng.random((logits.shape[0], 1)) * cumulative[:, -1:]
+        choice = np.minimum((cumulative < draws).sum(axis=1), top_k - 1)
+        return candidates[np.arange(logits.shape[0]), choice]
@@ -0,0 +1,259 @@
+"""
+Shared, memory-mapped PagPassGPT weights for worker processes
+
+``from_pretrained`` gives every Dramatiq worker process (and every D&C-GEN
+worker) a private copy of the model. Instead, the weights are exported once
+into a safetensors file next to the checkpoint and each process maps that
+file copy-on-write: the parameters are numpy memmaps wrapped as torch
+tensors, so all processes on a host read the same page-cache pages and
+only pay for the module skeleton.
+
+Layout (``<model_path>/shared``):
+
+    weights.safetensors    every parameter once (tied weights are re-tied on load)
+
+The file is written by ``python -m app.cli export-shared-weights`` or by the
+first process that needs it; concurrent processes wait for that export
+instead of starting their own. The export records a fingerprint of the
+checkpoint files in the safetensors ``__metadata__``, so a replaced or
+retrained checkpoint is exported again instead of served from the old file.
+The export lock is an ``flock`` on ``weights.safetensors.lock``, which the
+kernel drops when the exporting process dies.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.utils.fingerprints import source_fingerprints
+
+logger = logging.getLogger(__name__)
+
+SHARED_DIR_NAME = "shared"
+WEIGHTS_NAME = "weights.safetensors"
+
+# How long a process waits for another process's export before loading privately
+_EXPORT_WAIT = 300
+_POLL_INTERVAL = 0.5
+
+_DTYPES = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "I64": np.int64,
+    "I32": np.int32,
+    "I16": np.int16,
+    "I8": np.int8,
+    "U8": np.uint8,
+    "BOOL": np.bool_,
+}
+_DTYPE_NAMES = {np.dtype(v): k for k, v in _DTYPES.items()}
+
+# Checkpoint files whose change invalidates the shared weight file
+_CHECKPOINT_SUFFIXES = (".bin", ".safetensors", ".json")
+
+
+def shared_weights_file(model_path: Path) -> Path:
+    """Path of the shared weight file of a PagPassGPT checkpoint."""
+    return Path(model_path) / SHARED_DIR_NAME / WEIGHTS_NAME
+
+
+def checkpoint_fingerprint(model_path: Path) -> str:
+    """Fingerprint of the checkpoint files the shared weights are exported from."""
+    return json.dumps(source_fingerprints(_checkpoint_files(model_path)), sort_keys=True)
+
+
+def export_shared_weights(model, weights_file: Path, source: str = "") -> Path:
+    """
+    Write a model's parameters as a safetensors file
+
+    Tensors sharing storage (GPT-2 ties ``lm_head`` to the token embedding)
+    are written once.
+
+    Args:
+        model: Loaded ``GPT2LMHeadModel``
+        weights_file: Output path (replaced atomically)
+        source: ``checkpoint_fingerprint`` of the checkpoint the model was
+            loaded from, stored in the file's metadata
+
+    Returns:
+        Path of the written file
+    """
+    weights_file = Path(weights_file)
+    weights_file.parent.mkdir(parents=True, exist_ok=True)
+
+    arrays = {}
+    seen = set()
+    for name, tensor in model.state_dict().items():
+        if tensor.data_ptr() in seen:
+            continue
+        seen.add(tensor.data_ptr())
+        arrays[name] = np.ascontiguousarray(tensor.detach().cpu().numpy())
+
+    header = {"__metadata__": {"format": "pt", "source": source}}
+    offset = 0
+    for name, array in arrays.items():
+        header[name] = {
+            "dtype": _DTYPE_NAMES[array.dtype],
+            "shape": list(array.shape),
+            "data_offsets": [offset, offset + array.nbytes],
+        }
+        offset += array.nbytes
+    encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    encoded += b" " * (-len(encoded) % 8)
+
+    tmp = weights_file.with_name(f"{weights_file.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as handle:
+        handle.write(struct.pack("<Q", len(encoded)))
+        handle.write(encoded)
+        for array in arrays.values():
+            handle.write(array.tobytes())
+    os.replace(tmp, weights_file)
+    logger.info(f"Exported shared PagPassGPT weights to {weights_file} ({offset / 2 ** 20:.1f} MiB)")
+    return weights_file
+
+
+def map_safetensors(weights_file: Path) -> Dict[str, np.ndarray]:
+    """
+    Map every tensor of a safetensors file copy-on-write
+
+    Args:
+        weights_file: safetensors file
+
+    Returns:
+        Tensor name to memory-mapped array
+    """
+    header, data_start = _read_header(weights_file)
+
+    arrays = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        start, end = info["data_offsets"]
+        dtype = np.dtype(_DTYPES[info["dtype"]])
+        if end == start:
+            arrays[name] = np.zeros(info["shape"], dtype=dtype)
+            continue
+        arrays[name] = np.memmap(weights_file, dtype=dtype, mode="c", offset=data_start + start, shape=tuple(info["shape"]))
+    return arrays
+
+
+def read_metadata(weights_file: Path) -> Dict[str, str]:
+    """The ``__metadata__`` of a safetensors file (empty if it has none)."""
+    return _read_header(weights_file)[0].get("__metadata__") or {}
+
+
+def load_shared_model(model_path: Path, device: str):
+    """
+    Build PagPassGPT on top of the shared weight file
+
+    Exports the file first if no process has done so yet, or if it was
+    exported from a different checkpoint.
+
+    Args:
+        model_path: Path to trained PagPassGPT model
+        device: Torch device; weights stay mapped on cpu and are copied to
+            any other device
+
+    Returns:
+        The model in eval mode, or None if the shared weights cannot be used
+    """
+    import torch
+    from accelerate import init_empty_weights
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    weights_file = shared_weights_file(model_path)
+    if not _is_current(model_path, weights_file):
+        if weights_file.exists():
+            logger.warning(f"Shared PagPassGPT weights at {weights_file} predate the checkpoint, re-exporting")
+        if not _export_once(model_path, weights_file):
+            return None
+
+    started = time.time()
+    config = GPT2Config.from_pretrained(str(model_path))
+    with init_empty_weights():
+        model = GPT2LMHeadModel(config)
+
+    for name, array in map_safetensors(weights_file).items():
+        module_name, _, attr = name.rpartition(".")
+        module = model.get_submodule(module_name)
+        tensor = torch.from_numpy(array)
+        if attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        elif attr in module._buffers:
+            module._buffers[attr] = tensor
+    model.tie_weights()
+
+    missing = [name for name, param in model.named_parameters() if param.device.type == "meta"]
+    if missing:
+        logger.warning(f"Shared PagPassGPT weights lack {len(missing)} parameters (e.g. {missing[0]}), re-export them")
+        return None
+
+    model.to(device)
+    model.eval()
+    logger.info(f"Mapped shared PagPassGPT weights from {weights_file} in {time.time() - started:.2f}s")
+    return model
+
+
+def _export_once(model_path: Path, weights_file: Path) -> bool:
+    """Export the weight file unless another process is already doing it; True once it is current."""
+    from transformers import GPT2LMHeadModel
+
+    weights_file.parent.mkdir(parents=True, exist_ok=True)
+    lock_file = weights_file.with_name(f"{weights_file.name}.lock")
+    fd = os.open(lock_file, os.O_CREAT | os.O_RDWR)
+    try:
+        deadline = time.time() + _EXPORT_WAIT
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.time() >= deadline:
+                    return _is_current(model_path, weights_file)
+                time.sleep(_POLL_INTERVAL)
+
+        # Another process may have finished the export while this one waited
+        if _is_current(model_path, weights_file):
+            return True
+        try:
+            source = checkpoint_fingerprint(model_path)
+            export_shared_weights(GPT2LMHeadModel.from_pretrained(str(model_path)), weights_file, source)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to export shared PagPassGPT weights: {e}")
+            return False
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+def _is_current(model_path: Path, weights_file: Path) -> bool:
+    """Whether the weight file exists and was exported from the checkpoint as it is now."""
+    try:
+        return read_metadata(weights_file).get("source") == checkpoint_fingerprint(model_path)
+    except (OSError, ValueError, struct.error):
+        return False
+
+
+def _read_header(weights_file: Path) -> Tuple[Dict, int]:
+    """Header of a safetensors file and the offset its tensor data starts at."""
+    with open(weights_file, "rb") as handle:
+        (header_size,) = struct.unpack("<Q", handle.read(8))
+        header = json.loads(handle.read(header_size))
+    return header, 8 + header_size
+
+
+def _checkpoint_files(model_path: Path) -> List[Path]:
+    model_path = Path(model_path).resolve()
+    return sorted(
+        path for path in model_path.iterdir()
+        if path.is_file() and path.suffix in _CHECKPOINT_SUFFIXES
+    )
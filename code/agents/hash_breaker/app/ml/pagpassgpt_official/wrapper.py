@@ -11,8 +11,10 @@ This wrapper provides two modes:
 
 import logging
 import os
+import threading
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional, Sequence, Tuple
 import sys
 
 # Add the official PagPassGPT directory to path
@@ -27,18 +29,33 @@ class PagPassGPTGenerator:
     PagPassGPT Password Generator (Official Implementation)
     """
 
-    def __init__(self, model_path: str = "/app/models/pagpassgpt"):
+    def __init__(
+        self,
+        model_path: str = "/app/models/pagpassgpt",
+        device: Optional[str] = None,
+        backend: Optional[str] = None
+    ):
         """
         Initialize generator
 
         Args:
             model_path: Path to trained PagPassGPT model
+            device: Torch device (defaults to cuda when available, else cpu)
+            backend: "torch", "onnx" or "auto" (defaults to PAGPASSGPT_BACKEND);
+                auto picks the int8 ONNX export when there is no CUDA device
         """
+        from app.config import get_settings
+
+        settings = get_settings()
         self.model_path = Path(model_path)
         self.use_official = False
         self.tokenizer = None
         self.model = None
-        self.device = None
+        self.onnx = None
+        self.device = device
+        self.backend = backend or settings.pagpassgpt_backend
+        self.onnx_threads = settings.pagpassgpt_onnx_threads
+        self.shared_weights = settings.pagpassgpt_shared_weights
 
         # Try to load official implementation
         self._load_official()
@@ -71,16 +88,29 @@ class PagPassGPTGenerator:
                 pad_token="<PAD>"
             )
 
+            if self._load_onnx():
+                return
+
             # Try to load model
             try:
                 from transformers import GPT2LMHeadModel
                 import torch
 
-                self.device = "cuda" if torch.cuda.is_available() else "cpu"
-                self.model = GPT2LMHeadModel.from_pretrained(str(self.model_path))
-                self.model.to(self.device)
-                self.model.eval()
-
+                if self.device is None:
+                    self.device = "cuda" if torch.cuda.is_available() else "cpu"
+                if self.shared_weights:
+                    from app.ml.pagpassgpt_official.shared_weights import load_shared_model
+
+                    try:
+                        self.model = load_shared_model(self.model_path, self.device)
+                    except Exception as e:
+                        logger.warning(f"Failed to map shared PagPassGPT weights: {e}")
+                if self.model is None:
+                    self.model = GPT2LMHeadModel.from_pretrained(str(self.model_path))
+                    self.model.to(self.device)
+                    self.model.eval()
+
+                self.backend = "torch"
                 self.use_official = True
                 logger.info(f"✅ Official PagPassGPT loaded successfully on {self.device}")
 
@@ -95,6 +125,35 @@ class PagPassGPTGenerator:
             logger.warning(f"Failed to initialize official PagPassGPT: {e}")
             logger.info("Will use fallback generation method")
 
+    def _load_onnx(self) -> bool:
+        """Load the int8 ONNX export if selected; False means use transformers"""
+        from app.ml.pagpassgpt_official.onnx_backend import (
+            OnnxPagPassGPT,
+            onnx_available,
+            onnx_model_file,
+        )
+
+        if self.backend == "torch":
+            return False
+        if not onnx_available(self.model_path):
+            if self.backend == "onnx":
+                logger.warning(f"ONNX model not found at {onnx_model_file(self.model_path)}, using transformers")
+            return False
+        if self.backend == "auto" and (self.device not in (None, "cpu") or _cuda_available()):
+            return False
+
+        try:
+            self.onnx = OnnxPagPassGPT(onnx_model_file(self.model_path), num_threads=self.onnx_threads)
+        except Exception as e:
+            logger.warning(f"Failed to load ONNX model: {e}")
+            return False
+
+        self.backend = "onnx"
+        self.device = "cpu"
+        self.use_official = True
+        logger.info("✅ Official PagPassGPT loaded successfully (ONNX int8, cpu)")
+        return True
+
     def generate(
         self,
         pattern: Optional[str] = None,
@@ -119,6 +178,70 @@ class PagPassGPTGenerator:
         else:
             return self._generate_fallback(num_passwords, max_length)
 
+    def generate_dcgen(
+        self,
+        patterns: Sequence[Tuple[str, float]],
+        num_passwords: int,
+        threshold: int = 100000,
+        workers: int = 1
+    ) -> Iterator[List[str]]:
+        """
+        Stream passwords using D&C-GEN
+
+        The budget is split over PCFG patterns by rate and each pattern is
+        divided by next-character probabilities until subtasks fall below
+        the threshold, so far fewer duplicates are produced than by sampling.
+
+        Args:
+            patterns: (pattern, rate) pairs, e.g. [("L6 N2", 0.03), ...]
+            num_passwords: Total guess budget
+            threshold: Subtasks up to this many guesses are sampled directly
+            workers: Worker processes, each with its own model copy (spread
+                over the visible GPUs); 1 runs on this generator's model
+
+        Yields:
+            Password batches, most probable patterns first
+        """
+        from app.ml.pagpassgpt_official.dcgen import (
+            DCGenSplitter,
+            iter_dcgen_processes,
+            prepare_tasks,
+        )
+
+        tasks = prepare_tasks(patterns, num_passwords)
+        if not tasks:
+            return
+
+        if not self.use_official or self.backend == "onnx":
+            # Without the torch model there is no split step; sample each
+            # pattern's share directly instead
+            for pcfg_pattern, gen_num in tasks:
+                for start in range(0, gen_num, 10000):
+                    yield self.generate(pattern=pcfg_pattern, num_passwords=min(10000, gen_num - start))
+            return
+
+        if workers > 1:
+            yield from iter_dcgen_processes(self.model_path, tasks, threshold, self._worker_devices(workers))
+            return
+
+        splitter = DCGenSplitter(self.model, self.tokenizer, self.device, threshold)
+        more_gen_num = 0
+        for pcfg_pattern, gen_num in tasks:
+            gen_num += more_gen_num
+            try:
+                yield from splitter.run(pcfg_pattern, gen_num)
+            except Exception as e:
+                logger.error(f"Error in D&C-GEN for pattern {pcfg_pattern}: {e}")
+            more_gen_num = max(0, gen_num - splitter.generated)
+
+    def _worker_devices(self, workers: int) -> List[str]:
+        """Assign worker processes round-robin to the visible GPUs."""
+        import torch
+
+        if str(self.device).startswith("cuda") and torch.cuda.device_count() > 0:
+            return [f"cuda:{i % torch.cuda.device_count()}" for i in range(workers)]
+        return ["cpu"] * workers
+
     def _generate_official(
         self,
         pattern: Optional[str],
@@ -134,6 +257,9 @@ class PagPassGPTGenerator:
         Returns:
             List of passwords
         """
+        if self.backend == "onnx":
+            return self._generate_onnx(pattern, num_passwords)
+
         import torch
 
         passwords = []
@@ -185,6 +311,60 @@ class PagPassGPTGenerator:
             logger.error(f"Error in official generation: {e}")
             return self._generate_fallback(num_passwords, 12)
 
+    def _generate_onnx(
+        self,
+        pattern: Optional[str],
+        num_passwords: int
+    ) -> List[str]:
+        """
+        Generate passwords with the ONNX backend (same sampling settings as transformers)
+
+        Args:
+            pattern: PCFG pattern
+            num_passwords: Number to generate
+
+        Returns:
+            List of passwords
+        """
+        try:
+            prompt = self.tokenizer.encode_forgen(pattern or "").tolist() + [self.tokenizer.sep_token_id]
+            stop_ids = [self.tokenizer.eos_token_id, self.tokenizer.pad_token_id]
+            batches = self.onnx.sample(
+                prompt,
+                num_passwords,
+                max_new_tokens=32 - len(prompt),
+                stop_ids=stop_ids,
+                pad_id=self.tokenizer.pad_token_id,
+                top_k=50,
+                top_p=0.95,
+                temperature=0.8,
+                batch_size=1000,
+            )
+
+            passwords = []
+            for tokens in batches:
+                for row in tokens:
+                    password = self._decode_password(row, stop_ids)
+                    if 4 <= len(password) <= 20:
+                        passwords.append(password)
+            return passwords[:num_passwords]
+
+        except Exception as e:
+            logger.error(f"Error in ONNX generation: {e}")
+            return self._generate_fallback(num_passwords, 12)
+
+    def _decode_password(self, token_ids, stop_ids: List[int]) -> str:
+        """Decode generated ids up to the first stop token, skipping pattern tokens"""
+        chars = []
+        for token_id in token_ids:
+            token_id = int(token_id)
+            if token_id in stop_ids:
+                break
+            token = self.tokenizer.decoder.get(token_id)
+            if token is not None and len(token) == 1:
+                chars.append(token)
+        return "".join(chars)
+
     def _generate_fallback(
         self,
         num_passwords: int,
@@ -242,25 +422,62 @@ class PagPassGPTGenerator:
         return list(passwords)[:num_passwords]
 
 
+def _cuda_available() -> bool:
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
 # Global generator instance
 _generator = None
+_generator_lock = threading.Lock()
 
 
 def get_generator() -> PagPassGPTGenerator:
     """
     Get or create global generator instance
 
+    Worker threads of one process share the instance; the lock keeps two
+    threads from loading the model at the same time.
+
     Returns:
         PagPassGPTGenerator instance
     """
     global _generator
 
     if _generator is None:
-        _generator = PagPassGPTGenerator()
+        with _generator_lock:
+            if _generator is None:
+                _generator = PagPassGPTGenerator()
 
     return _generator
 
 
+def warmup_generator(num_passwords: int = 100) -> PagPassGPTGenerator:
+    """
+    Load the global generator and run one small generation
+
+    Called when a worker process boots so the first phase 3 of a job does
+    not pay for loading the model or for the first forward pass.
+
+    Args:
+        num_passwords: Passwords generated by the warmup run
+
+    Returns:
+        PagPassGPTGenerator instance
+    """
+    started = time.time()
+    generator = get_generator()
+    if generator.use_official:
+        generator.generate(num_passwords=num_passwords)
+        logger.info(
+            f"PagPassGPT warmed up on {generator.device} ({generator.backend}) in {time.time() - started:.1f}s"
+        )
+    return generator
+
+
 def check_model_available() -> bool:
     """
     Check if trained PagPassGPT model is available
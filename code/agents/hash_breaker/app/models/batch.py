@@ -0,0 +1,94 @@
+"""Request and response models for multi-hash batch audit jobs."""
+
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.config import get_settings
+from app.models.enums import JobPriority, JobStatus
+
+
+class BatchHashAuditRequest(BaseModel):
+    """Batch audit request: many hashes of one type cracked in a single pipeline run."""
+
+    hashes: List[str] = Field(..., min_length=1, description="Hashes to audit (same hash type)")
+    hash_type_id: int = Field(..., description="Hashcat hash mode shared by all hashes")
+    timeout_seconds: int = Field(default=300, description="Total time budget for the whole batch")
+    priority: JobPriority = JobPriority.NORMAL
+    generator: Optional[Literal["auto", "pagpassgpt", "markov"]] = Field(
+        default=None, description="Phase 3 candidate generator (defaults to PHASE3_GENERATOR)"
+    )
+
+    @field_validator("hashes")
+    @classmethod
+    def validate_hashes(cls, v):
+        """Drop blank lines and enforce the configured batch size limit."""
+        hashes = [h.strip() for h in v if h and h.strip()]
+        if not hashes:
+            raise ValueError("At least one non-empty hash is required")
+        limit = get_settings().max_batch_hashes
+        if len(hashes) > limit:
+            raise ValueError(f"Batch exceeds the maximum of {limit} hashes")
+        return hashes
+
+    @field_validator("timeout_seconds")
+    @classmethod
+    def validate_timeout(cls, v):
+        """Validate timeout against the configured bounds."""
+        settings = get_settings()
+        if not settings.min_timeout <= v <= settings.max_timeout:
+            raise ValueError(
+                f"timeout_seconds must be between {settings.min_timeout} and {settings.max_timeout}"
+            )
+        return v
+
+
+class BatchJobSubmissionResponse(BaseModel):
+    """Response returned when a batch job is accepted."""
+
+    job_id: str
+    status: JobStatus
+    total_hashes: int
+
+
+class HashResult(BaseModel):
+    """Outcome for a single hash of a batch job."""
+
+    hash: str
+    cracked: bool
+    password: Optional[str] = None
+    cracked_in_phase: Optional[int] = None
+
+
+class BatchJobState(BaseModel):
+    """Batch job state persisted in Redis under ``job:{job_id}``."""
+
+    job_id: str
+    status: JobStatus
+    batch: bool = True
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    hash_type_id: int
+    timeout_seconds: int
+    priority: JobPriority = JobPriority.NORMAL
+    generator: Optional[str] = None
+    progress: int = 0
+    current_phase: Optional[str] = None
+    phase_number: Optional[int] = None
+    time_elapsed: float = 0
+    time_remaining: Optional[int] = None
+    total_hashes: int
+    cracked_count: int = 0
+    attempts: int = 0
+    reason: Optional[str] = None
+
+
+class BatchJobResultsResponse(BaseModel):
+    """Per-hash results of a batch job."""
+
+    job_id: str
+    status: JobStatus
+    total_hashes: int
+    cracked_count: int
+    results: List[HashResult]
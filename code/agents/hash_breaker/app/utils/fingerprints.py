@@ -0,0 +1,28 @@
+"""Fingerprints of the source files derived artifacts are built from.
+
+The digest index, Bloom filters, wordlist store, Markov/PCFG model and
+benchmark reports record the size and mtime of their sources, and compare
+them on load to tell whether they are stale.
+"""
+
+from pathlib import Path
+from typing import List, Sequence
+
+
+def source_fingerprints(sources: Sequence[Path]) -> List[dict]:
+    """Path, size and mtime of each source file (None for missing ones).
+
+    Args:
+        sources: Source files
+
+    Returns:
+        One ``{"path", "size", "mtime"}`` dict per source, in order
+    """
+    fingerprints = []
+    for source in sources:
+        try:
+            stat = source.stat()
+            fingerprints.append({"path": str(source), "size": stat.st_size, "mtime": int(stat.st_mtime)})
+        except OSError:
+            fingerprints.append({"path": str(source), "size": None, "mtime": None})
+    return fingerprints
@@ -56,6 +56,34 @@ worker_jobs_active = Gauge(
     registry=registry
 )
 
+cpu_guess_rate = Gauge(
+    "hash_breaker_cpu_guesses_per_second",
+    "Guess rate of the last CPU engine run by phase",
+    ["phase"],
+    registry=registry
+)
+
+hashcat_guess_rate = Gauge(
+    "hash_breaker_hashcat_guesses_per_second",
+    "Guess rate last reported by hashcat by phase",
+    ["phase"],
+    registry=registry
+)
+
+candidate_queue_depth = Gauge(
+    "hash_breaker_candidate_queue_batches",
+    "Candidate batches waiting between a generator thread and hashcat stdin",
+    ["phase"],
+    registry=registry
+)
+
+candidate_drop_ratio = Gauge(
+    "hash_breaker_candidate_drop_ratio",
+    "Share of generated candidates dropped as already tried in the last run",
+    ["phase"],
+    registry=registry
+)
+
 success_rate = Gauge(
     "hash_breaker_success_rate",
     "Success rate by hash type",
@@ -63,6 +91,47 @@ success_rate = Gauge(
     registry=registry
 )
 
+candidates_dropped_total = Counter(
+    "hash_breaker_candidates_dropped_total",
+    "Generated candidates dropped before hashcat by reason (duplicate, wordlist)",
+    ["phase", "reason"],
+    registry=registry
+)
+
+candidate_stall_seconds = Counter(
+    "hash_breaker_candidate_stall_seconds",
+    "Time the candidate producer (side=producer) or hashcat writer (side=consumer) spent blocked",
+    ["phase", "side"],
+    registry=registry
+)
+
+submissions_total = Counter(
+    "hash_breaker_submissions_total",
+    "Single-hash submissions by outcome (new, attached to an in-flight job, served from the potfile)",
+    ["outcome"],
+    registry=registry
+)
+
+duplicate_hit_ratio = Gauge(
+    "hash_breaker_duplicate_hit_ratio",
+    "Share of single-hash submissions answered without a new pipeline run",
+    registry=registry
+)
+
+keyspace_shards_total = Counter(
+    "hash_breaker_keyspace_shards_total",
+    "Keyspace shards of fanned-out phases by who ran them (worker, parent) or skipped",
+    ["phase", "runner"],
+    registry=registry
+)
+
+preemptions_total = Counter(
+    "hash_breaker_preemptions_total",
+    "Running jobs that yielded the hashcat device to a higher-priority job, by priority",
+    ["priority"],
+    registry=registry
+)
+
 # Histograms
 job_duration = Histogram(
     "hash_breaker_jobs_duration_seconds",
@@ -80,6 +149,22 @@ phase_duration = Histogram(
     registry=registry
 )
 
+queue_wait_seconds = Histogram(
+    "hash_breaker_queue_wait_seconds",
+    "Time from submission until a worker started the job, by priority",
+    ["priority"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, float("inf")),
+    registry=registry
+)
+
+preempted_seconds = Histogram(
+    "hash_breaker_preempted_seconds",
+    "Time a preempted job waited for the hashcat device, by priority",
+    ["priority"],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, float("inf")),
+    registry=registry
+)
+
 
 class MetricsContext:
     """Context manager for tracking metrics."""
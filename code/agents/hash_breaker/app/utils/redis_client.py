@@ -6,12 +6,21 @@ from datetime import timedelta
 from typing import Any, Optional
 
 import redis
+import redis.asyncio
 from redis.exceptions import RedisError, ConnectionError, TimeoutError
 
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Compare-and-delete, so a released claim never removes another owner's key
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 
 class RedisClient:
     """Redis client with connection pooling and robust error handling."""
@@ -109,6 +118,191 @@ class RedisClient:
             logger.error(f"Error updating key '{key}': {e}")
             return False
 
+    def set_fields(
+        self,
+        key: str,
+        mapping: dict,
+        ex: Optional[int] = None,
+        channel: Optional[str] = None,
+        event: str = "update",
+    ) -> bool:
+        """Write fields into a Redis hash, JSON-encoding each value.
+
+        With a ``channel``, the written fields are also published there as
+        ``{"event": event, "data": mapping}`` in the same round trip.
+
+        Args:
+            key: Redis key of the hash
+            mapping: Field name to value mapping
+            ex: Expiration time in seconds (defaults to settings.redis_ttl;
+                0 leaves the hash without expiry)
+            channel: Pub/sub channel to announce the change on
+            event: Event name published with the change
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not mapping:
+            return True
+        try:
+            ttl = ex if ex is not None else self._ttl
+            pipe = self.client.pipeline()
+            pipe.hset(key, mapping={k: json.dumps(v) for k, v in mapping.items()})
+            if ttl:
+                pipe.expire(key, timedelta(seconds=ttl))
+            if channel:
+                pipe.publish(channel, json.dumps({"event": event, "data": mapping}))
+            pipe.execute()
+            return True
+        except (RedisError, TypeError) as e:
+            logger.error(f"Error setting fields on '{key}': {e}")
+            return False
+
+    def get_fields(self, key: str) -> dict:
+        """Read every field of a Redis hash written by ``set_fields``.
+
+        Args:
+            key: Redis key of the hash
+
+        Returns:
+            Decoded field mapping (empty if the key does not exist)
+        """
+        try:
+            raw = self.client.hgetall(key)
+            return {k: json.loads(v) for k, v in raw.items()}
+        except (RedisError, json.JSONDecodeError) as e:
+            logger.error(f"Error getting fields of '{key}': {e}")
+            return {}
+
+    def get_fields_of(self, key: str, field_names: list) -> dict:
+        """Read selected fields of a Redis hash written by ``set_fields``.
+
+        Args:
+            key: Redis key of the hash
+            field_names: Fields to read
+
+        Returns:
+            Decoded mapping of the fields that exist
+        """
+        if not field_names:
+            return {}
+        try:
+            values = self.client.hmget(key, field_names)
+            return {k: json.loads(v) for k, v in zip(field_names, values) if v is not None}
+        except (RedisError, json.JSONDecodeError) as e:
+            logger.error(f"Error getting fields of '{key}': {e}")
+            return {}
+
+    def get_field(self, key: str, field_name: str) -> Any:
+        """Read one field of a Redis hash written by ``set_fields``.
+
+        Args:
+            key: Redis key of the hash
+            field_name: Field to read
+
+        Returns:
+            Decoded value or None if the key or field does not exist
+        """
+        try:
+            value = self.client.hget(key, field_name)
+            return json.loads(value) if value is not None else None
+        except (RedisError, json.JSONDecodeError) as e:
+            logger.error(f"Error getting field '{field_name}' of '{key}': {e}")
+            return None
+
+    def increment_fields(self, key: str, increments: dict) -> bool:
+        """Atomically increment integer counters stored in a Redis hash.
+
+        Counters are long-lived statistics and are not given a TTL.
+
+        Args:
+            key: Redis key of the hash
+            increments: Field name to increment mapping
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not increments:
+            return True
+        try:
+            pipe = self.client.pipeline()
+            for field_name, amount in increments.items():
+                pipe.hincrby(key, field_name, int(amount))
+            pipe.execute()
+            return True
+        except RedisError as e:
+            logger.error(f"Error incrementing fields on '{key}': {e}")
+            return False
+
+    def increment_field(self, key: str, field_name: str, amount: int = 1) -> Optional[int]:
+        """Atomically increment one integer field of a Redis hash.
+
+        Args:
+            key: Redis key of the hash
+            field_name: Field to increment (created at 0)
+            amount: Increment, may be negative
+
+        Returns:
+            The new value, or None if Redis is unavailable
+        """
+        try:
+            return int(self.client.hincrby(key, field_name, int(amount)))
+        except RedisError as e:
+            logger.error(f"Error incrementing '{field_name}' on '{key}': {e}")
+            return None
+
+    def get_counters(self, key: str) -> dict:
+        """Read integer counters written by ``increment_fields``.
+
+        Args:
+            key: Redis key of the hash
+
+        Returns:
+            Field name to integer mapping (empty if the key does not exist)
+        """
+        try:
+            return {k: int(v) for k, v in self.client.hgetall(key).items()}
+        except (RedisError, ValueError) as e:
+            logger.error(f"Error getting counters of '{key}': {e}")
+            return {}
+
+    def claim(self, key: str, value: str, ex: Optional[int] = None) -> Optional[str]:
+        """Set a string key only if it does not exist yet.
+
+        Args:
+            key: Redis key
+            value: Value to claim the key with
+            ex: Expiration time in seconds (defaults to settings.redis_ttl)
+
+        Returns:
+            The key's owner: ``value`` if the claim succeeded, the existing
+            value otherwise, or None if Redis is unavailable
+        """
+        try:
+            ttl = ex if ex is not None else self._ttl
+            if self.client.set(key, value, nx=True, ex=ttl):
+                return value
+            return self.client.get(key) or self.claim(key, value, ex)
+        except RedisError as e:
+            logger.error(f"Error claiming key '{key}': {e}")
+            return None
+
+    def release(self, key: str, value: str) -> bool:
+        """Delete a key claimed with ``claim`` if ``value`` still owns it.
+
+        Args:
+            key: Redis key
+            value: Value the key was claimed with
+
+        Returns:
+            True if the key was deleted, False otherwise
+        """
+        try:
+            return bool(self.client.eval(_RELEASE_SCRIPT, 1, key, value))
+        except RedisError as e:
+            logger.error(f"Error releasing key '{key}': {e}")
+            return False
+
     def delete(self, key: str) -> bool:
         """Delete key from Redis.
 
@@ -124,6 +318,25 @@ class RedisClient:
             logger.error(f"Error deleting key '{key}': {e}")
             return False
 
+    def delete_fields(self, key: str, *field_names: str) -> bool:
+        """Remove fields from a Redis hash.
+
+        Args:
+            key: Redis key of the hash
+            field_names: Fields to remove
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not field_names:
+            return True
+        try:
+            self.client.hdel(key, *field_names)
+            return True
+        except RedisError as e:
+            logger.error(f"Error deleting fields of '{key}': {e}")
+            return False
+
     def exists(self, key: str) -> bool:
         """Check if key exists in Redis.
 
@@ -188,3 +401,26 @@ def get_redis() -> RedisClient:
     if _redis_client is None:
         _redis_client = RedisClient()
     return _redis_client
+
+
+# Global asyncio Redis client instance (pub/sub for streaming endpoints)
+_async_redis_client: Optional[redis.asyncio.Redis] = None
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """Get or create the global asyncio Redis client.
+
+    Returns:
+        redis.asyncio.Redis: Client for use inside the API's event loop
+    """
+    global _async_redis_client
+    if _async_redis_client is None:
+        settings = get_settings()
+        _async_redis_client = redis.asyncio.Redis.from_url(
+            settings.redis_url,
+            db=settings.redis_db,
+            decode_responses=True,
+            socket_connect_timeout=5,
+            health_check_interval=30,
+        )
+    return _async_redis_client
@@ -0,0 +1,251 @@
+"""Cluster telemetry for sizing the worker pool.
+
+Metrics observed in worker processes never reach the API's ``/metrics``
+through the in-process Prometheus registry, so workers report through Redis:
+
+    telemetry:histograms   ``{metric}|{label}|{bucket}`` -> observations,
+                           ``{metric}|{label}|sum`` (scaled) and ``|count``
+    telemetry:workers      worker id -> active jobs, threads, last heartbeat
+
+``observe`` adds one observation to a histogram of ``HISTOGRAMS``;
+``report_worker`` is the heartbeat of a worker process. On the API side
+``TelemetryCollector`` exposes the histograms to Prometheus, and
+``refresh_telemetry`` samples the RabbitMQ queue depth per priority, sets the
+``queue_depth``/``worker_jobs_active`` gauges and returns the snapshot shown
+by ``/v1/health``.
+"""
+
+import logging
+import os
+import socket
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client.core import HistogramMetricFamily
+
+from app.config import get_settings
+from app.utils.metrics import queue_depth, worker_jobs_active
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAMS_KEY = "telemetry:histograms"
+WORKERS_KEY = "telemetry:workers"
+
+# name -> (help, label name or "", bucket upper bounds, sum scale)
+HISTOGRAMS: Dict[str, Tuple[str, str, Tuple[float, ...], int]] = {
+    "hashcat_spawn_seconds": (
+        "Time to fork and exec a hashcat process, by attack mode",
+        "attack_mode",
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+        1000000,
+    ),
+    "hashcat_first_guess_seconds": (
+        "Time from starting hashcat until its first status report with progress, by attack mode",
+        "attack_mode",
+        (1, 2, 5, 10, 15, 20, 30, 60, 120),
+        1000,
+    ),
+    "hashcat_stdin_candidates_per_second": (
+        "Candidates written to hashcat stdin per second of a streaming run",
+        "",
+        (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6, 1e7),
+        1,
+    ),
+    "phase_guesses_per_second": (
+        "Guess rate of a finished phase run, by phase",
+        "phase",
+        (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9, 1e10, 1e11),
+        1,
+    ),
+}
+
+# Priority label -> queue name suffix of the Dramatiq actors
+QUEUE_PRIORITIES = {"high": "_high", "normal": "", "low": "_low"}
+
+_queue_sample: Tuple[float, Optional[Dict[str, Dict[str, int]]]] = (0.0, None)
+
+
+def worker_id() -> str:
+    """Identifier of this worker process (``host:pid``)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def observe(metric: str, value: float, label: str = "") -> None:
+    """Add one observation to a cluster-wide histogram.
+
+    Args:
+        metric: Name from ``HISTOGRAMS``
+        value: Observed value
+        label: Value of the histogram's label (ignored if it has none)
+    """
+    if not get_settings().telemetry_enabled or value < 0:
+        return
+    _, label_name, buckets, scale = HISTOGRAMS[metric]
+    label = str(label) if label_name else ""
+    bucket = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+    prefix = f"{metric}|{label}|"
+    get_redis().increment_fields(
+        HISTOGRAMS_KEY,
+        {f"{prefix}{bucket}": 1, f"{prefix}count": 1, f"{prefix}sum": int(value * scale)},
+    )
+
+
+def _histogram_counts() -> Dict[Tuple[str, str], Tuple[List[int], float, int]]:
+    """Per-bucket counts, sum and count of every recorded histogram series."""
+    series: Dict[Tuple[str, str], Dict[str, int]] = {}
+    for field_name, value in get_redis().get_counters(HISTOGRAMS_KEY).items():
+        parts = field_name.split("|")
+        if len(parts) != 3 or parts[0] not in HISTOGRAMS:
+            continue
+        series.setdefault((parts[0], parts[1]), {})[parts[2]] = value
+
+    counts = {}
+    for (metric, label), fields in series.items():
+        buckets, scale = HISTOGRAMS[metric][2], HISTOGRAMS[metric][3]
+        per_bucket = [fields.get(str(i), 0) for i in range(len(buckets) + 1)]
+        counts[(metric, label)] = (per_bucket, fields.get("sum", 0) / scale, fields.get("count", 0))
+    return counts
+
+
+class TelemetryCollector:
+    """Prometheus collector exposing the histograms workers report through Redis."""
+
+    def describe(self) -> list:
+        # Nothing to declare up front; collecting reads Redis
+        return []
+
+    def collect(self) -> Iterator[HistogramMetricFamily]:
+        families = {}
+        for (metric, label), (per_bucket, total, count) in sorted(_histogram_counts().items()):
+            help_text, label_name, buckets, _ = HISTOGRAMS[metric]
+            if metric not in families:
+                families[metric] = HistogramMetricFamily(
+                    f"hash_breaker_{metric}", help_text, labels=[label_name] if label_name else None
+                )
+            cumulative = []
+            seen = 0
+            for bound, observed in zip((*buckets, float("inf")), per_bucket):
+                seen += observed
+                cumulative.append(("+Inf" if bound == float("inf") else str(bound), seen))
+            families[metric].add_metric([label] if label_name else [], cumulative, total)
+        yield from families.values()
+
+
+def histogram_summary() -> Dict[str, Dict[str, dict]]:
+    """Count, mean and approximate 95th percentile of every histogram series.
+
+    The percentile is the upper bound of the bucket it falls into (None
+    above the largest bucket).
+    """
+    summary: Dict[str, Dict[str, dict]] = {}
+    for (metric, label), (per_bucket, total, count) in sorted(_histogram_counts().items()):
+        if not count:
+            continue
+        buckets = HISTOGRAMS[metric][2]
+        target = 0.95 * count
+        seen = 0
+        p95 = None
+        for bound, observed in zip((*buckets, None), per_bucket):
+            seen += observed
+            if seen >= target:
+                p95 = bound
+                break
+        summary.setdefault(metric, {})[label or "all"] = {
+            "count": count,
+            "mean": round(total / count, 6),
+            "p95": p95,
+        }
+    return summary
+
+
+def report_worker(worker: str, active: int, threads: int) -> None:
+    """Heartbeat of a worker process.
+
+    Args:
+        worker: Worker id (``worker_id()``)
+        active: Messages the process is handling right now
+        threads: Worker threads of the process
+    """
+    if not get_settings().telemetry_enabled:
+        return
+    get_redis().set_fields(
+        WORKERS_KEY,
+        {worker: {"active": active, "threads": threads, "pid": os.getpid(), "seen": time.time()}},
+        ex=0,
+    )
+
+
+def remove_worker(worker: str) -> None:
+    """Drop a worker process that shuts down from the occupancy table."""
+    get_redis().delete_fields(WORKERS_KEY, worker)
+
+
+def live_workers() -> Dict[str, dict]:
+    """Worker processes with a recent heartbeat; stale entries are removed."""
+    settings = get_settings()
+    redis = get_redis()
+    cutoff = time.time() - settings.telemetry_heartbeat_interval * 3
+    workers = {}
+    stale = []
+    for worker, entry in redis.get_fields(WORKERS_KEY).items():
+        if isinstance(entry, dict) and entry.get("seen", 0) >= cutoff:
+            workers[worker] = entry
+        else:
+            stale.append(worker)
+    redis.delete_fields(WORKERS_KEY, *stale)
+    return workers
+
+
+def sample_queue_depths(broker) -> Optional[Dict[str, Dict[str, int]]]:
+    """Messages waiting in the RabbitMQ queues of each priority.
+
+    Samples are cached for ``telemetry_sample_interval`` seconds so health
+    checks and scrapes do not each query the broker.
+
+    Args:
+        broker: Dramatiq RabbitMQ broker
+
+    Returns:
+        Priority -> ``{"ready", "delayed", "dead_lettered"}``, or None if
+        RabbitMQ could not be queried
+    """
+    global _queue_sample
+
+    sampled_at, sample = _queue_sample
+    if sample is not None and time.time() - sampled_at < get_settings().telemetry_sample_interval:
+        return sample
+
+    base = get_settings().rabbitmq_queue
+    try:
+        sample = {}
+        for priority, suffix in QUEUE_PRIORITIES.items():
+            ready, delayed, dead = broker.get_queue_message_counts(f"{base}{suffix}")
+            sample[priority] = {"ready": ready, "delayed": delayed, "dead_lettered": dead}
+    except Exception as e:
+        logger.warning(f"Failed to sample RabbitMQ queue depths: {e}")
+        sample = None
+    _queue_sample = (time.time(), sample)
+    return sample
+
+
+def refresh_telemetry(broker) -> dict:
+    """Update the queue and worker gauges and return the current snapshot.
+
+    Args:
+        broker: Dramatiq RabbitMQ broker
+
+    Returns:
+        ``{"queues": ..., "workers": ...}`` as sampled
+    """
+    queues = sample_queue_depths(broker)
+    if queues is not None:
+        for priority, counts in queues.items():
+            queue_depth.labels(priority=priority).set(counts["ready"])
+
+    workers = live_workers()
+    worker_jobs_active.clear()
+    for worker, entry in workers.items():
+        worker_jobs_active.labels(worker_id=worker).set(entry.get("active", 0))
+
+    return {"queues": queues, "workers": workers}
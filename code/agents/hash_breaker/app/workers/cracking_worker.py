@@ -2,12 +2,16 @@
 
 import logging
 import os
+import threading
 
 import dramatiq
 from dramatiq.brokers.rabbitmq import RabbitmqBroker
+from dramatiq.middleware import Middleware
 
 from app.config import get_settings
-from app.cracking.pipeline import run_cracking_pipeline
+from app.cracking.fanout import run_keyspace_shard
+from app.cracking.pipeline import run_batch_cracking_pipeline, run_cracking_pipeline
+from app.utils.telemetry import remove_worker, report_worker, worker_id
 
 # Configure logging
 from app.utils.logging import setup_logging
@@ -18,11 +22,78 @@ logger = logging.getLogger(__name__)
 # Initialize settings
 settings = get_settings()
 
+
+class GeneratorWarmup(Middleware):
+    """Load and warm PagPassGPT before a worker process starts consuming.
+
+    With shared weights every process maps the same weight file, so booting
+    the whole worker group costs one copy of the model in memory.
+    """
+
+    def before_worker_boot(self, broker, worker):
+        from app.ml import warmup_generator
+
+        try:
+            warmup_generator()
+        except Exception as e:
+            logger.warning(f"Worker {os.getpid()}: PagPassGPT warmup failed: {e}")
+
+
+class WorkerTelemetry(Middleware):
+    """Report how many messages this worker process is handling.
+
+    The count is written on every change and by a heartbeat thread, so the
+    API can tell busy, idle and vanished worker processes apart.
+    """
+
+    def __init__(self):
+        self.worker_id = worker_id()
+        self.active = 0
+        self.threads = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _report(self):
+        try:
+            report_worker(self.worker_id, self.active, self.threads)
+        except Exception as e:
+            logger.warning(f"Worker {os.getpid()}: telemetry heartbeat failed: {e}")
+
+    def _heartbeat(self):
+        while not self._stopped.wait(settings.telemetry_heartbeat_interval):
+            self._report()
+
+    def after_worker_boot(self, broker, worker):
+        self.threads = worker.worker_threads
+        self._report()
+        threading.Thread(target=self._heartbeat, name="telemetry-heartbeat", daemon=True).start()
+
+    def before_worker_shutdown(self, broker, worker):
+        self._stopped.set()
+        remove_worker(self.worker_id)
+
+    def before_process_message(self, broker, message):
+        with self._lock:
+            self.active += 1
+        self._report()
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        with self._lock:
+            self.active = max(0, self.active - 1)
+        self._report()
+
+    after_skip_message = after_process_message
+
+
 # Configure RabbitMQ broker
 broker = RabbitmqBroker(
     url=settings.rabbitmq_url,
     max_priority=3
 )
+if settings.pagpassgpt_warmup:
+    broker.add_middleware(GeneratorWarmup())
+if settings.telemetry_enabled:
+    broker.add_middleware(WorkerTelemetry())
 dramatiq.set_broker(broker)
 
 
@@ -103,6 +174,100 @@ def process_cracking_job_low(job_id: str, target_hash: str, hash_type_id: int, t
     return _execute_cracking_job(job_id, target_hash, hash_type_id, timeout)
 
 
+def _execute_batch_job(job_id: str, target_hashes: list, hash_type_id: int, timeout: int) -> dict:
+    logger.info(f"Worker {os.getpid()}: Processing batch job {job_id} ({len(target_hashes)} hashes)")
+
+    try:
+        result = run_batch_cracking_pipeline(job_id, target_hashes, hash_type_id, timeout)
+        logger.info(f"Worker {os.getpid()}: Batch job {job_id} completed with status {result.get('status')}")
+        return result
+    except Exception as e:
+        logger.error(f"Worker {os.getpid()}: Batch job {job_id} failed with error: {e}")
+        raise
+
+
+@dramatiq.actor(
+    queue_name=settings.rabbitmq_queue,
+    max_retries=3,
+    time_limit=settings.worker_timeout * 1000,
+    priority=1
+)
+def process_batch_job(job_id: str, target_hashes: list, hash_type_id: int, timeout: int) -> dict:
+    """Process a multi-hash batch job.
+
+    Args:
+        job_id: Unique job identifier
+        target_hashes: Hashes to crack (same hash type)
+        hash_type_id: Hashcat hash mode
+        timeout: Maximum execution time for the whole batch
+
+    Returns:
+        Final batch job state dict
+    """
+    return _execute_batch_job(job_id, target_hashes, hash_type_id, timeout)
+
+
+@dramatiq.actor(
+    queue_name=f"{settings.rabbitmq_queue}_high",
+    max_retries=3,
+    time_limit=settings.worker_timeout * 1000,
+    priority=3
+)
+def process_batch_job_high(job_id: str, target_hashes: list, hash_type_id: int, timeout: int) -> dict:
+    """Process high-priority multi-hash batch job."""
+    return _execute_batch_job(job_id, target_hashes, hash_type_id, timeout)
+
+
+@dramatiq.actor(
+    queue_name=f"{settings.rabbitmq_queue}_low",
+    max_retries=3,
+    time_limit=settings.worker_timeout * 1000,
+    priority=0
+)
+def process_batch_job_low(job_id: str, target_hashes: list, hash_type_id: int, timeout: int) -> dict:
+    """Process low-priority multi-hash batch job."""
+    return _execute_batch_job(job_id, target_hashes, hash_type_id, timeout)
+
+
+# Keyspace shards of a fanned-out phase; they go to the high priority queue so
+# idle workers take them ahead of new jobs. A shard is never retried: its
+# parent claims shards nobody picked up and stops waiting at the phase deadline.
+@dramatiq.actor(
+    queue_name=f"{settings.rabbitmq_queue}_high",
+    max_retries=0,
+    time_limit=settings.worker_timeout * 1000,
+    priority=3
+)
+def process_keyspace_shard(
+    job_id: str,
+    phase_num: int,
+    shard_index: int,
+    shard_count: int,
+    target_hashes: list,
+    hash_type_id: int,
+    deadline: float,
+) -> dict:
+    """Attack one keyspace shard of a fanned-out phase.
+
+    Args:
+        job_id: Parent job identifier
+        phase_num: Phase being split (2 or 4)
+        shard_index: Shard to attack
+        shard_count: Number of shards of the phase
+        target_hashes: Hashes still uncracked when the phase started
+        hash_type_id: Hashcat hash mode
+        deadline: Epoch time the phase budget runs out
+
+    Returns:
+        Shard result dict (empty if another worker ran the shard)
+    """
+    logger.info(f"Worker {os.getpid()}: Job {job_id} phase {phase_num} shard {shard_index + 1}/{shard_count}")
+    result = run_keyspace_shard(
+        job_id, phase_num, shard_index, shard_count, target_hashes, hash_type_id, deadline
+    )
+    return result or {}
+
+
 if __name__ == "__main__":
     # Run worker
     logger.info(f"Starting Dramatiq worker (concurrency={settings.worker_concurrency})")